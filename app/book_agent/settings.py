@@ -19,6 +19,10 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GOOGLE_BOOKS_API_KEY = os.getenv("GOOGLE_BOOKS_API_KEY")
 
+# Upstream endpoints; override to point at local stand-ins (see `manage.py benchmark`)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+GOOGLE_BOOKS_API_URL = os.getenv("GOOGLE_BOOKS_API_URL", "https://www.googleapis.com/books/v1/volumes")
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -60,6 +64,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'recommendations.middleware.TraceMiddleware',
 ]
 
 ROOT_URLCONF = 'book_agent.urls'
@@ -136,7 +141,19 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CACHES = {
+    # In-process LRU in front of Redis for hot, versioned or content-addressed keys;
+    # every other key (leases, counters, invalidations) goes straight to Redis.
     "default": {
+        "BACKEND": "recommendations.cache_backends.TieredCache",
+        "TIMEOUT": 3600,
+        "OPTIONS": {
+            "REMOTE": "redis",
+            "MAX_BYTES": 64 * 1024 * 1024,  # Local tier size per process
+            "LOCAL_TIMEOUT": 300,  # Max seconds a local copy is trusted
+            "LOCAL_PREFIXES": ["books:", "enrichment:", "completion:"],
+        },
+    },
+    "redis": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
         "LOCATION": "redis://localhost:6379/1",
         # "LOCATION": "redis://127.0.0.1:6379/1",  # Adjust Redis location if needed
@@ -155,3 +172,185 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Per-user nearest-neighbour index over UserSearchHistory embeddings.
+# Swap BACKEND for an approximate (IVF/HNSW) implementation of BaseVectorIndex if needed.
+VECTOR_INDEX = {
+    "BACKEND": "recommendations.services.vector_index.ExactVectorIndex",
+    "OPTIONS": {
+        "max_users": 1024,  # Users kept in memory (LRU)
+        "generation_check_interval": 30,  # Seconds between checks for bulk rewrites
+    },
+}
+
+# On-disk format for UserSearchHistory.embedding: "float32", "float16" or "int8"
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+
+# Google Books enrichment: per-request timeout, worker pool size and overall deadline (seconds)
+GOOGLE_BOOKS_TIMEOUT = 5
+GOOGLE_BOOKS_MAX_WORKERS = 10
+GOOGLE_BOOKS_DEADLINE = 8
+
+# Upstream resilience (services.resilience): per-attempt timeout and overall deadline
+# (seconds), retries with jittered exponential backoff, and a per-process circuit breaker
+# that opens after `failure_threshold` consecutive failures for `reset_timeout` seconds.
+# While OpenAI is unavailable, recommendations come from the Book catalog and are cached
+# for RECOMMENDATION_DEGRADED_CACHE_TIMEOUT seconds only.
+UPSTREAM_POLICIES = {
+    "openai": {
+        "timeout": 20,
+        "deadline": 30,
+        "retries": 2,
+        "backoff_base": 0.5,
+        "backoff_cap": 4,
+        "failure_threshold": 5,
+        "reset_timeout": 30,
+    },
+    "google_books": {
+        "timeout": GOOGLE_BOOKS_TIMEOUT,
+        "deadline": GOOGLE_BOOKS_DEADLINE,
+        "retries": 1,
+        "backoff_base": 0.2,
+        "backoff_cap": 1,
+        "failure_threshold": 10,
+        "reset_timeout": 30,
+    },
+}
+RECOMMENDATION_DEGRADED_CACHE_TIMEOUT = 60
+
+# Per-user taste vector (services.taste_profile): decayed history centroid plus liked books,
+# minus disliked ones, updated on each history/feedback write. Mode: "background" (after
+# commit, on a worker thread), "inline" or "off".
+TASTE_PROFILE = {
+    "mode": "background",
+    "half_life_days": 30,
+    "like_weight": 1.0,
+    "dislike_weight": 0.5,
+    "retrieval_weight": 0.3,  # Blend of taste into the history retrieval query
+    "cache_timeout": 60 * 60,
+    "rebuild_retry_interval": 5 * 60,  # Stale profiles are rebuilt off the request path; failed rebuilds wait this long
+}
+
+# Recommendation prompt budget (services.prompt_builder), in tokens counted with tiktoken
+# when installed (an estimate otherwise). Retrieved histories are listed with each title
+# once; dislikes past the most recent few are summarized. Over budget, the least similar
+# histories are dropped first, then more dislikes go into the summary.
+PROMPT_BUDGET = {
+    "max_tokens": 800,
+    "history_titles": 40,
+    "recent_dislikes": 20,
+}
+
+# Local candidate generation (services.catalog_index): `manage.py embed_catalog` embeds
+# every Book into a memory-mapped matrix under `path`, and the top_n books closest to the
+# request (preferences blended with the taste vector) become the candidates. Mode: "llm"
+# (GPT suggests freely, no candidates), "rerank" (GPT picks `results` books from the
+# candidates, a much smaller prompt) or "fast" (no GPT call, candidates served as ranked).
+# Without a built index every mode behaves like "llm".
+CATALOG_CANDIDATES = {
+    "mode": os.getenv("CATALOG_CANDIDATES_MODE", "llm"),
+    "path": BASE_DIR / "catalog_index",
+    "top_n": 30,
+    "results": 10,
+    "taste_weight": 0.5,
+    "description_chars": 600,
+    "reload_interval": 30,
+}
+
+# UserSearchHistory retention (services.history_retention): per user, the newest max_rows
+# rows are kept, minus near-duplicates (embedding cosine >= duplicate_threshold) and rows
+# older than max_age_days beyond the newest keep_recent. Removed rows are archived to
+# compressed .npz files in archive_dir (`manage.py restore_history` re-imports them).
+# New rows trigger a per-user check at most once per check_interval; mode: "background"
+# (after commit, on a worker thread), "inline" or "off". Run `manage.py compact_history`
+# from cron to sweep every user.
+HISTORY_RETENTION = {
+    "mode": "background",
+    "max_rows": 200,
+    "keep_recent": 20,
+    "max_age_days": 365,
+    "duplicate_threshold": 0.98,
+    "archive_dir": BASE_DIR / "history_archive",
+    "chunk_rows": 10000,
+    "check_interval": 60 * 60 * 24,
+}
+
+# Batch precompute (ai/batch/ endpoint and `manage.py batch_recommendations`):
+# LLM + enrichment calls in flight at once, and the largest batch the endpoint accepts
+BATCH_RECOMMENDATION_CONCURRENCY = 8
+BATCH_RECOMMENDATION_MAX_ITEMS = 1000
+
+# GPT reasoning check of generated recommendations, stored on UserSearchHistory.
+# Mode: "background" (local worker pool, off the request path), "inline" or "off".
+RECOMMENDATION_VALIDATION_MODE = os.getenv("RECOMMENDATION_VALIDATION_MODE", "background")
+RECOMMENDATION_VALIDATION_SAMPLE_RATE = float(os.getenv("RECOMMENDATION_VALIDATION_SAMPLE_RATE", "0.1"))
+RECOMMENDATION_VALIDATION_WORKERS = 2
+
+# Embedding cache: in-process LRU size, then the shared Django cache (alias/timeout in seconds, None = no expiry)
+EMBEDDING_CACHE_MAX_ENTRIES = 4096
+EMBEDDING_CACHE_ALIAS = "default"
+EMBEDDING_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# Max inputs per OpenAI embeddings request in compute_embeddings (API limit is 2048)
+EMBEDDING_BATCH_SIZE = 512
+
+# Request coalescing for identical fetch_books cache misses (seconds)
+COALESCING_LEASE_TIMEOUT = 120  # Cross-worker lease held by the worker running the pipeline
+COALESCING_WAIT_TIMEOUT = 60  # How long followers wait before computing the result themselves
+
+# Fuzzy title resolution against the Book catalog (trigram Dice similarity, 0-1)
+BOOK_RESOLVER = {
+    "threshold": 0.8,  # Minimum similarity to accept a catalog match
+    "max_candidates": 20,  # Titles scored exactly per lookup
+    "max_df_ratio": 0.05,  # Trigrams in more than this share of titles are ignored for candidate search
+    "mode": "background",  # Index refreshes: "background" (off the request path), "inline" or "off"
+    "refresh_interval": 60,  # Seconds between background refreshes picking up new and changed catalog rows
+}
+
+# Seconds a user's like/dislike snapshot stays cached; feedback writes invalidate it immediately
+FEEDBACK_SNAPSHOT_TIMEOUT = 60 * 60
+
+# fetch_books cache (seconds). Per-user rankings are keyed by a version bumped on new
+# feedback or history, so they can live long; book details are shared by all users.
+# Past the soft timeout a ranking is still served, but regenerated in the background.
+RECOMMENDATION_CACHE_TIMEOUT = 60 * 60 * 24 * 3
+RECOMMENDATION_CACHE_SOFT_TIMEOUT = 60 * 60 * 6
+RECOMMENDATION_REFRESH_WORKERS = 2
+ENRICHMENT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Chat completions cached by model and normalized prompt. With semantic matching on, a
+# history-free request whose preferences embed within `threshold` cosine similarity of an
+# earlier one reuses its completion.
+COMPLETION_CACHE = {
+    "enabled": True,
+    "timeout": 60 * 60 * 24,
+    "semantic": False,
+    "threshold": 0.97,
+    "max_semantic_entries": 2048,  # Per-worker index size
+}
+
+# Logging: one console handler; the app's level comes from RECOMMENDATIONS_LOG_LEVEL
+# (DEBUG shows per-request pipeline details, INFO only slow-request traces and problems)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "standard": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "standard"},
+    },
+    "root": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "WARNING")},
+    "loggers": {
+        "recommendations": {
+            "handlers": ["console"],
+            "level": os.getenv("RECOMMENDATIONS_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Requests slower than this (seconds) log their stage breakdown at INFO; the rest at DEBUG
+TRACE_SLOW_REQUEST_SECONDS = 2.0
+
+# recommendations/metrics/ is readable by staff users, and by scrapers sending this as a bearer token
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
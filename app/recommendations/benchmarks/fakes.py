@@ -0,0 +1,245 @@
+# fakes.py
+# Local HTTP stand-ins for OpenAI (chat completions + embeddings) and Google Books,
+# with configurable latency and error profiles, so the pipeline can be measured offline.
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+CATALOG = [
+    ("Dune", "Frank Herbert"), ("Neuromancer", "William Gibson"), ("Hyperion", "Dan Simmons"),
+    ("The Left Hand of Darkness", "Ursula K. Le Guin"), ("Foundation", "Isaac Asimov"),
+    ("The Name of the Wind", "Patrick Rothfuss"), ("Piranesi", "Susanna Clarke"),
+    ("The Road", "Cormac McCarthy"), ("Circe", "Madeline Miller"), ("Station Eleven", "Emily St. John Mandel"),
+    ("The Fifth Season", "N. K. Jemisin"), ("Project Hail Mary", "Andy Weir"), ("Rebecca", "Daphne du Maurier"),
+    ("The Secret History", "Donna Tartt"), ("Gideon the Ninth", "Tamsyn Muir"), ("Annihilation", "Jeff VanderMeer"),
+    ("The Dispossessed", "Ursula K. Le Guin"), ("Snow Crash", "Neal Stephenson"), ("Jonathan Strange & Mr Norrell", "Susanna Clarke"),
+    ("Kindred", "Octavia E. Butler"), ("The Remains of the Day", "Kazuo Ishiguro"), ("Beloved", "Toni Morrison"),
+    ("The Goldfinch", "Donna Tartt"), ("A Wizard of Earthsea", "Ursula K. Le Guin"), ("Blindsight", "Peter Watts"),
+]
+
+
+class LatencyProfile:
+    """
+    Response delay and failure model for a fake upstream.
+    Each call waits `base` seconds plus up to `jitter`; a `tail_rate` fraction of calls
+    also wait `tail`, and an `error_rate` fraction fail with HTTP 500.
+    """
+
+    def __init__(self, base=0.0, jitter=0.0, tail=0.0, tail_rate=0.0, error_rate=0.0):
+        self.base = base
+        self.jitter = jitter
+        self.tail = tail
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+
+    def delay(self):
+        delay = self.base + random.uniform(0, self.jitter)
+        if self.tail_rate and random.random() < self.tail_rate:
+            delay += self.tail
+        return delay
+
+    def should_fail(self):
+        return self.error_rate and random.random() < self.error_rate
+
+
+class _FakeServer:
+    handler_class = None
+
+    def __init__(self, profile=None, host="127.0.0.1", port=0):
+        self.profile = profile or LatencyProfile()
+        self.requests = 0
+        self._lock = threading.Lock()
+        handler = type("Handler", (self.handler_class,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    server_state = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def fail_or_wait(self):
+        """Applies the latency profile; returns True if the request was failed."""
+        state = self.server_state
+        state.count()
+        if state.profile.should_fail():
+            time.sleep(state.profile.delay())
+            self.send_json({"error": {"message": "Injected failure", "type": "server_error"}}, status=500)
+            return True
+        return False
+
+
+def fake_embedding(text, dim):
+    """Deterministic pseudo-embedding: the same text always maps to the same vector."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim, dtype=np.float32).round(6).tolist()
+
+
+def fake_completion(prompt, count=10):
+    """Picks `count` catalog books deterministically from the prompt."""
+    seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "little")
+    picks = random.Random(seed).sample(CATALOG, count)
+    return "\n".join(f"{i}. {title} by {author}" for i, (title, author) in enumerate(picks, 1))
+
+
+class _OpenAIHandler(_JsonHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.fail_or_wait():
+            return
+
+        state = self.server_state
+        if self.path.endswith("/embeddings"):
+            inputs = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+            time.sleep(state.profile.delay())
+            self.send_json({
+                "object": "list",
+                "model": payload.get("model"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_embedding(text, state.embedding_dim)}
+                    for i, text in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+        elif self.path.endswith("/chat/completions"):
+            prompt = payload["messages"][-1]["content"]
+            content = fake_completion(prompt)
+            if payload.get("stream"):
+                self.stream_completion(payload, content)
+            else:
+                time.sleep(state.profile.delay())
+                self.send_json({
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": payload.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+        else:
+            self.send_json({"error": {"message": "Not found"}}, status=404)
+
+    def stream_completion(self, payload, content):
+        """Sends the completion as SSE chunks, spreading the profile's delay across them."""
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+        per_chunk = self.server_state.profile.delay() / max(len(pieces), 1)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for piece in pieces + [None]:
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": piece} if piece else {},
+                    "finish_reason": None if piece else "stop",
+                }],
+            }
+            time.sleep(per_chunk)
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class _GoogleBooksHandler(_JsonHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        if self.fail_or_wait():
+            return
+        time.sleep(self.server_state.profile.delay())
+
+        title, _, author = query.partition(" by ")
+        volume_id = hashlib.md5(query.encode("utf-8")).hexdigest()[:12]
+        self.send_json({
+            "kind": "books#volumes",
+            "totalItems": 1,
+            "items": [{
+                "id": volume_id,
+                "volumeInfo": {
+                    "title": title.strip() or "Unknown Title",
+                    "authors": [author.strip() or "Unknown Author"],
+                    "description": f"A fake description of {title.strip()}.",
+                    "pageCount": 320,
+                    "categories": ["Fiction"],
+                    "imageLinks": {"thumbnail": f"http://books.example/{volume_id}.jpg"},
+                    "infoLink": f"http://books.example/{volume_id}",
+                },
+            }],
+        })
+
+
+class FakeOpenAIServer(_FakeServer):
+    """Serves /v1/chat/completions (plain and stream=true) and /v1/embeddings."""
+
+    handler_class = _OpenAIHandler
+
+    def __init__(self, profile=None, embedding_dim=1536, **kwargs):
+        self.embedding_dim = embedding_dim
+        super().__init__(profile, **kwargs)
+
+    @property
+    def base_url(self):
+        return f"{self.url}/v1"
+
+
+class FakeGoogleBooksServer(_FakeServer):
+    """Serves /books/v1/volumes?q=... with one volume echoing the queried title and author."""
+
+    handler_class = _GoogleBooksHandler
+
+    @property
+    def api_url(self):
+        return f"{self.url}/books/v1/volumes"
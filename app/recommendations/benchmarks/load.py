@@ -0,0 +1,99 @@
+# load.py
+# Load generator for the ai/ endpoint, run against a real HTTP server in this process.
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+GENRES = ["science fiction", "fantasy", "mystery", "literary fiction", "horror", "romance", "history"]
+MOODS = ["adventurous", "melancholic", "cozy", "tense", "curious"]
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class AppServer:
+    """The Django WSGI app on an ephemeral localhost port, served from a background thread."""
+
+    def __init__(self, host="127.0.0.1"):
+        self.httpd = ThreadedWSGIServer((host, 0), _QuietHandler, allow_reuse_address=True)
+        self.httpd.set_app(WSGIHandler())
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_profile(i, distinct_profiles):
+    """Preference payload number i; only `distinct_profiles` different payloads are generated."""
+    n = i % distinct_profiles
+    return {
+        "genres": GENRES[n % len(GENRES)],
+        "mood": MOODS[(n // len(GENRES)) % len(MOODS)],
+        "favorite_books": [f"Favourite {n}"],
+    }
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def run_load(base_url, user_ids, requests=200, concurrency=20, distinct_profiles=10, path="/recommendations/ai/"):
+    """
+    Fires `requests` POSTs at the endpoint from `concurrency` threads and reports
+    throughput, error count and latency percentiles (milliseconds).
+    """
+
+    def one(i):
+        body = dict(make_profile(i, distinct_profiles), user_id=user_ids[i % len(user_ids)])
+        request = urllib.request.Request(
+            base_url + path,
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                response.read()
+                ok = response.status == 200
+        except (urllib.error.URLError, TimeoutError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, ok in results if ok)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, ok in results if not ok),
+        "elapsed_s": elapsed,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
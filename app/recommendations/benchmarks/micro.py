@@ -0,0 +1,92 @@
+# micro.py
+# Micro-benchmarks for the CPU-bound parts of the recommendation pipeline.
+
+import json
+import statistics
+import time
+
+import numpy as np
+
+from recommendations.benchmarks.fakes import fake_completion
+from recommendations.services.ai_recommender import parse_recommendations
+from recommendations.services.embedding_cache import EmbeddingCache
+from recommendations.services.embedding_codec import decode_embedding, encode_embedding
+from recommendations.services.google_books import make_cache_key
+from recommendations.services.vector_index import ExactVectorIndex
+
+
+def measure(fn, repeat=200, warmup=5):
+    """Calls fn `repeat` times and returns per-call timings in microseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def bench_history_retrieval(rows=2000, dim=1536, repeat=50):
+    """Top-5 history lookup: the old per-row JSON + Python cosine scan vs the vector index."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((rows, dim), dtype=np.float32)
+    json_rows = [(i + 1, json.dumps(vec.tolist())) for i, vec in enumerate(vectors)]
+    query = rng.standard_normal(dim, dtype=np.float32).tolist()
+
+    def full_scan():
+        scored = []
+        for history_id, raw in json_rows:
+            vec = np.array(json.loads(raw))
+            q = np.array(query)
+            scored.append((history_id, np.dot(q, vec) / (np.linalg.norm(q) * np.linalg.norm(vec))))
+        return sorted(scored, key=lambda x: x[1], reverse=True)[:5]
+
+    loaded = [(i + 1, vec) for i, vec in enumerate(vectors)]
+    index = ExactVectorIndex(loader=lambda user_id, after_id: loaded if after_id == 0 else [])
+    index._check_generation = lambda: None  # Measure search only, not the shared-cache check
+    index.search(1, query)
+
+    return {
+        f"history_full_scan[{rows}x{dim}]": measure(full_scan, repeat=max(3, repeat // 10), warmup=1),
+        f"history_vector_index[{rows}x{dim}]": measure(lambda: index.search(1, query, k=5), repeat=repeat),
+    }
+
+
+def bench_embedding_decode(dim=1536, repeat=500):
+    vector = np.random.default_rng(1).standard_normal(dim, dtype=np.float32)
+    as_json = json.dumps(vector.tolist())
+    as_blob = encode_embedding(vector, dtype="float32")
+    return {
+        f"embedding_json_loads[{dim}]": measure(lambda: np.asarray(json.loads(as_json), dtype=np.float32), repeat),
+        f"embedding_frombuffer[{dim}]": measure(lambda: decode_embedding(as_blob), repeat),
+    }
+
+
+def bench_parsing(repeat=2000):
+    content = fake_completion("benchmark prompt")
+    return {"parse_recommendations[10 lines]": measure(lambda: parse_recommendations(content), repeat)}
+
+
+def bench_caching(repeat=2000):
+    preferences = {"user_id": 1, "genres": "science fiction", "favorite_books": ["Dune"], "mood": "curious"}
+    embedding_cache = EmbeddingCache(max_entries=16)
+    embedding_cache._set_local("warm", np.zeros(1536, dtype=np.float32))
+    return {
+        "make_cache_key": measure(lambda: make_cache_key(preferences), repeat),
+        "embedding_cache_local_hit": measure(lambda: embedding_cache._get_local("warm"), repeat),
+    }
+
+
+def run_micro_benchmarks(history_rows=2000, dim=1536):
+    results = {}
+    results.update(bench_history_retrieval(rows=history_rows, dim=dim))
+    results.update(bench_embedding_decode(dim=dim))
+    results.update(bench_parsing())
+    results.update(bench_caching())
+    return results
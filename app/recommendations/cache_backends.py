@@ -0,0 +1,220 @@
+# cache_backends.py
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class _LocalTier:
+    """Byte-bounded LRU of pickled values with per-entry expiry, shared by every thread."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # key -> (expires_at, blob)
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.local_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+
+
+# Django builds a backend instance per thread; the local tier must be per process
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """
+    Django cache backend that keeps a bounded in-process LRU in front of another cache
+    alias (Redis in production).
+
+    Only keys starting with one of LOCAL_PREFIXES are held locally; everything else
+    (leases, counters, invalidation keys) goes straight to the remote cache so workers
+    never disagree about it. Local entries are pickled, so callers can't mutate shared
+    objects, and evicted least-recently-used first once their total size passes MAX_BYTES.
+    A local copy is trusted for at most LOCAL_TIMEOUT seconds, which bounds how long a
+    worker can miss a rewrite made by another worker.
+
+        CACHES = {
+            "default": {
+                "BACKEND": "recommendations.cache_backends.TieredCache",
+                "OPTIONS": {"REMOTE": "redis", "MAX_BYTES": 64 * 1024 * 1024,
+                            "LOCAL_TIMEOUT": 300, "LOCAL_PREFIXES": ["books:"]},
+            },
+            "redis": {"BACKEND": "django.core.cache.backends.redis.RedisCache", ...},
+        }
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.remote_alias = options.get("REMOTE", "redis")
+        self.max_bytes = options.get("MAX_BYTES", 64 * 1024 * 1024)
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 300)
+        self.local_prefixes = tuple(options.get("LOCAL_PREFIXES", ()))
+        with _tiers_lock:
+            self._tier = _tiers.setdefault((location, self.remote_alias), _LocalTier())
+
+    @property
+    def remote(self):
+        return caches[self.remote_alias]
+
+    def is_local(self, key):
+        return str(key).startswith(self.local_prefixes)
+
+    # Local tier
+
+    def _local_get(self, key):
+        tier = self._tier
+        with tier.lock:
+            entry = tier.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, blob = entry
+            if expires_at <= time.monotonic():
+                self._local_pop(key)
+                return None
+            tier.entries.move_to_end(key)
+            tier.local_hits += 1
+        return pickle.loads(blob)
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        ttl = self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+        if ttl <= 0:
+            self._local_delete(key)
+            return
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            self._local_delete(key)
+            return
+        tier = self._tier
+        with tier.lock:
+            self._local_pop(key)
+            tier.entries[key] = (time.monotonic() + ttl, blob)
+            tier.bytes += len(blob)
+            while tier.bytes > self.max_bytes:
+                self._local_pop(next(iter(tier.entries)))
+
+    def _local_pop(self, key):
+        # Caller holds the tier lock
+        entry = self._tier.entries.pop(key, None)
+        if entry is not None:
+            self._tier.bytes -= len(entry[1])
+
+    def _local_delete(self, key):
+        with self._tier.lock:
+            self._local_pop(key)
+
+    def _count(self, field, n=1):
+        with self._tier.lock:
+            setattr(self._tier, field, getattr(self._tier, field) + n)
+
+    def local_stats(self):
+        tier = self._tier
+        with tier.lock:
+            return {
+                "entries": len(tier.entries),
+                "bytes": tier.bytes,
+                "local_hits": tier.local_hits,
+                "remote_hits": tier.remote_hits,
+                "misses": tier.misses,
+            }
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        if not self.is_local(key):
+            return self.remote.get(key, default, version=version)
+
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(local_key)
+        if value is not None:
+            return value
+
+        value = self.remote.get(key, version=version)
+        if value is None:
+            self._count("misses")
+            return default
+        self._count("remote_hits")
+        self._local_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = {}
+        remote_keys = []
+        for key in keys:
+            value = self._local_get(self.make_and_validate_key(key, version=version)) if self.is_local(key) else None
+            if value is None:
+                remote_keys.append(key)
+            else:
+                found[key] = value
+        if remote_keys:
+            fetched = self.remote.get_many(remote_keys, version=version)
+            for key, value in fetched.items():
+                if self.is_local(key):
+                    self._count("remote_hits")
+                    self._local_set(self.make_and_validate_key(key, version=version), value)
+            self._count("misses", sum(1 for key in remote_keys if self.is_local(key) and key not in fetched))
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.remote.set(key, value, timeout=timeout, version=version)
+        if self.is_local(key):
+            self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.remote.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if self.is_local(key) and key not in failed:
+                self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.remote.add(key, value, timeout=timeout, version=version)
+        if added and self.is_local(key):
+            self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.is_local(key):
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.remote.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        if self.is_local(key):
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.remote.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            if self.is_local(key):
+                self._local_delete(self.make_and_validate_key(key, version=version))
+        self.remote.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self.is_local(key) and self._local_get(self.make_and_validate_key(key, version=version)) is not None:
+            return True
+        return self.remote.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        if self.is_local(key):
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.remote.incr(key, delta, version=version)
+
+    def clear(self):
+        with self._tier.lock:
+            self._tier.entries.clear()
+            self._tier.bytes = 0
+            self._tier.local_hits = self._tier.remote_hits = self._tier.misses = 0
+        self.remote.clear()
+
+    def close(self, **kwargs):
+        self.remote.close(**kwargs)
@@ -0,0 +1,59 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from recommendations.models import UserSearchHistory
+from recommendations.services.ai_recommender import compute_embeddings, history_text
+from recommendations.services.embedding_codec import encode_embedding
+from recommendations.services.taste_profile import mark_stale
+from recommendations.services.vector_index import bump_index_generation
+
+
+class Command(BaseCommand):
+    help = "Compute UserSearchHistory embeddings in batches (missing ones, or all after a model change)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows embedded and saved per batch")
+        parser.add_argument('--all', action='store_true', help="Re-embed every row, not just rows without an embedding")
+        parser.add_argument('--checkpoint', type=str, default='.backfill_embeddings.json',
+                            help="File recording the last processed id")
+        parser.add_argument('--resume', action='store_true', help="Continue after the id stored in --checkpoint")
+
+    def handle(self, *args, **kwargs):
+        chunk_size = kwargs['chunk_size']
+        checkpoint = Path(kwargs['checkpoint'])
+
+        rows = UserSearchHistory.objects.order_by('id').only('id', 'user_id', 'preferences', 'recommendations')
+        if not kwargs['all']:
+            rows = rows.filter(embedding=None)
+
+        last_id = 0
+        if kwargs['resume'] and checkpoint.exists():
+            last_id = json.loads(checkpoint.read_text()).get('last_id', 0)
+            self.stdout.write(f"Resuming after history id {last_id}")
+
+        done = 0
+        started = time.monotonic()
+        while True:
+            chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+
+            texts = [history_text(row.preferences, row.recommendations) for row in chunk]
+            for row, vector in zip(chunk, compute_embeddings(texts)):
+                row.embedding = encode_embedding(vector)
+            UserSearchHistory.objects.bulk_update(chunk, ['embedding'], batch_size=500)
+            # bulk_update skips model signals: tell running servers to reload their indexes and have
+            # these users' taste profiles rebuilt, per chunk so a crashed run leaves nothing behind
+            bump_index_generation()
+            mark_stale(*sorted({row.user_id for row in chunk}))
+
+            last_id = chunk[-1].id
+            checkpoint.write_text(json.dumps({'last_id': last_id}))
+            done += len(chunk)
+            rate = done / max(time.monotonic() - started, 1e-9)
+            self.stdout.write(f"Embedded {done} rows (last id {last_id}, {rate:.0f} rows/s)")
+
+        checkpoint.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(f"Backfill complete: {done} rows embedded."))
@@ -0,0 +1,37 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from recommendations.services.batch import run_batch
+
+
+class Command(BaseCommand):
+    help = "Precompute recommendations for many (user_id, preferences) pairs and write NDJSON results"
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='NDJSON file of {"user_id": ..., "preferences": {...}} lines, or - for stdin')
+        parser.add_argument('--output', type=str, default='-', help="NDJSON results file, or - for stdout")
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help="LLM + enrichment calls in flight (default: BATCH_RECOMMENDATION_CONCURRENCY)")
+
+    def handle(self, *args, **kwargs):
+        source = sys.stdin if kwargs['input'] == '-' else open(kwargs['input'], encoding='utf-8')
+        try:
+            items = [json.loads(line) for line in source if line.strip()]
+        except json.JSONDecodeError as e:
+            raise CommandError(f"Invalid NDJSON input: {e}")
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        output = self.stdout if kwargs['output'] == '-' else open(kwargs['output'], 'w', encoding='utf-8')
+        try:
+            for line in run_batch(items, concurrency=kwargs['concurrency']):
+                output.write(json.dumps(line) + ("" if output is self.stdout else "\n"))
+                if line.get("done"):
+                    self.stderr.write(
+                        f"Batch complete: {line['count']} ok, {line['errors']} errors in {line['seconds']}s"
+                    )
+        finally:
+            if output is not self.stdout:
+                output.close()
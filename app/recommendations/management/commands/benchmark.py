@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from recommendations.benchmarks.fakes import FakeGoogleBooksServer, FakeOpenAIServer, LatencyProfile
+from recommendations.benchmarks.load import AppServer, run_load
+from recommendations.benchmarks.micro import run_micro_benchmarks
+from recommendations.services.embedding_cache import EMBEDDING_CACHE_REQUESTS
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+CACHE_RESULTS = ("local_hit", "shared_hit", "miss")
+
+
+class Command(BaseCommand):
+    help = "Run micro-benchmarks, or a load test of the ai/ endpoint against local fake OpenAI and Google Books servers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=['micro', 'load'])
+        parser.add_argument('--history-rows', type=int, default=2000, help="micro: history rows per user")
+        parser.add_argument('--dim', type=int, default=1536, help="Embedding dimension")
+
+        parser.add_argument('--requests', type=int, default=200, help="load: total requests")
+        parser.add_argument('--concurrency', type=int, default=20, help="load: concurrent clients")
+        parser.add_argument('--users', type=int, default=20, help="load: distinct users")
+        parser.add_argument('--profiles', type=int, default=10, help="load: distinct preference payloads")
+        parser.add_argument('--path', type=str, default='/recommendations/ai/', help="load: endpoint path")
+        parser.add_argument('--openai-latency', type=float, default=0.5, help="load: seconds per OpenAI call")
+        parser.add_argument('--openai-jitter', type=float, default=0.2)
+        parser.add_argument('--openai-error-rate', type=float, default=0.0)
+        parser.add_argument('--google-latency', type=float, default=0.1, help="load: seconds per Google Books call")
+        parser.add_argument('--google-jitter', type=float, default=0.05)
+        parser.add_argument('--google-error-rate', type=float, default=0.0)
+        parser.add_argument('--tail-latency', type=float, default=0.0, help="load: extra seconds on tail calls")
+        parser.add_argument('--tail-rate', type=float, default=0.0, help="load: fraction of calls that hit the tail")
+        parser.add_argument('--shared-cache', action='store_true',
+                            help="load: use the configured CACHES (e.g. Redis) instead of a local-memory cache")
+
+    def handle(self, *args, **kwargs):
+        if kwargs['scenario'] == 'micro':
+            self.run_micro(kwargs)
+        else:
+            self.run_load(kwargs)
+
+    def run_micro(self, kwargs):
+        results = run_micro_benchmarks(history_rows=kwargs['history_rows'], dim=kwargs['dim'])
+        width = max(len(name) for name in results)
+        self.stdout.write(f"{'benchmark':<{width}}  {'mean µs':>10}  {'p50 µs':>10}  {'p99 µs':>10}")
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<{width}}  {stats['mean_us']:>10.1f}  {stats['p50_us']:>10.1f}  {stats['p99_us']:>10.1f}"
+            )
+
+    def run_load(self, kwargs):
+        openai_profile = LatencyProfile(
+            base=kwargs['openai_latency'], jitter=kwargs['openai_jitter'], error_rate=kwargs['openai_error_rate'],
+            tail=kwargs['tail_latency'], tail_rate=kwargs['tail_rate'],
+        )
+        google_profile = LatencyProfile(
+            base=kwargs['google_latency'], jitter=kwargs['google_jitter'], error_rate=kwargs['google_error_rate'],
+            tail=kwargs['tail_latency'], tail_rate=kwargs['tail_rate'],
+        )
+
+        # Throwaway file-backed test database, so concurrent request threads can all write to it
+        db_dir = tempfile.mkdtemp(prefix="bench-db-")
+        test_settings = connections['default'].settings_dict.setdefault('TEST', {})
+        if connections['default'].vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(db_dir, 'bench.sqlite3')
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+
+        try:
+            with FakeOpenAIServer(openai_profile, embedding_dim=kwargs['dim']) as fake_openai, \
+                    FakeGoogleBooksServer(google_profile) as fake_google:
+                overrides = {
+                    'OPENAI_API_KEY': 'benchmark',
+                    'OPENAI_BASE_URL': fake_openai.base_url,
+                    'GOOGLE_BOOKS_API_KEY': 'benchmark',
+                    'GOOGLE_BOOKS_API_URL': fake_google.api_url,
+                    'ALLOWED_HOSTS': ['127.0.0.1', 'localhost'],
+                }
+                if not kwargs['shared_cache']:
+                    overrides['CACHES'] = LOCMEM_CACHE
+
+                with override_settings(**overrides):
+                    user_ids = [
+                        User.objects.create(username=f"bench-{i}").id for i in range(kwargs['users'])
+                    ]
+                    cache_before = {
+                        result: EMBEDDING_CACHE_REQUESTS.value(result=result) for result in CACHE_RESULTS
+                    }
+                    with AppServer() as app:
+                        report = run_load(
+                            app.url, user_ids,
+                            requests=kwargs['requests'],
+                            concurrency=kwargs['concurrency'],
+                            distinct_profiles=kwargs['profiles'],
+                            path=kwargs['path'],
+                        )
+
+                report['openai_calls'] = fake_openai.requests
+                report['google_books_calls'] = fake_google.requests
+                for result in CACHE_RESULTS:
+                    report[f'embedding_cache_{result}'] = (
+                        EMBEDDING_CACHE_REQUESTS.value(result=result) - cache_before[result]
+                    )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        for key, value in report.items():
+            self.stdout.write(f"{key:>26}: {value:.2f}" if isinstance(value, float) else f"{key:>26}: {value}")
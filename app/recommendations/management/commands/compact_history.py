@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from recommendations.models import UserSearchHistory
+from recommendations.services.history_retention import compact_histories, get_retention_settings, users_to_compact
+
+
+class Command(BaseCommand):
+    help = "Merge near-duplicate history rows, cap rows per user and archive the rest to .npz files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', default=[], help="User id; repeat for several")
+        parser.add_argument('--all', action='store_true',
+                            help="Check every user with history for duplicates, not just users over the limits")
+        parser.add_argument('--max-rows', type=int, default=None, help='Rows kept per user (default: HISTORY_RETENTION)')
+        parser.add_argument('--max-age-days', type=int, default=None, help="Archive rows older than this")
+        parser.add_argument('--threshold', type=float, default=None, help="Cosine similarity counted as a duplicate")
+        parser.add_argument('--archive-dir', type=str, default=None, help="Where archive files are written")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be archived without changes")
+
+    def handle(self, *args, **kwargs):
+        options = get_retention_settings()
+        for option, key in (('max_rows', 'max_rows'), ('max_age_days', 'max_age_days'),
+                            ('threshold', 'duplicate_threshold')):
+            if kwargs[option] is not None:
+                options[key] = kwargs[option]
+
+        if kwargs['user']:
+            user_ids = kwargs['user']
+        elif kwargs['all']:
+            user_ids = list(UserSearchHistory.objects.values_list('user_id', flat=True).distinct().order_by('user_id'))
+        else:
+            user_ids = users_to_compact(options)
+
+        stats = compact_histories(user_ids, options, dry_run=kwargs['dry_run'], directory=kwargs['archive_dir'])
+        for path in stats['files']:
+            self.stdout.write(f"Archived to {path}")
+        verb = "Would archive" if kwargs['dry_run'] else "Archived"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {stats['archived']} rows ({stats['duplicates']} near-duplicates) from {stats['users']} users; "
+            f"{stats['kept']} rows kept."
+        ))
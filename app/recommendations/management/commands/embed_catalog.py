@@ -0,0 +1,43 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from recommendations.models import Book
+from recommendations.services.ai_recommender import EMBEDDING_MODEL, compute_embeddings
+from recommendations.services.catalog_index import CatalogIndexWriter, book_text, get_index_path
+
+
+class Command(BaseCommand):
+    help = "Embed every Book into the memory-mapped catalog index used for candidate retrieval"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Books embedded per batch")
+        parser.add_argument('--path', type=str, default=None,
+                            help='Index directory (default: CATALOG_CANDIDATES["path"])')
+
+    def handle(self, *args, **kwargs):
+        chunk_size = kwargs['chunk_size']
+        path = Path(kwargs['path']) if kwargs['path'] else get_index_path()
+
+        # Books added while this runs are picked up by the next run
+        ids = list(Book.objects.order_by('id').values_list('id', flat=True))
+        writer = CatalogIndexWriter(path, len(ids))
+
+        done = 0
+        started = time.monotonic()
+        for start in range(0, len(ids), chunk_size):
+            chunk_ids = ids[start:start + chunk_size]
+            books = Book.objects.only('id', 'title', 'author', 'genre', 'description').in_bulk(chunk_ids)
+            present = [book_id for book_id in chunk_ids if book_id in books]
+            # Unchanged books hit the embedding cache, so reruns mostly embed what is new
+            vectors = dict(zip(present, compute_embeddings([book_text(books[book_id]) for book_id in present])))
+            writer.write(start, chunk_ids, [vectors.get(book_id) for book_id in chunk_ids])
+
+            done += len(chunk_ids)
+            rate = done / max(time.monotonic() - started, 1e-9)
+            self.stdout.write(f"Embedded {done}/{len(ids)} books ({rate:.0f} books/s)")
+
+        if writer.commit(EMBEDDING_MODEL):
+            self.stdout.write(self.style.SUCCESS(f"Catalog index written to {path}: {done} books."))
+        else:
+            self.stdout.write(self.style.WARNING("No books to embed; the catalog index was left unchanged."))
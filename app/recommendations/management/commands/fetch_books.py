@@ -1,28 +1,132 @@
-from django.core.management.base import BaseCommand
-from recommendations.services.google_books import fetch_books
-from recommendations.models import Book
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recommendations.services.catalog import upsert_volumes
+from recommendations.services.google_books import fetch_volume_page
+from recommendations.services.resilience import UpstreamUnavailable, get_breaker
+
 
 class Command(BaseCommand):
-    help = "Fetch books from Google Books API and store them in the database"
+    help = "Ingest Google Books search results into the Book catalog (paged, concurrent, resumable)"
 
     def add_arguments(self, parser):
-        parser.add_argument('--query', type=str, help="Search query (genre, author, or keyword)", required=True)
+        parser.add_argument('--query', action='append', default=[],
+                            help="Search query (genre, author, subject:..., ...); repeat for several")
+        parser.add_argument('--queries-file', type=str, help="File with one search query per line")
+        parser.add_argument('--pages', type=int, default=25, help="Max result pages per query")
+        parser.add_argument('--page-size', type=int, default=40, help="Results per page (API maximum is 40)")
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help="Pages fetched at once (default: GOOGLE_BOOKS_MAX_WORKERS)")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Books per bulk upsert")
+        parser.add_argument('--checkpoint', type=str, default='.fetch_books.json',
+                            help="File recording each query's ingested pages")
+        parser.add_argument('--resume', action='store_true', help="Skip pages already recorded in --checkpoint")
 
     def handle(self, *args, **kwargs):
-        query = kwargs['query']
-        self.stdout.write(f"Fetching books for query: {query}")
+        queries = list(kwargs['query'])
+        if kwargs['queries_file']:
+            queries += Path(kwargs['queries_file']).read_text(encoding='utf-8').splitlines()
+        queries = list(dict.fromkeys(q.strip() for q in queries if q.strip()))
+        if not queries:
+            raise CommandError("Give at least one --query or a --queries-file")
 
-        books_data = fetch_books(query)  # ✅ Use service function
-        if not books_data:
-            self.stdout.write("No books found.")
-            return
+        self.page_size = min(kwargs['page_size'], 40)
+        self.limit = kwargs['pages'] * self.page_size
+        self.batch_size = kwargs['batch_size']
+        self.checkpoint = Path(kwargs['checkpoint'])
+        concurrency = kwargs['concurrency'] or getattr(settings, "GOOGLE_BOOKS_MAX_WORKERS", 10)
+
+        # Per query: every start index below "next" is in the catalog; "end" is where results ran out
+        self.state = {query: {"next": 0, "end": self.limit} for query in queries}
+        if kwargs['resume'] and self.checkpoint.exists():
+            saved = json.loads(self.checkpoint.read_text()).get('queries', {})
+            for query, progress in saved.items():
+                if query in self.state:
+                    self.state[query].update(progress)
+            started = sum(1 for progress in self.state.values() if progress['next'])
+            self.stdout.write(f"Resuming from {self.checkpoint} ({started} queries already started)")
+
+        self.flushed = {query: set() for query in queries}
+        self.buffer, self.buffer_pages = [], []
+        self.ingested = self.pages_done = self.failed = 0
+        self.started = time.monotonic()
+
+        tasks = self.page_tasks(queries)
+        aborted = False
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest") as executor:
+            in_flight = {}
 
-        for book_info in books_data:
-            if Book.objects.filter(google_books_id=book_info["google_books_id"]).exists():
-                self.stdout.write(f"Skipping duplicate: {book_info['title']}")
-                continue
+            def submit_more():
+                while not aborted and len(in_flight) < concurrency * 2:
+                    task = next(tasks, None)
+                    if task is None:
+                        return
+                    query, start = task
+                    if start < self.state[query]["end"]:
+                        in_flight[executor.submit(fetch_volume_page, query, start, self.page_size)] = task
+
+            submit_more()
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    query, start = in_flight.pop(future)
+                    try:
+                        volumes, total = future.result()
+                    except UpstreamUnavailable as e:
+                        self.failed += 1
+                        self.stderr.write(f"Page {start} of {query!r} failed: {e}")
+                        if get_breaker("google_books").state == "open":
+                            aborted = True  # Stop queueing; in-flight pages still finish
+                        continue
+                    if len(volumes) < self.page_size or start + self.page_size >= total:
+                        self.state[query]["end"] = min(self.state[query]["end"], start + self.page_size)
+                    self.buffer.extend(volumes)
+                    self.buffer_pages.append((query, start))
+                    self.pages_done += 1
+                    if len(self.buffer) >= self.batch_size:
+                        self.flush()
+                submit_more()
+        self.flush()
+
+        complete = not aborted and not self.failed
+        if complete:
+            self.checkpoint.unlink(missing_ok=True)
+            self.stdout.write(self.style.SUCCESS(
+                f"Ingestion complete: {self.ingested} books from {self.pages_done} pages ({self.rate():.0f} books/s)."
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"Stopped with {self.failed} failed pages after {self.ingested} books; "
+                f"rerun with --resume to continue from {self.checkpoint}."
+            ))
+
+    def page_tasks(self, queries):
+        """(query, start index) pairs, one page of every query at a time so no single query is hammered."""
+        for start in range(0, self.limit, self.page_size):
+            for query in queries:
+                if start >= self.state[query]["next"]:
+                    yield query, start
+
+    def flush(self):
+        """Upserts the buffered volumes, then records their pages in the checkpoint."""
+        if not self.buffer_pages:
+            return
+        if self.buffer:
+            # Rows a batch repeats collapse into one, so count what was written
+            self.ingested += len(upsert_volumes(self.buffer))
+        for query, start in self.buffer_pages:
+            self.flushed[query].add(start)
+        self.buffer, self.buffer_pages = [], []
 
-            Book.objects.create(**book_info)  # ✅ Save book
-            self.stdout.write(f"Saved: {book_info['title']}")
+        for query, progress in self.state.items():
+            while progress["next"] in self.flushed[query]:
+                progress["next"] += self.page_size
+        self.checkpoint.write_text(json.dumps({'queries': self.state}))
+        self.stdout.write(f"Ingested {self.ingested} books from {self.pages_done} pages ({self.rate():.0f} books/s)")
 
-        self.stdout.write("Book fetching complete.")
\ No newline at end of file
+    def rate(self):
+        return self.ingested / max(time.monotonic() - self.started, 1e-9)
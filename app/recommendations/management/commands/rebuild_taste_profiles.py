@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from recommendations.models import UserTasteProfile
+from recommendations.services.taste_profile import rebuild_taste_profile
+
+
+class Command(BaseCommand):
+    help = "Rebuild user taste profiles from history and feedback (stale ones, or all with --all)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', default=[], help="User id; repeat for several")
+        parser.add_argument('--all', action='store_true', help="Every user with history, not just stale profiles")
+
+    def handle(self, *args, **kwargs):
+        if kwargs['user']:
+            user_ids = kwargs['user']
+        elif kwargs['all']:
+            user_ids = User.objects.filter(usersearchhistory__isnull=False).distinct().values_list('id', flat=True)
+        else:
+            user_ids = UserTasteProfile.objects.filter(stale=True).values_list('user_id', flat=True)
+
+        done = 0
+        for user_id in list(user_ids):
+            rebuild_taste_profile(user_id)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {done} taste profiles."))
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from recommendations.services.history_retention import restore_archive
+from recommendations.services.taste_profile import mark_stale
+
+
+class Command(BaseCommand):
+    help = "Re-import UserSearchHistory rows from archive files written by compact_history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Archive .npz files, or directories of them")
+
+    def handle(self, *args, **kwargs):
+        files = []
+        for path in map(Path, kwargs['paths']):
+            if path.is_dir():
+                files.extend(sorted(path.glob('history-*.npz')))
+            elif path.exists():
+                files.append(path)
+            else:
+                raise CommandError(f"No such archive: {path}")
+
+        restored, user_ids = 0, set()
+        for path in files:
+            counts = restore_archive(path)
+            restored += sum(counts.values())
+            user_ids.update(counts)
+            self.stdout.write(f"Restored {sum(counts.values())} rows from {path}")
+        mark_stale(*sorted(user_ids))  # Rebuild these users' taste profiles with the restored rows
+        self.stdout.write(self.style.SUCCESS(f"Restore complete: {restored} rows from {len(files)} files."))
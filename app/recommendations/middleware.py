@@ -0,0 +1,59 @@
+# middleware.py
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from recommendations.services.instrumentation import REQUEST_SECONDS, start_trace
+
+logger = logging.getLogger("recommendations.trace")
+
+
+class TraceMiddleware:
+    """
+    Opens a request-scoped trace that pipeline spans record into, then observes the
+    request latency, adds a Server-Timing header and logs one summary line: at INFO for
+    requests slower than TRACE_SLOW_REQUEST_SECONDS, otherwise at DEBUG.
+
+    Streaming responses are traced up to the point the response starts; stages that run
+    while the body streams still land in the stage histograms.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with start_trace(request.path) as trace:
+            response = self.get_response(request)
+        self.finish(request, response, trace)
+        return response
+
+    async def __acall__(self, request):
+        with start_trace(request.path) as trace:
+            response = await self.get_response(request)
+        self.finish(request, response, trace)
+        return response
+
+    def finish(self, request, response, trace):
+        elapsed = trace.elapsed
+        match = getattr(request, "resolver_match", None)
+        view = match.url_name if match and match.url_name else "unmatched"
+        REQUEST_SECONDS.observe(elapsed, view=view, status=response.status_code)
+
+        if trace.spans:
+            response["Server-Timing"] = trace.server_timing()
+
+        slow = elapsed >= getattr(settings, "TRACE_SLOW_REQUEST_SECONDS", 2.0)
+        level = logging.INFO if slow else logging.DEBUG
+        if logger.isEnabledFor(level):
+            stages = " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in trace.stage_totals().items())
+            logger.log(level, "trace=%s view=%s status=%s total=%.1fms %s",
+                       trace.id, view, response.status_code, elapsed * 1000, stages)
@@ -0,0 +1,89 @@
+# Converts UserSearchHistory.embedding from a JSON float list to a packed binary vector.
+
+import struct
+
+import numpy as np
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# Frozen copy of the version 1 blob format from services/embedding_codec.py, so this
+# migration keeps working if the runtime codec changes: a 4-byte header (version,
+# dtype code, dimension), a float32 scale for int8, then the little-endian vector.
+_HEADER = struct.Struct("<BBH")
+_SCALE = struct.Struct("<f")
+_VERSION = 1
+_FLOAT32 = 1
+_CODES = {1: np.dtype("<f4"), 2: np.dtype("<f2"), 3: np.dtype("i1")}
+
+
+def encode_embedding(vector):
+    """Packs a JSON float list as a version 1 float32 blob."""
+    if vector is None:
+        return None
+    arr = np.asarray(vector, dtype=np.float32).reshape(-1)
+    return _HEADER.pack(_VERSION, _FLOAT32, arr.size) + arr.astype("<f4").tobytes()
+
+
+def decode_embedding(blob):
+    """Unpacks any version 1 blob (float32, float16 or int8) into a float32 array."""
+    if blob is None:
+        return None
+    buf = memoryview(blob)
+    version, code, dim = _HEADER.unpack_from(buf)
+    if version != _VERSION or code not in _CODES:
+        raise ValueError("Unrecognized embedding blob")
+    offset = _HEADER.size
+    scale = 1.0
+    if code == 3:
+        (scale,) = _SCALE.unpack_from(buf, offset)
+        offset += _SCALE.size
+    values = np.frombuffer(buf, dtype=_CODES[code], count=dim, offset=offset)
+    return values.astype(np.float32) * np.float32(scale)
+
+
+def _convert(apps, source, target, transform):
+    UserSearchHistory = apps.get_model('recommendations', 'UserSearchHistory')
+    rows = UserSearchHistory.objects.exclude(**{source: None}).only('id', source)
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        setattr(row, target, transform(getattr(row, source)))
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            UserSearchHistory.objects.bulk_update(batch, [target])
+            batch = []
+    if batch:
+        UserSearchHistory.objects.bulk_update(batch, [target])
+
+
+def json_to_binary(apps, schema_editor):
+    _convert(apps, 'embedding', 'embedding_blob', encode_embedding)
+
+
+def binary_to_json(apps, schema_editor):
+    _convert(apps, 'embedding_blob', 'embedding', lambda blob: decode_embedding(blob).tolist())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0003_usersearchhistory_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersearchhistory',
+            name='embedding_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name='usersearchhistory',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='usersearchhistory',
+            old_name='embedding_blob',
+            new_name='embedding',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0004_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersearchhistory',
+            name='validated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='usersearchhistory',
+            name='validation_summary',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
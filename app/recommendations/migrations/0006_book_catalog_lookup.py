@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0005_usersearchhistory_validation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='authors',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='info_link',
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='lookup_key',
+            field=models.CharField(blank=True, db_index=True, max_length=512, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='normalized_title',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_stale_profiles(apps, schema_editor):
+    """
+    Users with history or feedback from before this migration get a stale profile, so
+    their first read rebuilds it from everything instead of incremental updates
+    starting from an empty one.
+    """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    UserTasteProfile = apps.get_model("recommendations", "UserTasteProfile")
+    users = User.objects.filter(
+        models.Q(usersearchhistory__isnull=False) | models.Q(userbookfeedback__isnull=False)
+    ).distinct().values_list("id", flat=True)
+    UserTasteProfile.objects.bulk_create(
+        [UserTasteProfile(user_id=user_id, stale=True) for user_id in users.iterator()], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0007_book_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTasteProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', models.BinaryField(blank=True, null=True)),
+                ('history_sum', models.BinaryField(blank=True, null=True)),
+                ('history_weight', models.FloatField(default=0.0)),
+                ('history_at', models.DateTimeField(blank=True, null=True)),
+                ('liked_sum', models.BinaryField(blank=True, null=True)),
+                ('liked_count', models.IntegerField(default=0)),
+                ('disliked_sum', models.BinaryField(blank=True, null=True)),
+                ('disliked_count', models.IntegerField(default=0)),
+                ('stale', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='taste_profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_stale_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0008_user_taste_profile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userbookfeedback',
+            index=models.Index(fields=['user', 'feedback'], name='feedback_user_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersearchhistory',
+            index=models.Index(fields=['user', 'created_at'], name='history_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersearchhistory',
+            index=models.Index(condition=models.Q(('embedding__isnull', False)), fields=['user', 'id'], name='history_user_embedded_idx'),
+        ),
+    ]
@@ -24,10 +24,25 @@ class Book(models.Model):
     page_count = models.IntegerField(blank=True, null=True)
     cover_image = models.URLField(blank=True, null=True)
     average_rating = models.FloatField(blank=True, null=True)
+    authors = models.JSONField(default=list, blank=True)
+    info_link = models.URLField(max_length=500, blank=True, null=True)
+    lookup_key = models.CharField(max_length=512, blank=True, null=True, db_index=True)  # "normalized title|author"
+    normalized_title = models.CharField(max_length=255, blank=True, null=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Lets the title resolver pick up changed rows
 
     def __str__(self):
         return self.title
 
+    def as_recommendation(self):
+        """Same shape as the enriched books returned by fetch_books."""
+        return {
+            "title": self.title,
+            "authors": self.authors or [self.author or "Unknown Author"],
+            "description": self.description or "No description available.",
+            "thumbnail": self.cover_image or "",
+            "info_link": self.info_link or "#",
+        }
+
 class UserBookFeedback(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     book_title = models.CharField(max_length=255, default="Book Title")
@@ -36,6 +51,9 @@ class UserBookFeedback(models.Model):
 
     class Meta:
         unique_together = ('user', 'book_title')  # Prevent duplicate feedback at DB level
+        indexes = [
+            models.Index(fields=['user', 'feedback'], name='feedback_user_value_idx'),  # A user's likes or dislikes
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.book_title} - {self.feedback}"
@@ -44,5 +62,38 @@ class UserSearchHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     preferences = models.JSONField()
     recommendations = models.JSONField()
-    embedding = models.JSONField(null=True, blank=True)
+    embedding = models.BinaryField(null=True, blank=True)  # Packed by services.embedding_codec
     created_at = models.DateTimeField(auto_now_add=True)
+    validation_summary = models.TextField(null=True, blank=True)  # Filled in by services.validation_queue
+    validated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Newest-first scans per user (history retention, recent history)
+            models.Index(fields=['user', 'created_at'], name='history_user_created_idx'),
+            # Vector index and taste profile loads: a user's embedded rows in id order.
+            # Queries must say embedding__isnull=False for the planner to match the condition.
+            models.Index(fields=['user', 'id'], condition=models.Q(embedding__isnull=False),
+                         name='history_user_embedded_idx'),
+        ]
+
+class UserTasteProfile(models.Model):
+    """
+    Running taste vector per user, updated incrementally by services.taste_profile:
+    a decayed centroid of history embeddings plus liked-book embeddings, minus disliked ones.
+    The sums are kept so each new history row or feedback change is an O(1) update.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="taste_profile")
+    vector = models.BinaryField(null=True, blank=True)  # Unit taste vector, packed by services.embedding_codec
+    history_sum = models.BinaryField(null=True, blank=True)  # Decayed sum of unit history embeddings (float32)
+    history_weight = models.FloatField(default=0.0)
+    history_at = models.DateTimeField(null=True, blank=True)  # Time the decay was last applied to history_sum
+    liked_sum = models.BinaryField(null=True, blank=True)
+    liked_count = models.IntegerField(default=0)
+    disliked_sum = models.BinaryField(null=True, blank=True)
+    disliked_count = models.IntegerField(default=0)
+    stale = models.BooleanField(default=False)  # An update was missed; rebuilt from scratch on next read
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Taste profile for {self.user_id}"
@@ -0,0 +1,34 @@
+# permissions.py
+
+import hmac
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.permissions import BasePermission
+
+METRICS_SCRAPER = "metrics-token"
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """
+    Accepts "Authorization: Bearer <METRICS_TOKEN>" so a Prometheus scraper can read
+    metrics/ without a user account. Any other header is left to the JWT authentication.
+    """
+
+    def authenticate(self, request):
+        token = getattr(settings, "METRICS_TOKEN", None)
+        parts = get_authorization_header(request).split()
+        if not token or len(parts) != 2 or parts[0].lower() != b"bearer":
+            return None
+        if not hmac.compare_digest(parts[1], token.encode()):
+            return None
+        return AnonymousUser(), METRICS_SCRAPER
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="metrics"'  # Unauthenticated requests get a 401 rather than a 403
+
+
+class HasMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        return request.auth == METRICS_SCRAPER
@@ -1,78 +1,316 @@
 # ai_recommender.py
 
+import asyncio
+import logging
+import weakref
+
 import openai
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from recommendations.models import UserBookFeedback, UserSearchHistory
-import numpy as np
+from recommendations.models import UserSearchHistory
+from recommendations.services.catalog_index import candidate_books, get_candidate_settings, get_catalog_index
+from recommendations.services.completion_cache import get_completion_cache
+from recommendations.services.embedding_cache import get_embedding_cache
+from recommendations.services.embedding_codec import encode_embedding
+from recommendations.services.fallback import fallback_recommendations
+from recommendations.services.feedback import aget_feedback_snapshot, get_feedback_snapshot
+from recommendations.services.instrumentation import span
+from recommendations.services.normalization import canonicalize, clean_recommendation_line
+from recommendations.services.prompt_builder import budgeted_prompt, count_tokens, record_prompt_stats
+from recommendations.services.resilience import UpstreamUnavailable, acall_upstream, call_upstream
+from recommendations.services.taste_profile import blend_query, get_taste_vector
+from recommendations.services.validation_queue import schedule_validation
+from recommendations.services.vector_index import get_vector_index
+
+CHAT_MODEL = "gpt-3.5-turbo"
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+logger = logging.getLogger(__name__)
 
 
 def fetch_ai_book_recommendations(user_preferences, user=None):
     """
     Queries GPT-3.5 to get book recommendations based on user preferences
     and enriches it with the user’s past search history.
-    Returns a list of strings formatted as "Title by Author".
+    Returns a list of strings formatted as "Title by Author". If OpenAI is unavailable
+    (open circuit, or every attempt failed before the deadline) the list is a
+    DegradedRecommendations built from the Book catalog instead.
+    With CATALOG_CANDIDATES["mode"] set to "rerank" or "fast", GPT only picks from the
+    closest catalog books, or is skipped and those books are returned as they rank.
     """
 
-    client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+    prompt, top_histories, feedback, candidates = prepare_recommendation_prompt(user_preferences, user)
+
+    try:
+        content = None
+        if prompt is not None:
+            content = complete_chat(prompt, similarity_text(user_preferences, top_histories, feedback))
+
+        with span("parsing"):
+            parsed = parse_completion(content, candidates)
+
+            # ✅ Apply feedback filter if user is logged in
+            if user:
+                parsed = improve_recommendations(user, parsed, feedback)
 
-    def cosine_similarity(vec1, vec2):
-        vec1 = np.array(vec1)
-        vec2 = np.array(vec2)
-        return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+        # 💾 Save search + recommendations to DB (with embedding)
+        if user:
+            record_search_history(user, user_preferences, parsed)
+            log_retrieved_histories(user, top_histories)
+        else:
+            logger.debug("📖 No user provided — skipping history logging.")
+
+        # ✅ Return clean format: "Title by Author"
+        return format_recommendations(parsed)
+
+    except UpstreamUnavailable as e:
+        logger.warning("⚠️ Serving fallback recommendations: %s", e)
+    except Exception:
+        logger.exception("🔥 Error in AI Recommendation")
+    return fallback_recommendations(user_preferences, feedback)
+
+
+def log_retrieved_histories(user, top_histories):
+    """Debug view of the histories fed into the prompt (ids and scores only)."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📖 History used for user %s: %s", user.id,
+                     ", ".join(f"{h.id}:{score:.4f}" for h, score in top_histories) or "none")
+
+
+def prepare_recommendation_prompt(user_preferences, user=None):
+    """
+    Gathers the user's context (similar past histories, feedback, catalog candidates) and
+    builds the GPT prompt. Returns (prompt, top_histories, feedback, candidates) where feedback
+    is the user's FeedbackSnapshot and candidates a list of Books (empty unless
+    CATALOG_CANDIDATES["mode"] is "rerank" or "fast" and the catalog index is built).
+    prompt is None when the candidates are to be returned without asking GPT.
+    """
 
     # 🧠 Retrieve most similar past user history (RAG style)
-    history_summary = ""
     top_histories = []
+    current_embedding = taste = None
     if user:
         try:
             # ✅ Compute embedding for current preferences
-            current_text = f"Prefs: {user_preferences}"
-            current_embedding = compute_embedding(current_text)
+            current_embedding = compute_embedding(preferences_text(user_preferences))
+
+            # ✅ Top 5 similar histories from the per-user vector index, nudged towards the user's taste
+            taste = get_taste_vector(user)
+            query = blend_query(current_embedding, taste)
+            top_histories = retrieve_similar_histories(user, query, k=5)
+
+            logger.debug("🔍 Retrieved %d most similar past histories for user %s", len(top_histories), user.id)
 
-            # ✅ Retrieve all past histories with embeddings
-            histories = UserSearchHistory.objects.filter(user=user).exclude(embedding=None)
+        except Exception as e:
+            logger.warning("⚠️ Failed to retrieve similar histories: %s", e)
+    else:
+        logger.debug("📖 No user provided — skipping history retrieval and disliked books check.")
 
-            # ✅ Compute similarity scores
-            scored_histories = [
-                (h, cosine_similarity(current_embedding, h.embedding))
-                for h in histories
-            ]
+    # 📖 Likes and dislikes, loaded once and shared with improve_recommendations
+    with span("feedback"):
+        feedback = get_feedback_snapshot(user)
 
-            # ✅ Print similarity scores
-            for (h, score) in scored_histories:
-                print(f"🔍 Similarity with history {h.id}: {score:.4f}")
+    candidates = []
+    if uses_catalog_candidates():
+        try:
+            if current_embedding is None:
+                current_embedding = compute_embedding(preferences_text(user_preferences))
+            candidates = find_catalog_candidates(current_embedding, taste, feedback, top_histories)
+        except Exception as e:
+            logger.warning("⚠️ Failed to retrieve catalog candidates: %s", e)
 
+    # 📢 Build GPT prompt
+    prompt = build_prompt(user_preferences, top_histories, feedback, candidates)
+    return prompt, top_histories, feedback, candidates
 
 
-            # ✅ Sort and get top 5 similar
-            top_histories = sorted(scored_histories, key=lambda x: x[1], reverse=True)[:5]
+def record_search_history(user, user_preferences, recommendations):
+    """
+    Embeds and saves a UserSearchHistory row, then queues its (sampled) validation.
+    Failures are logged and swallowed so they never cost the user their results.
+    """
+    try:
+        embedding = compute_embedding(history_text(user_preferences, recommendations))
+    except Exception as e:
+        # Saved without one; `manage.py backfill_embeddings` fills it in later
+        logger.warning("⚠️ Failed to compute embedding: %s", e)
+        embedding = None
 
-            # ✅ Build summary string
-            history_summary = "\n".join([
-                f"Prefs: {h.preferences}, Recs: {[r['title'] for r in h.recommendations]}"
-                for (h, score) in top_histories
-            ])
+    try:
+        history = save_search_history(user, user_preferences, recommendations, embedding)
+        logger.debug("📖 Saved search history %s for user %s", history.id, user.id)
 
-            print(f"🔍 Retrieved {len(top_histories)} most similar past histories for {user.username}")
-            # print(f"History Summary:\n{history_summary}")
+        # 🧠 Validate reasoning off the request path (sampled, stored on the history row)
+        schedule_validation(history, user_preferences)
+        return history
+    except Exception as e:
+        logger.warning("⚠️ Failed to save search history: %s", e)
+        return None
 
-        except Exception as e:
-            print(f"⚠️ Failed to retrieve similar histories: {str(e)}")
-    else:
-        print("📖 No user provided — skipping history retrieval.")
 
-    # 📖 Retrieve disliked books      
-    disliked_books = []
+async def afetch_ai_book_recommendations(user_preferences, user=None):
+    """
+    Async counterpart of fetch_ai_book_recommendations for ASGI views.
+    Awaits OpenAI through AsyncOpenAI and runs ORM/index work via async ORM or sync_to_async,
+    so the event loop is never blocked while upstream calls are in flight.
+    """
+
+    # 🧠 Retrieve most similar past user history (RAG style)
+    top_histories = []
+    current_embedding = taste = None
     if user:
-        disliked_books = list(UserBookFeedback.objects.filter(user=user, feedback="dislike")
-                            .values_list("book_title", flat=True))
-        # print(f"❌ Disliked books for {user.username}: {disliked_books}")
-    else:
-        disliked_books = []
-        print("❌ No user provided — skipping disliked books check.")  
+        try:
+            current_embedding = await acompute_embedding(preferences_text(user_preferences))
+            taste = await sync_to_async(get_taste_vector)(user)
+            query = blend_query(current_embedding, taste)
+            top_histories = await sync_to_async(retrieve_similar_histories)(user, query, k=5)
+            logger.debug("🔍 Retrieved %d most similar past histories for user %s", len(top_histories), user.id)
+        except Exception as e:
+            logger.warning("⚠️ Failed to retrieve similar histories: %s", e)
 
-    # 📢 Build GPT prompt
-    prompt = f"""
+    with span("feedback"):
+        feedback = await aget_feedback_snapshot(user)
+
+    candidates = []
+    if uses_catalog_candidates():
+        try:
+            if current_embedding is None:
+                current_embedding = await acompute_embedding(preferences_text(user_preferences))
+            candidates = await sync_to_async(find_catalog_candidates)(current_embedding, taste, feedback, top_histories)
+        except Exception as e:
+            logger.warning("⚠️ Failed to retrieve catalog candidates: %s", e)
+    prompt = await sync_to_async(build_prompt)(user_preferences, top_histories, feedback, candidates)
+
+    try:
+        content = None
+        if prompt is not None:
+            content = await acomplete_chat(prompt, similarity_text(user_preferences, top_histories, feedback))
+
+        with span("parsing"):
+            parsed = parse_completion(content, candidates)
+            if user:
+                parsed = improve_recommendations(user, parsed, feedback)
+
+        if user:
+            try:
+                embedding = await acompute_embedding(history_text(user_preferences, parsed))
+            except Exception as e:
+                logger.warning("⚠️ Failed to compute embedding: %s", e)
+                embedding = None
+
+            try:
+                history = await sync_to_async(save_search_history)(user, user_preferences, parsed, embedding)
+                logger.debug("📖 Saved search history %s for user %s", history.id, user.id)
+                await sync_to_async(schedule_validation)(history, user_preferences)
+            except Exception as e:
+                logger.warning("⚠️ Failed to save search history: %s", e)
+
+        return format_recommendations(parsed)
+
+    except UpstreamUnavailable as e:
+        logger.warning("⚠️ Serving fallback recommendations: %s", e)
+    except Exception:
+        logger.exception("🔥 Error in AI Recommendation")
+    return await sync_to_async(fallback_recommendations)(user_preferences, feedback)
+
+
+def complete_chat(prompt, similarity_text=None):
+    """
+    Returns the chat model's reply to `prompt`, going through the completion cache first.
+    With semantic matching enabled, `similarity_text` (see similarity_text()) is embedded
+    and a cached reply to a near-identical request is reused.
+    """
+    completion_cache = get_completion_cache()
+    if completion_cache is None:
+        return _create_completion(prompt)
+
+    content = completion_cache.get(CHAT_MODEL, prompt)
+    if content is not None:
+        return content
+
+    vector = None
+    if completion_cache.semantic and similarity_text:
+        try:
+            vector = compute_embedding(similarity_text)
+        except Exception as e:
+            logger.warning("⚠️ Failed to embed prompt for the completion cache: %s", e)
+        content = completion_cache.get_similar(CHAT_MODEL, vector)
+        if content is not None:
+            return content
+
+    content = _create_completion(prompt)
+    completion_cache.set(CHAT_MODEL, prompt, content, vector)
+    return content
+
+
+def _create_completion(prompt):
+    with span("llm"):
+        response = call_upstream("openai", lambda timeout: get_openai_client().chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout,
+        ))
+    return response.choices[0].message.content
+
+
+async def acomplete_chat(prompt, similarity_text=None):
+    completion_cache = get_completion_cache()
+    if completion_cache is None:
+        return await _acreate_completion(prompt)
+
+    content = await completion_cache.aget(CHAT_MODEL, prompt)
+    if content is not None:
+        return content
+
+    vector = None
+    if completion_cache.semantic and similarity_text:
+        try:
+            vector = await acompute_embedding(similarity_text)
+        except Exception as e:
+            logger.warning("⚠️ Failed to embed prompt for the completion cache: %s", e)
+        content = completion_cache.get_similar(CHAT_MODEL, vector)
+        if content is not None:
+            return content
+
+    content = await _acreate_completion(prompt)
+    await completion_cache.aset(CHAT_MODEL, prompt, content, vector)
+    return content
+
+
+async def _acreate_completion(prompt):
+    client = get_async_openai_client()
+    with span("llm"):
+        response = await acall_upstream("openai", lambda timeout: client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout,
+        ))
+    return response.choices[0].message.content
+
+
+def similarity_text(user_preferences, top_histories, feedback):
+    """
+    Text compared for semantic completion reuse, or None when the prompt carries per-user
+    context (past histories, disliked books) that a near match would not share.
+    It is the preferences text, whose embedding is usually cached already.
+    """
+    if top_histories or feedback.disliked_titles:
+        return None
+    return preferences_text(user_preferences)
+
+
+def preferences_text(user_preferences):
+    """Text embedded to find past histories similar to the current request."""
+    return f"Prefs: {user_preferences}"
+
+
+def history_text(user_preferences, recommendations):
+    """Text embedded and stored alongside a UserSearchHistory row."""
+    return f"Prefs: {user_preferences}, Recs: {[book['title'] for book in recommendations]}"
+
+
+def build_recommendation_prompt(user_preferences, history_summary, disliked_books):
+    return f"""
     The user has previously received the following recommendations:
     {history_summary}
 
@@ -93,89 +331,155 @@ def fetch_ai_book_recommendations(user_preferences, user=None):
     Format each recommendation as: "Title by Author"
     """
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
 
-        raw = response.choices[0].message.content.strip().split("\n")
-        parsed = []
+def uses_catalog_candidates():
+    return get_candidate_settings()["mode"] in ("rerank", "fast")
 
-        for line in raw:
-            if " by " in line:
-                title, author = line.strip().split(" by ", 1)
-                parsed.append({
-                    "title": title.strip(),
-                    "author": author.strip()
-                })
 
-        # ✅ Apply feedback filter if user is logged in
-        if user:
-            parsed = improve_recommendations(user, parsed)
+def find_catalog_candidates(embedding, taste, feedback, top_histories=()):
+    """
+    The catalog books closest to the preferences embedding (leaning towards the user's
+    taste vector), minus books the user has rated or was shown in the retrieved histories.
+    """
+    options = get_candidate_settings()
+    recent = {canonicalize(r["title"]) for h, _ in top_histories for r in h.recommendations}
+    with span("candidates"):
+        query = blend_query(embedding, taste, weight=options["taste_weight"])
+        hits = get_catalog_index().search(query, n=options["top_n"] * 2)
+        return candidate_books([hits], [feedback], [recent], n=options["top_n"])[0]
 
-        # 🧠 Optional: Validate reasoning of recommendations
-        try:
-            validation_summary = validate_recommendations_with_reasoning(
-                [f"{book['title']} by {book['author']}" for book in parsed],
-                user_preferences
-            )
-            # print("🔎 AI Reasoning Summary:\n", validation_summary)
-        except Exception as ve:
-            print(f"⚠️ Reasoning validation failed: {str(ve)}")
 
-        # 💾 Save search + recommendations to DB (with embedding)
-        if user:
-            try:
-                summary_text = f"Prefs: {user_preferences}, Recs: {[book['title'] for book in parsed]}"
-                embedding = compute_embedding(summary_text)
-
-                UserSearchHistory.objects.create(
-                    user=user,
-                    preferences=user_preferences,
-                    recommendations=parsed,
-                    embedding=embedding
-                )
-                print(f"📖 Saved search history with embedding for {user.username}.")
-            except Exception as e:
-                print(f"⚠️ Failed to compute or save embedding: {str(e)}")
+def build_prompt(user_preferences, top_histories, feedback, candidates):
+    """
+    The GPT prompt for this request: free-form suggestions within the token budget without
+    candidates, otherwise a pick from the candidate list, or None in "fast" mode (no GPT call).
+    """
+    if not candidates:
+        prompt, stats = budgeted_prompt(build_recommendation_prompt, user_preferences, top_histories, feedback, CHAT_MODEL)
+        record_prompt_stats("recommendation", stats)
+        return prompt
+    if get_candidate_settings()["mode"] == "fast":
+        return None
+    prompt = build_rerank_prompt(user_preferences, candidates, get_candidate_settings()["results"])
+    record_prompt_stats("rerank", {"tokens": count_tokens(prompt, CHAT_MODEL), "candidates": len(candidates)})
+    return prompt
 
-            # ✅ Optional: print retrieved history for debug
-            print(f"📖 Loaded user history for {user.username}:")
-            for (h, score) in top_histories:
-                print(f"- Prefs: {h.preferences}, Recs: {[r['title'] for r in h.recommendations]}, Similarity: {score:.4f}")
-        else:
-            print("📖 No user provided — skipping history logging.")
 
+def candidate_line(book):
+    line = f"{book.title} by {book.author or 'Unknown Author'}"
+    return f"{line} ({book.genre})" if book.genre else line
 
-        # ✅ Return clean format: "Title by Author"
-        return [f"{book['title']} by {book['author']}" for book in parsed]
 
-    except Exception as e:
-        print(f"🔥 Error in AI Recommendation: {str(e)}")
-        return ["No AI recommendations available due to an error."]
+def build_rerank_prompt(user_preferences, candidates, count=10):
+    return f"""
+    Pick the {count} books from the list below that best match the user's current preferences:
+        - Genres: {user_preferences.get('genres', 'any')}
+        - Favorite Books: {', '.join(user_preferences.get('favorite_books', []))}
+        - Mood: {user_preferences.get('mood', 'any mood')}
+        - Preferred Length: {user_preferences.get('length', 'any length')}
+        - Release Preference: {user_preferences.get('release_preference', 'any')}
+
+    Books:
+    {chr(10).join(f"- {candidate_line(book)}" for book in candidates)}
 
+    Only choose books from the list, best match first, and vary themes and authors.
+    Format each recommendation as: "Title by Author"
+    """
 
 
-def improve_recommendations(user, recommendations):
+def candidate_picks(candidates):
+    """Candidates as {"title", "author"} dicts keyed by canonical title, for matching GPT's picks."""
+    picks = {}
+    for book in candidates:
+        picks.setdefault(canonicalize(book.title), {"title": book.title, "author": book.author or "Unknown Author"})
+    return picks
+
+
+def parse_completion(content, candidates):
     """
-    Adjust recommendations based on user feedback.
-    Prioritize liked books and remove disliked ones.
+    Parses GPT's reply into {"title", "author"} dicts. With candidates, only books from the
+    list are kept (with their catalog title and author); without a reply, or if none of the
+    picks match, the top candidates are used in similarity order.
     """
-    liked = UserBookFeedback.objects.filter(user=user, feedback="like").values_list("book_title", flat=True)
-    disliked = UserBookFeedback.objects.filter(user=user, feedback="dislike").values_list("book_title", flat=True)
+    if not candidates:
+        return parse_recommendations(content)
+    picks = candidate_picks(candidates)
+    count = get_candidate_settings()["results"]
+    parsed = []
+    for book in parse_recommendations(content or ""):
+        pick = picks.pop(canonicalize(book["title"]), None)
+        if pick:
+            parsed.append(pick)
+    return parsed[:count] or list(candidate_picks(candidates).values())[:count]
+
+
+def parse_recommendation_line(line):
+    """
+    Parses one "Title by Author" line into a dict, or returns None if it isn't one.
+    Numbering, markdown, quotes, years and trailing descriptions are stripped first.
+    """
+    parsed = clean_recommendation_line(line)
+    if not parsed:
+        return None
+    title, author = parsed
+    return {
+        "title": title,
+        "author": author
+    }
+
+
+def parse_recommendations(content):
+    """Splits the completion into {"title", "author"} dicts, one per "Title by Author" line."""
+    parsed = []
+    for line in content.strip().split("\n"):
+        book = parse_recommendation_line(line)
+        if book:
+            parsed.append(book)
+    return parsed
+
+
+def format_recommendations(recommendations):
+    return [f"{book['title']} by {book['author']}" for book in recommendations]
+
+
+def save_search_history(user, user_preferences, recommendations, embedding):
+    with span("persistence"):
+        return UserSearchHistory.objects.create(
+            user=user,
+            preferences=user_preferences,
+            recommendations=recommendations,
+            embedding=encode_embedding(embedding)
+        )
 
-    recommendations.sort(key=lambda book: book["title"] in liked, reverse=True) # comment out this line to disable like functionality
-    return [book for book in recommendations if book["title"] not in disliked]
 
-def validate_recommendations_with_reasoning(recommendations, user_preferences):
+def retrieve_similar_histories(user, embedding, k=5):
     """
-    Use GPT to reason about whether the book recommendations align with the user's preferences.
-    Returns a summary message indicating validation status.
+    Returns up to k (UserSearchHistory, similarity) pairs for the user, most similar first.
     """
+    with span("retrieval"):
+        hits = get_vector_index().search(user.id, embedding, k=k)
+        # Only what the prompt uses; the embedding and validation columns stay in the table
+        rows = UserSearchHistory.objects.only("preferences", "recommendations").in_bulk(
+            [history_id for history_id, _ in hits]
+        )
+    # Rows deleted since they were indexed are simply skipped
+    return [(rows[history_id], score) for history_id, score in hits if history_id in rows]
+
 
-    # Build the validation prompt
-    validation_prompt = f"""
+def improve_recommendations(user, recommendations, feedback=None):
+    """
+    Adjust recommendations based on user feedback.
+    Prioritize liked books and remove disliked ones.
+    Pass the request's FeedbackSnapshot to avoid loading it again.
+    """
+    if feedback is None:
+        feedback = get_feedback_snapshot(user)
+
+    recommendations.sort(key=lambda book: feedback.is_liked(book["title"]), reverse=True) # comment out this line to disable like functionality
+    return [book for book in recommendations if not feedback.is_disliked(book["title"])]
+
+def build_validation_prompt(recommendations, user_preferences):
+    return f"""
     A user gave these preferences:
     - Genres: {user_preferences.get('genres', 'any')}
     - Favorite Books: {', '.join(user_preferences.get('favorite_books', []))}
@@ -189,22 +493,123 @@ def validate_recommendations_with_reasoning(recommendations, user_preferences):
     Do these recommendations seem aligned with the preferences? Flag any major issues (genre mismatch, repetition, disliked books, etc.) and rate their usefulness.
     """
 
+
+VALIDATION_FAILED = "Validation failed due to an error."
+
+
+def validate_recommendations_with_reasoning(recommendations, user_preferences):
+    """
+    Use GPT to reason about whether the book recommendations align with the user's preferences.
+    Returns a summary message indicating validation status, or VALIDATION_FAILED when
+    the check itself could not run.
+    """
+    validation_prompt = build_validation_prompt(recommendations, user_preferences)
+
     try:
-        client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": validation_prompt}]
-        )
+        with span("validation"):
+            response = call_upstream("openai", lambda timeout: get_openai_client().chat.completions.create(
+                model=CHAT_MODEL,
+                messages=[{"role": "user", "content": validation_prompt}],
+                timeout=timeout,
+            ))
         return response.choices[0].message.content.strip()
 
     except Exception as e:
-        print(f"⚠️ Error during validation: {str(e)}")
-        return "Validation failed due to an error."
+        logger.warning("⚠️ Error during validation: %s", e)
+        return VALIDATION_FAILED
+
 
 def compute_embedding(text):
-    client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-    response = client.embeddings.create(
-        input=text,
-        model="text-embedding-ada-002"
-    )
-    return response.data[0].embedding
\ No newline at end of file
+    """
+    Embeds text with the OpenAI embeddings API, going through the embedding
+    cache first so identical (model, text) pairs are only embedded once.
+    """
+    with span("embedding"):
+        embedding_cache = get_embedding_cache()
+        cached = embedding_cache.get(EMBEDDING_MODEL, text)
+        if cached is not None:
+            return cached
+
+        response = call_upstream("openai", lambda timeout: get_openai_client().embeddings.create(
+            input=text,
+            model=EMBEDDING_MODEL,
+            timeout=timeout,
+        ))
+        return embedding_cache.set(EMBEDDING_MODEL, text, response.data[0].embedding)
+
+
+def compute_embeddings(texts, batch_size=None):
+    """
+    Embeds many texts, packing cache misses into as few API requests as possible
+    (up to `batch_size` inputs each). Returns vectors in the same order as `texts`.
+    """
+    batch_size = batch_size or getattr(settings, "EMBEDDING_BATCH_SIZE", 512)
+    embedding_cache = get_embedding_cache()
+
+    vectors = {}
+    missing = []
+    for text in dict.fromkeys(texts):  # Dedupe, keep order
+        cached = embedding_cache.get(EMBEDDING_MODEL, text)
+        if cached is not None:
+            vectors[text] = cached
+        else:
+            missing.append(text)
+
+    client = get_openai_client()
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start:start + batch_size]
+        with span("embedding"):
+            response = call_upstream("openai", lambda timeout: client.embeddings.create(
+                input=chunk, model=EMBEDDING_MODEL, timeout=timeout,
+            ))
+        for item in response.data:
+            text = chunk[item.index]
+            vectors[text] = embedding_cache.set(EMBEDDING_MODEL, text, item.embedding)
+
+    return [vectors[text] for text in texts]
+
+
+async def acompute_embedding(text):
+    with span("embedding"):
+        embedding_cache = get_embedding_cache()
+        cached = await embedding_cache.aget(EMBEDDING_MODEL, text)
+        if cached is not None:
+            return cached
+
+        client = get_async_openai_client()
+        response = await acall_upstream("openai", lambda timeout: client.embeddings.create(
+            input=text,
+            model=EMBEDDING_MODEL,
+            timeout=timeout,
+        ))
+        return await embedding_cache.aset(EMBEDDING_MODEL, text, response.data[0].embedding)
+
+
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_openai_client():
+    """Process-wide OpenAI client so calls share one pooled HTTP connection."""
+    global _client
+    if _client is None:
+        # Retries are ours (services.resilience), with jitter and under the breaker
+        _client = openai.OpenAI(
+            api_key=settings.OPENAI_API_KEY, base_url=getattr(settings, "OPENAI_BASE_URL", None), max_retries=0,
+        )
+    return _client
+
+
+def get_async_openai_client():
+    """
+    AsyncOpenAI client for the running event loop. Async HTTP connections are
+    bound to the loop that opened them, so each loop gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY, base_url=getattr(settings, "OPENAI_BASE_URL", None), max_retries=0,
+        )
+        _async_clients[loop] = client
+    return client
@@ -0,0 +1,285 @@
+# batch.py
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from recommendations.models import UserSearchHistory
+from recommendations.services.ai_recommender import (
+    build_prompt,
+    complete_chat,
+    compute_embeddings,
+    format_recommendations,
+    history_text,
+    improve_recommendations,
+    parse_completion,
+    preferences_text,
+    similarity_text,
+    uses_catalog_candidates,
+)
+from recommendations.services.catalog_index import candidate_books, get_candidate_settings, get_catalog_index
+from recommendations.services.embedding_codec import encode_embedding
+from recommendations.services.fallback import fallback_recommendations
+from recommendations.services.feedback import get_feedback_snapshots
+from recommendations.services.google_books import (
+    NO_BOOKS_FOUND,
+    books_for_ranking,
+    cache_ranking,
+    make_cache_key,
+    resolve_titles,
+)
+from recommendations.services.history_retention import schedule_compaction
+from recommendations.services.instrumentation import span
+from recommendations.services.normalization import canonicalize
+from recommendations.services.recommendation_cache import bump_user_version, is_stale
+from recommendations.services.resilience import UpstreamUnavailable
+from recommendations.services.taste_profile import add_history, blend_query, get_taste_vector, schedule_update
+from recommendations.services.validation_queue import schedule_validation
+from recommendations.services.vector_index import get_vector_index
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJob:
+    """One (user, preferences) pair of a batch and what the pipeline produced for it."""
+
+    def __init__(self, index, user, preferences):
+        self.index = index
+        self.user = user
+        self.preferences = preferences
+        self.cache_key = None
+        self.top_histories = []
+        self.feedback = None
+        self.candidates = []
+        self.parsed = None  # LLM output after feedback filtering; None when served from cache or fallback
+        self.ranking = []
+        self.degraded = False
+        self.finished = False
+
+    def result(self, books, cached=False):
+        line = {"index": self.index, "user_id": self.user.id, "recommendations": books, "cached": cached}
+        if self.degraded:
+            line["degraded"] = True
+        return line
+
+
+def parse_batch_items(items):
+    """
+    Splits raw batch items ({"user_id", "preferences"}) into BatchJobs and error lines,
+    loading every referenced user with one query.
+    """
+    items = list(items)
+    user_ids = {item.get("user_id") for item in items if isinstance(item, dict)}
+    users = User.objects.in_bulk([uid for uid in user_ids if isinstance(uid, int) or str(uid).isdigit()])
+
+    jobs, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("preferences", {}), dict):
+            errors.append({"index": index, "error": "Each item needs a user_id and a preferences object"})
+            continue
+        user_id = item.get("user_id")
+        user = users.get(int(user_id)) if str(user_id).isdigit() else None
+        if user is None:
+            errors.append({"index": index, "user_id": user_id, "error": "User not found"})
+            continue
+        jobs.append(BatchJob(index, user, dict(item.get("preferences", {}))))
+    return jobs, errors
+
+
+def run_batch(items, concurrency=None):
+    """
+    Generates recommendations for many (user_id, preferences) items and yields one result
+    dict per item as it completes (in completion order, tagged with its "index"), then a
+    final {"done": true, ...} summary.
+
+    Work that fetch_books does per request is shared across the batch: cached rankings
+    are read in one round trip, preference texts are embedded in one batched call, history
+    retrieval runs as one matrix product across all users, LLM and enrichment calls fan
+    out over at most `concurrency` threads, and the new history rows are written with
+    a single bulk_create. Finished jobs are saved and cached even if the consumer stops
+    reading early (a disconnected NDJSON client): their completions are already paid for.
+    """
+    started = time.monotonic()
+    jobs, errors = parse_batch_items(items)
+    yield from errors
+
+    cached, misses = split_cached(jobs)
+    prepare_jobs(misses)
+
+    done, failed = 0, len(errors)
+    concurrency = concurrency or getattr(settings, "BATCH_RECOMMENDATION_CONCURRENCY", 8)
+    try:
+        # On early close, leaving the executor still waits for the submitted jobs
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+            futures = {executor.submit(_serve_cached, job, entry): job for job, entry in cached}
+            futures.update({executor.submit(_recommend, job): job for job in misses})
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    line = future.result()
+                    done += 1
+                except Exception as e:
+                    logger.warning("⚠️ Batch item %d failed: %s", job.index, e)
+                    failed += 1
+                    line = {"index": job.index, "user_id": job.user.id, "error": "Recommendation failed"}
+                yield line
+    finally:
+        persist_jobs(misses)
+
+    yield {"done": True, "count": done, "errors": failed, "seconds": round(time.monotonic() - started, 3)}
+
+
+def split_cached(jobs):
+    """
+    Reads every job's ranking entry in one cache round trip; returns ([(job, entry)], [job]).
+    Stale entries count as misses: a precompute run is the right time to regenerate them.
+    """
+    for job in jobs:
+        job.cache_key = make_cache_key(job.preferences, job.user)
+    try:
+        entries = cache.get_many({job.cache_key for job in jobs})
+    except Exception as e:
+        logger.warning("⚠️ Recommendation cache read failed: %s", e)
+        entries = {}
+    entries = {key: entry for key, entry in entries.items() if not is_stale(entry)}
+    cached = [(job, entries[job.cache_key]) for job in jobs if job.cache_key in entries]
+    misses = [job for job in jobs if job.cache_key not in entries]
+    return cached, misses
+
+
+def prepare_jobs(jobs):
+    """
+    Feedback snapshots, one embeddings call and one cross-user similarity search for all
+    jobs, plus one catalog search for all of them when candidates are on.
+    """
+    if not jobs:
+        return
+    with span("feedback"):
+        snapshots = get_feedback_snapshots({job.user.id: job.user for job in jobs}.values())
+    for job in jobs:
+        job.feedback = snapshots[job.user.id]
+
+    try:
+        vectors = compute_embeddings([preferences_text(job.preferences) for job in jobs])
+    except Exception as e:
+        logger.warning("⚠️ Failed to embed batch preferences: %s", e)
+        return
+
+    with span("retrieval"):
+        tastes = {job.user.id: get_taste_vector(job.user) for job in jobs}
+        queries = [(job.user.id, blend_query(vector, tastes[job.user.id])) for job, vector in zip(jobs, vectors)]
+        hits = get_vector_index().search_many(queries, k=5)
+        rows = UserSearchHistory.objects.only("preferences", "recommendations").in_bulk(
+            {history_id for job_hits in hits for history_id, _ in job_hits}
+        )
+    for job, job_hits in zip(jobs, hits):
+        job.top_histories = [(rows[history_id], score) for history_id, score in job_hits if history_id in rows]
+
+    if uses_catalog_candidates():
+        options = get_candidate_settings()
+        with span("candidates"):
+            queries = [
+                blend_query(vector, tastes[job.user.id], weight=options["taste_weight"])
+                for job, vector in zip(jobs, vectors)
+            ]
+            hits = get_catalog_index().search_many(queries, n=options["top_n"] * 2)
+            recent = [{canonicalize(r["title"]) for h, _ in job.top_histories for r in h.recommendations} for job in jobs]
+            candidates = candidate_books(hits, [job.feedback for job in jobs], recent, n=options["top_n"])
+        for job, job_candidates in zip(jobs, candidates):
+            job.candidates = job_candidates
+
+
+def _serve_cached(job, entry):
+    try:
+        job.degraded = bool(entry.get("degraded"))
+        return job.result(books_for_ranking(entry["ranking"]), cached=True)
+    finally:
+        close_old_connections()  # Pool threads hold their own DB connections
+
+
+def _recommend(job):
+    try:
+        prompt = build_prompt(job.preferences, job.top_histories, job.feedback, job.candidates)
+        try:
+            content = None
+            if prompt is not None:
+                content = complete_chat(prompt, similarity_text(job.preferences, job.top_histories, job.feedback))
+            with span("parsing"):
+                parsed = parse_completion(content, job.candidates)
+                job.parsed = improve_recommendations(job.user, parsed, job.feedback)
+            titles = format_recommendations(job.parsed)
+        except UpstreamUnavailable as e:
+            logger.warning("⚠️ Serving fallback recommendations for batch item %d: %s", job.index, e)
+            job.degraded = True
+            titles = fallback_recommendations(job.preferences, job.feedback)
+
+        resolved = resolve_titles(titles)
+        job.ranking = [title for title in titles if title in resolved]
+        books = [resolved[title] for title in job.ranking] or [dict(NO_BOOKS_FOUND)]
+        job.finished = True
+        return job.result(books)
+    finally:
+        close_old_connections()
+
+
+def persist_jobs(jobs):
+    """Saves the finished jobs' history rows and caches their rankings."""
+    finished = [job for job in jobs if job.finished]
+    try:
+        save_batch_histories([job for job in finished if job.parsed])
+    except Exception as e:
+        logger.warning("⚠️ Failed to save batch histories: %s", e)
+    for job in finished:
+        try:
+            cache_ranking(job.preferences, job.user, job.cache_key, job.ranking, degraded=job.degraded)
+        except Exception as e:
+            logger.warning("⚠️ Failed to cache batch ranking: %s", e)
+
+
+def save_batch_histories(jobs):
+    """
+    Writes one UserSearchHistory row per job with a single embeddings call and a single
+    bulk_create, then does what the post_save signal would (bulk_create skips it):
+    index the rows, update taste profiles, move each user onto fresh cache keys, check
+    their history against the retention limits and queue validation.
+    """
+    if not jobs:
+        return []
+    try:
+        vectors = compute_embeddings([history_text(job.preferences, job.parsed) for job in jobs])
+    except Exception as e:
+        # Saved without; `manage.py backfill_embeddings` fills them in later
+        logger.warning("⚠️ Failed to embed batch histories: %s", e)
+        vectors = [None] * len(jobs)
+
+    with span("persistence"):
+        histories = UserSearchHistory.objects.bulk_create([
+            UserSearchHistory(
+                user=job.user,
+                preferences=job.preferences,
+                recommendations=job.parsed,
+                embedding=encode_embedding(vector),
+            )
+            for job, vector in zip(jobs, vectors)
+        ])
+
+    index = get_vector_index()
+    for history, vector in zip(histories, vectors):
+        if history.pk is not None and vector is not None:
+            index.add(history.user_id, history.pk, vector)
+            schedule_update(add_history, history.user_id, vector, history.created_at)
+    for user_id in {history.user_id for history in histories}:
+        try:
+            bump_user_version(user_id)
+        except Exception as e:
+            logger.warning("⚠️ Failed to bump recommendation cache version: %s", e)
+        schedule_compaction(user_id)
+    for history, job in zip(histories, jobs):
+        if history.pk is not None:
+            schedule_validation(history, job.preferences)
+    return histories
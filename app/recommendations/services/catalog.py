@@ -0,0 +1,98 @@
+# catalog.py
+
+from recommendations.models import Book
+from recommendations.services.normalization import canonicalize, split_title_author
+from recommendations.services.resolver import get_title_resolver
+
+
+def make_lookup_key(title, author):
+    return f"{canonicalize(title)}|{canonicalize(author)}"[:512]
+
+
+def _author_matches(book, author):
+    """Loose author check for title-only matches: the queried surname appears in the stored author."""
+    wanted = canonicalize(author).split()
+    return not wanted or wanted[-1] in canonicalize(book.author).split()
+
+
+def find_books(queries):
+    """
+    Resolves "Title by Author" strings against the local catalog: first by exact lookup_key,
+    then by normalized_title, and finally by fuzzy trigram match on the title (same author
+    surname required, against the titles indexed so far) for whatever is left.
+    Returns {query: Book} for the queries that were found.
+    """
+    parts = {query: split_title_author(query) for query in queries}
+    keys = {query: make_lookup_key(*parts[query]) for query in queries}
+
+    by_key = {book.lookup_key: book for book in Book.objects.filter(lookup_key__in=set(keys.values()))}
+    found = {query: by_key[key] for query, key in keys.items() if key in by_key}
+
+    remaining = [query for query in queries if query not in found]
+    if remaining:
+        titles = {query: canonicalize(parts[query][0]) for query in remaining}
+        candidates = {}
+        for book in Book.objects.filter(normalized_title__in=set(titles.values())):
+            candidates.setdefault(book.normalized_title, []).append(book)
+        for query in remaining:
+            for book in candidates.get(titles[query], []):
+                if _author_matches(book, parts[query][1]):
+                    found[query] = book
+                    break
+
+    remaining = [query for query in queries if query not in found]
+    if remaining:
+        resolver = get_title_resolver()
+        resolver.sync()
+        matches = {}
+        for query in remaining:
+            match = resolver.resolve(*parts[query])
+            if match:
+                matches[query] = match[0]
+        books = Book.objects.in_bulk(set(matches.values()))
+        found.update({query: books[pk] for query, pk in matches.items() if pk in books})
+    return found
+
+
+def book_from_volume(volume):
+    """Builds an unsaved Book from a Google Books volume resource."""
+    info = volume.get("volumeInfo", {})
+    title = info.get("title", "Unknown Title")
+    authors = info.get("authors") or ["Unknown Author"]
+    return Book(
+        google_books_id=volume["id"][:50],
+        title=title[:255],
+        author=authors[0][:255],
+        authors=authors,
+        genre=(info.get("categories") or [None])[0],
+        description=info.get("description"),
+        page_count=info.get("pageCount"),
+        cover_image=info.get("imageLinks", {}).get("thumbnail", "")[:200] or None,
+        info_link=info.get("infoLink", "")[:500] or None,
+        average_rating=info.get("averageRating"),
+        lookup_key=make_lookup_key(title, authors[0]),
+        normalized_title=canonicalize(title)[:255],
+    )
+
+
+UPSERT_FIELDS = [
+    "title", "author", "authors", "genre", "description", "page_count",
+    "cover_image", "info_link", "average_rating", "lookup_key", "normalized_title", "updated_at",
+]
+
+
+def upsert_volumes(volumes):
+    """Writes Google Books volumes into the catalog in one statement, updating existing rows."""
+    books = {}
+    for volume in volumes:
+        if volume and volume.get("id"):
+            book = book_from_volume(volume)
+            books[book.google_books_id] = book  # Last one wins if a batch repeats a volume
+    if not books:
+        return []
+    return Book.objects.bulk_create(
+        list(books.values()),
+        update_conflicts=True,
+        unique_fields=["google_books_id"],
+        update_fields=UPSERT_FIELDS,
+    )
@@ -0,0 +1,214 @@
+# catalog_index.py
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from recommendations.models import Book
+from recommendations.services.normalization import canonicalize
+from recommendations.services.vector_index import as_unit_vector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_CANDIDATES = {
+    "mode": "llm",  # "llm" (free-form suggestions), "rerank" (LLM picks from the candidates) or "fast" (no LLM)
+    "path": "catalog_index",  # Directory written by `manage.py embed_catalog`, relative to BASE_DIR
+    "top_n": 30,  # Candidates kept per request (twice as many are retrieved, to survive filtering)
+    "results": 10,  # Recommendations returned from them
+    "taste_weight": 0.5,  # How far the query leans from the preferences towards the user's taste vector
+    "description_chars": 600,  # Description prefix embedded per book
+    "reload_interval": 30,  # Seconds between checks for a rebuilt index
+}
+
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+META_FILE = "meta.json"
+
+
+def get_candidate_settings():
+    return {**DEFAULT_CATALOG_CANDIDATES, **getattr(settings, "CATALOG_CANDIDATES", {})}
+
+
+def get_index_path():
+    path = Path(get_candidate_settings()["path"])
+    return path if path.is_absolute() else Path(settings.BASE_DIR) / path
+
+
+def book_text(book, description_chars=None):
+    """Text embedded for a catalog book."""
+    if description_chars is None:
+        description_chars = get_candidate_settings()["description_chars"]
+    text = f"Book: {book.title} by {book.author or 'Unknown Author'}"
+    if book.genre:
+        text += f". Genre: {book.genre}"
+    if book.description:
+        text += f". {book.description[:description_chars]}"
+    return text
+
+
+class CatalogIndexWriter:
+    """
+    Writes a catalog index of `count` rows chunk by chunk, straight into a memory-mapped
+    .npy file so the whole matrix never has to fit in memory. Nothing is visible to
+    readers until commit() swaps the files in.
+    """
+
+    def __init__(self, path, count):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.count = count
+        self.matrix = None
+        self.ids = np.zeros(count, dtype=np.int64)
+
+    def write(self, start, ids, vectors):
+        for offset, (book_id, vector) in enumerate(zip(ids, vectors)):
+            unit = as_unit_vector(vector)
+            if self.matrix is None and unit is not None:
+                self.matrix = np.lib.format.open_memmap(
+                    self.path / f"{VECTORS_FILE}.tmp", mode="w+", dtype=np.float32, shape=(self.count, unit.shape[0]),
+                )
+            self.ids[start + offset] = book_id
+            if unit is not None and unit.shape[0] == self.matrix.shape[1]:
+                self.matrix[start + offset] = unit  # Rows left at zero never rank
+
+    def commit(self, model):
+        if self.matrix is None:
+            return False
+        self.matrix.flush()
+        dim = self.matrix.shape[1]
+        del self.matrix  # Close the memmap before the file is renamed
+        self.matrix = None
+        np.save(self.path / f"{IDS_FILE}.tmp.npy", self.ids)
+        os.replace(self.path / f"{VECTORS_FILE}.tmp", self.path / VECTORS_FILE)
+        os.replace(self.path / f"{IDS_FILE}.tmp.npy", self.path / IDS_FILE)
+        # Written last: readers reload when it changes, and only if the row counts agree
+        meta = {"model": model, "count": self.count, "dim": dim, "built_at": time.time()}
+        (self.path / f"{META_FILE}.tmp").write_text(json.dumps(meta))
+        os.replace(self.path / f"{META_FILE}.tmp", self.path / META_FILE)
+        return True
+
+
+class CatalogIndex:
+    """
+    Cosine search over the embedded catalog. The matrix is memory-mapped read-only, so
+    every worker process shares the operating system's page cache instead of holding
+    its own copy, and a rebuilt index is picked up without a restart.
+    """
+
+    def __init__(self, path, reload_interval=30):
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self.matrix = None
+        self.ids = None
+        self.meta = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.matrix is not None and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = (self.path / META_FILE).stat().st_mtime
+            except OSError:
+                return  # Not built yet
+            if mtime == self._mtime:
+                return
+            try:
+                meta = json.loads((self.path / META_FILE).read_text())
+                matrix = np.load(self.path / VECTORS_FILE, mmap_mode="r")
+                ids = np.load(self.path / IDS_FILE)
+            except (OSError, ValueError) as e:
+                logger.warning("⚠️ Failed to load catalog index from %s: %s", self.path, e)
+                return
+            if matrix.shape[0] != len(ids) or matrix.shape[0] != meta.get("count"):
+                return  # Caught mid-swap; the next check sees the finished files
+            self.matrix, self.ids, self.meta, self._mtime = matrix, ids, meta, mtime
+            logger.info("✅ Loaded catalog index: %d books, %d dimensions", len(ids), matrix.shape[1])
+
+    def __len__(self):
+        self.refresh()
+        return 0 if self.ids is None else len(self.ids)
+
+    def search(self, query, n=30):
+        """Returns up to n (book_id, cosine_score) pairs, best match first."""
+        return self.search_many([query], n=n)[0]
+
+    def search_many(self, queries, n=30):
+        """One matrix product for all queries; one hit list per query (empty when it can't be ranked)."""
+        self.refresh()
+        matrix, ids = self.matrix, self.ids
+        results = [[] for _ in queries]
+        if matrix is None or not len(ids):
+            return results
+        units = [as_unit_vector(query) for query in queries]
+        rows = [i for i, unit in enumerate(units) if unit is not None and unit.shape[0] == matrix.shape[1]]
+        if not rows:
+            return results
+        scores = matrix @ np.stack([units[i] for i in rows]).T  # (books, queries)
+        n = min(n, len(ids))
+        for column, i in enumerate(rows):
+            column_scores = scores[:, column]
+            top = np.argpartition(-column_scores, n - 1)[:n]
+            top = top[np.argsort(-column_scores[top])]
+            results[i] = [(int(ids[row]), float(column_scores[row])) for row in top if column_scores[row] > 0]
+        return results
+
+
+def candidate_books(hit_lists, feedbacks, exclude_titles=None, n=None):
+    """
+    Loads the Books behind each hit list with one query, dropping books the user already
+    liked, disliked or was recently recommended (`exclude_titles`: one set of canonical
+    titles per list) and other editions of a title already taken. Returns a list of up
+    to n Books per hit list.
+    """
+    n = n or get_candidate_settings()["top_n"]
+    exclude_titles = exclude_titles or [set()] * len(hit_lists)
+    books = Book.objects.only("id", "title", "author", "genre").in_bulk(
+        {book_id for hits in hit_lists for book_id, _ in hits}
+    )
+    candidates = []
+    for hits, feedback, excluded in zip(hit_lists, feedbacks, exclude_titles):
+        seen = set(excluded)
+        picked = []
+        for book_id, _ in hits:
+            book = books.get(book_id)  # Deleted since the index was built
+            if book is None:
+                continue
+            title = canonicalize(book.title)
+            if title in seen or feedback.is_liked(book.title) or feedback.is_disliked(book.title):
+                continue
+            seen.add(title)
+            picked.append(book)
+            if len(picked) == n:
+                break
+        candidates.append(picked)
+    return candidates
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_catalog_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CatalogIndex(get_index_path(), get_candidate_settings()["reload_interval"])
+    return _index
+
+
+def reset_catalog_index():
+    """Drops the process-wide index (tests, or after changing CATALOG_CANDIDATES["path"])."""
+    global _index
+    _index = None
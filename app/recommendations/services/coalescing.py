@@ -0,0 +1,160 @@
+# coalescing.py
+
+import asyncio
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical work into one run.
+
+    Within a process, callers for the same key wait on the first caller (the leader).
+    Across workers, the leader takes a short lease in the shared cache with cache.add();
+    leaders in other workers then poll the shared cache for `result_key` instead of
+    recomputing. Anyone who waits longer than `wait_timeout` computes the result itself,
+    so a crashed leader can only delay followers, never block them.
+    """
+
+    def __init__(self, alias="default", lease_timeout=120, wait_timeout=60, poll_interval=0.1):
+        self.alias = alias
+        self.lease_timeout = lease_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def do(self, key, fn, result_key=None):
+        """
+        Runs fn() once for all concurrent callers of `key` and returns its result.
+        `result_key` is the shared cache key fn() writes its result to (defaults to `key`).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.event.wait(self.wait_timeout):
+                if call.error:
+                    raise call.error
+                return call.result
+            return fn()  # Leader is stuck: don't make this caller wait any longer
+
+        try:
+            call.result = self._run_with_lease(key, fn, result_key or key)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            call.event.set()
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _run_with_lease(self, key, fn, result_key):
+        lock_key = f"singleflight:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.cache.add(lock_key, token, timeout=self.lease_timeout)
+        except Exception:
+            return fn()  # Shared cache unavailable: coalesce within this process only
+
+        if acquired:
+            try:
+                return fn()
+            finally:
+                if self.cache.get(lock_key) == token:
+                    self.cache.delete(lock_key)
+
+        # Another worker is computing it: wait for its result to land in the cache
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            result = self.cache.get(result_key)
+            if result is not None:
+                return result
+            if self.cache.get(lock_key) is None:
+                break  # Lease released (or expired) without a cached result
+            time.sleep(self.poll_interval)
+        return fn()
+
+    async def ado(self, key, afn, result_key=None):
+        """Async counterpart of do(); afn is a coroutine function."""
+        loop = asyncio.get_running_loop()
+        call_key = (id(loop), key)
+        future = self._async_calls.get(call_key)
+        if future is not None:
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), self.wait_timeout)
+            except asyncio.TimeoutError:
+                return await afn()
+
+        future = self._async_calls[call_key] = loop.create_future()
+        try:
+            result = await self._arun_with_lease(key, afn, result_key or key)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody is waiting on it
+            raise
+        finally:
+            self._async_calls.pop(call_key, None)
+
+    async def _arun_with_lease(self, key, afn, result_key):
+        lock_key = f"singleflight:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.cache.aadd(lock_key, token, timeout=self.lease_timeout)
+        except Exception:
+            return await afn()
+
+        if acquired:
+            try:
+                return await afn()
+            finally:
+                if await self.cache.aget(lock_key) == token:
+                    await self.cache.adelete(lock_key)
+
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            result = await self.cache.aget(result_key)
+            if result is not None:
+                return result
+            if await self.cache.aget(lock_key) is None:
+                break
+            await asyncio.sleep(self.poll_interval)
+        return await afn()
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight(
+                    lease_timeout=getattr(settings, "COALESCING_LEASE_TIMEOUT", 120),
+                    wait_timeout=getattr(settings, "COALESCING_WAIT_TIMEOUT", 60),
+                )
+    return _single_flight
@@ -0,0 +1,164 @@
+# completion_cache.py
+
+import hashlib
+import logging
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from recommendations.services.instrumentation import REGISTRY, Counter
+from recommendations.services.vector_index import as_unit_vector
+
+logger = logging.getLogger(__name__)
+
+COMPLETION_CACHE_REQUESTS = REGISTRY.register(Counter(
+    "completion_cache_requests_total", "Chat completion cache lookups by result.", ["result"],
+))
+
+
+def normalize_prompt(prompt):
+    """Collapses whitespace, so prompts that differ only in indentation or line breaks share a key."""
+    return " ".join(str(prompt).split())
+
+
+def make_completion_key(model, prompt):
+    digest = hashlib.sha256(f"{model}\0{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+    return f"completion:{digest}"
+
+
+class _Ring:
+    """Fixed-size matrix of unit vectors and their keys; the oldest entry is overwritten when full."""
+
+    def __init__(self, capacity, dim):
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.keys = [None] * capacity
+        self.count = 0
+        self.next = 0
+
+    def add(self, vector, key):
+        self.matrix[self.next] = vector
+        self.keys[self.next] = key
+        self.next = (self.next + 1) % len(self.keys)
+        self.count = min(self.count + 1, len(self.keys))
+
+
+class CompletionCache:
+    """
+    Chat completions cached in the shared Django cache, keyed by model and a hash of the
+    normalized prompt.
+
+    In semantic mode, completions stored with a vector (an embedding of what the prompt
+    asks for) are also remembered in a bounded in-process index; a later lookup whose vector
+    is within `threshold` cosine similarity reuses that completion. Exact hits work across
+    workers, semantic hits only within the worker that stored the entry.
+    """
+
+    def __init__(self, timeout=86400, alias="default", semantic=False, threshold=0.97, max_semantic_entries=2048):
+        self.timeout = timeout
+        self.alias = alias
+        self.semantic = semantic
+        self.threshold = threshold
+        self.max_semantic_entries = max_semantic_entries
+        self._lock = threading.Lock()
+        self._rings = {}  # model -> _Ring
+
+    def get(self, model, prompt):
+        try:
+            content = caches[self.alias].get(make_completion_key(model, prompt))
+        except Exception as e:
+            logger.warning("⚠️ Completion cache unavailable: %s", e)
+            content = None
+        COMPLETION_CACHE_REQUESTS.inc(result="hit" if content is not None else "miss")
+        return content
+
+    async def aget(self, model, prompt):
+        try:
+            content = await caches[self.alias].aget(make_completion_key(model, prompt))
+        except Exception as e:
+            logger.warning("⚠️ Completion cache unavailable: %s", e)
+            content = None
+        COMPLETION_CACHE_REQUESTS.inc(result="hit" if content is not None else "miss")
+        return content
+
+    def get_similar(self, model, vector):
+        """Completion of the most similar remembered prompt at or above the threshold, or None."""
+        if not self.semantic or vector is None:
+            return None
+        query = as_unit_vector(vector)
+        if query is None:
+            return None
+        with self._lock:
+            ring = self._rings.get(model)
+            if ring is None or ring.count == 0 or ring.matrix.shape[1] != query.shape[0]:
+                return None
+            scores = ring.matrix[:ring.count] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            key = ring.keys[best]
+        try:
+            content = caches[self.alias].get(key)
+        except Exception:
+            content = None
+        if content is not None:
+            COMPLETION_CACHE_REQUESTS.inc(result="semantic_hit")
+        return content
+
+    def set(self, model, prompt, content, vector=None):
+        key = make_completion_key(model, prompt)
+        try:
+            caches[self.alias].set(key, content, timeout=self.timeout)
+        except Exception as e:
+            logger.warning("⚠️ Completion cache unavailable: %s", e)
+            return
+        self._remember(model, vector, key)
+
+    async def aset(self, model, prompt, content, vector=None):
+        key = make_completion_key(model, prompt)
+        try:
+            await caches[self.alias].aset(key, content, timeout=self.timeout)
+        except Exception as e:
+            logger.warning("⚠️ Completion cache unavailable: %s", e)
+            return
+        self._remember(model, vector, key)
+
+    def _remember(self, model, vector, key):
+        if not self.semantic or vector is None:
+            return
+        row = as_unit_vector(vector)
+        if row is None:
+            return
+        with self._lock:
+            ring = self._rings.get(model)
+            if ring is None or ring.matrix.shape[1] != row.shape[0]:
+                ring = self._rings[model] = _Ring(self.max_semantic_entries, row.shape[0])
+            ring.add(row, key)
+
+    def clear(self):
+        """Forgets the in-process semantic index (the shared cache is left alone)."""
+        with self._lock:
+            self._rings.clear()
+
+
+_completion_cache = None
+_completion_cache_lock = threading.Lock()
+
+
+def get_completion_cache():
+    """Process-wide completion cache configured from settings.COMPLETION_CACHE; None if disabled."""
+    global _completion_cache
+    options = dict(getattr(settings, "COMPLETION_CACHE", {}))
+    if not options.pop("enabled", True):
+        return None
+    if _completion_cache is None:
+        with _completion_cache_lock:
+            if _completion_cache is None:
+                _completion_cache = CompletionCache(**options)
+    return _completion_cache
+
+
+def reset_completion_cache():
+    global _completion_cache
+    _completion_cache = None
@@ -0,0 +1,154 @@
+# embedding_cache.py
+
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from recommendations.services.embedding_codec import decode_embedding, encode_embedding
+from recommendations.services.instrumentation import REGISTRY, Counter
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_REQUESTS = REGISTRY.register(Counter(
+    "embedding_cache_requests_total", "Embedding cache lookups by result (local_hit, shared_hit, miss).", ["result"],
+))
+
+
+def normalize_text(text):
+    """Unicode NFC plus collapsed whitespace, so trivially different strings share a key."""
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+def make_embedding_key(model, text):
+    digest = hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+    return f"emb:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache with two tiers:
+    an in-process LRU of float32 arrays, then the shared Django cache holding
+    packed float32 bytes. Counts hits per tier and misses, both per instance
+    (stats()) and process-wide in embedding_cache_requests_total.
+    """
+
+    def __init__(self, max_entries=4096, timeout=None, alias="default"):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.alias = alias
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _get_local(self, key):
+        with self._lock:
+            vector = self._local.get(key)
+            if vector is not None:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                EMBEDDING_CACHE_REQUESTS.inc(result="local_hit")
+            return vector
+
+    def _set_local(self, key, vector):
+        with self._lock:
+            self._local[key] = vector
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _record_shared(self, key, blob):
+        if blob is None:
+            with self._lock:
+                self.misses += 1
+            EMBEDDING_CACHE_REQUESTS.inc(result="miss")
+            return None
+        vector = decode_embedding(blob)
+        self._set_local(key, vector)
+        with self._lock:
+            self.shared_hits += 1
+        EMBEDDING_CACHE_REQUESTS.inc(result="shared_hit")
+        return vector
+
+    def get(self, model, text):
+        key = make_embedding_key(model, text)
+        vector = self._get_local(key)
+        if vector is not None:
+            return vector
+        try:
+            blob = caches[self.alias].get(key)
+        except Exception as e:
+            logger.warning("⚠️ Shared embedding cache unavailable: %s", e)
+            blob = None
+        return self._record_shared(key, blob)
+
+    def set(self, model, text, vector):
+        key = make_embedding_key(model, text)
+        vector = np.asarray(vector, dtype=np.float32)
+        self._set_local(key, vector)
+        try:
+            caches[self.alias].set(key, encode_embedding(vector, dtype="float32"), timeout=self.timeout)
+        except Exception as e:
+            logger.warning("⚠️ Shared embedding cache unavailable: %s", e)
+        return vector
+
+    async def aget(self, model, text):
+        key = make_embedding_key(model, text)
+        vector = self._get_local(key)
+        if vector is not None:
+            return vector
+        try:
+            blob = await caches[self.alias].aget(key)
+        except Exception as e:
+            logger.warning("⚠️ Shared embedding cache unavailable: %s", e)
+            blob = None
+        return self._record_shared(key, blob)
+
+    async def aset(self, model, text, vector):
+        key = make_embedding_key(model, text)
+        vector = np.asarray(vector, dtype=np.float32)
+        self._set_local(key, vector)
+        try:
+            await caches[self.alias].aset(key, encode_embedding(vector, dtype="float32"), timeout=self.timeout)
+        except Exception as e:
+            logger.warning("⚠️ Shared embedding cache unavailable: %s", e)
+        return vector
+
+    def stats(self):
+        with self._lock:
+            return {
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "local_entries": len(self._local),
+            }
+
+    def clear(self):
+        """Empties the local tier and resets the counters (the shared tier is left alone)."""
+        with self._lock:
+            self._local.clear()
+            self.local_hits = self.shared_hits = self.misses = 0
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    max_entries=getattr(settings, "EMBEDDING_CACHE_MAX_ENTRIES", 4096),
+                    timeout=getattr(settings, "EMBEDDING_CACHE_TIMEOUT", None),
+                    alias=getattr(settings, "EMBEDDING_CACHE_ALIAS", "default"),
+                )
+    return _embedding_cache
@@ -0,0 +1,70 @@
+# embedding_codec.py
+
+import struct
+
+import numpy as np
+from django.conf import settings
+
+# Blob layout: 4-byte header (format version, dtype code, dimension), then for int8
+# a float32 scale, then the raw little-endian vector. The header keeps the payload
+# 4-byte aligned so float32 blobs decode as a zero-copy np.frombuffer view.
+_HEADER = struct.Struct("<BBH")
+_SCALE = struct.Struct("<f")
+_VERSION = 1
+
+_DTYPES = {
+    "float32": (1, np.dtype("<f4")),
+    "float16": (2, np.dtype("<f2")),
+    "int8": (3, np.dtype("i1")),
+}
+_CODES = {code: (name, dtype) for name, (code, dtype) in _DTYPES.items()}
+
+
+def encode_embedding(vector, dtype=None):
+    """
+    Packs an embedding into compact bytes for UserSearchHistory.embedding.
+    `dtype` is "float32" (default), "float16" or "int8" (symmetric, per-vector scale).
+    """
+    if vector is None:
+        return None
+    dtype = dtype or getattr(settings, "EMBEDDING_STORAGE_DTYPE", "float32")
+    if dtype not in _DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    code, np_dtype = _DTYPES[dtype]
+
+    arr = np.asarray(vector, dtype=np.float32).reshape(-1)
+    header = _HEADER.pack(_VERSION, code, arr.size)
+
+    if dtype == "int8":
+        peak = float(np.abs(arr).max()) if arr.size else 0.0
+        scale = peak / 127.0 if peak else 1.0
+        quantized = np.clip(np.rint(arr / scale), -127, 127).astype(np_dtype)
+        return header + _SCALE.pack(scale) + quantized.tobytes()
+
+    return header + arr.astype(np_dtype).tobytes()
+
+
+def decode_embedding(blob):
+    """
+    Unpacks bytes produced by encode_embedding into a float32 array.
+    float32 blobs are returned as a read-only view over the buffer (no copy).
+    """
+    if blob is None:
+        return None
+    buf = memoryview(blob)
+    version, code, dim = _HEADER.unpack_from(buf)
+    if version != _VERSION or code not in _CODES:
+        raise ValueError("Unrecognized embedding blob")
+    name, np_dtype = _CODES[code]
+    offset = _HEADER.size
+
+    if name == "int8":
+        (scale,) = _SCALE.unpack_from(buf, offset)
+        offset += _SCALE.size
+        values = np.frombuffer(buf, dtype=np_dtype, count=dim, offset=offset)
+        return values.astype(np.float32) * np.float32(scale)
+
+    values = np.frombuffer(buf, dtype=np_dtype, count=dim, offset=offset)
+    if name == "float32":
+        return values
+    return values.astype(np.float32)
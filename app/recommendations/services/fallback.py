@@ -0,0 +1,71 @@
+# fallback.py
+
+import logging
+import re
+
+from django.db.models import F, Q
+
+from recommendations.models import Book
+from recommendations.services.normalization import canonicalize
+
+logger = logging.getLogger(__name__)
+
+
+class DegradedRecommendations(list):
+    """
+    "Title by Author" strings built locally because the LLM was unavailable. Callers cache
+    them only briefly, so normal recommendations return as soon as the upstream recovers.
+    """
+
+
+def fallback_recommendations(user_preferences, feedback, limit=10):
+    """
+    A fast answer from the Book catalog alone: other books by the authors of the user's
+    liked and favorite books, then books in the requested genres, then the best rated.
+    Books the user liked, named or disliked are never suggested. Returns a
+    DegradedRecommendations list, empty if the catalog has nothing (or can't be read).
+    """
+    try:
+        books = _pick_books(user_preferences, feedback, limit)
+    except Exception as e:
+        logger.warning("⚠️ Fallback recommendations failed: %s", e)
+        books = []
+    return DegradedRecommendations(f"{book.title} by {book.author or 'Unknown Author'}" for book in books)
+
+
+def _pick_books(user_preferences, feedback, limit):
+    favorites = user_preferences.get("favorite_books") or []
+    if isinstance(favorites, str):
+        favorites = favorites.split(",")
+    known = set(feedback.liked) | set(feedback.disliked) | {canonicalize(title) for title in favorites}
+    known.discard("")
+
+    picked = {}
+
+    def take(queryset):
+        for book in queryset.only("id", "title", "author", "normalized_title")[:limit * 3]:
+            if len(picked) >= limit:
+                return
+            if book.id not in picked and book.normalized_title not in known:
+                picked[book.id] = book
+
+    seed_titles = (set(feedback.liked) | {canonicalize(title) for title in favorites}) - {""}
+    if seed_titles:
+        authors = set(
+            Book.objects.filter(normalized_title__in=seed_titles)
+            .exclude(author__isnull=True).values_list("author", flat=True)
+        )
+        if authors:
+            take(Book.objects.filter(author__in=authors).order_by(F("average_rating").desc(nulls_last=True), "id"))
+
+    genres = [g.strip() for g in re.split(r"[,/]", str(user_preferences.get("genres") or "")) if g.strip()]
+    if genres and len(picked) < limit:
+        match = Q()
+        for genre in genres:
+            match |= Q(genre__icontains=genre)
+        take(Book.objects.filter(match).order_by(F("average_rating").desc(nulls_last=True), "id"))
+
+    if len(picked) < limit:
+        take(Book.objects.order_by(F("average_rating").desc(nulls_last=True), "id"))
+
+    return list(picked.values())
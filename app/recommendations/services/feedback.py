@@ -0,0 +1,98 @@
+# feedback.py
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recommendations.models import UserBookFeedback
+from recommendations.services.normalization import canonicalize
+
+
+class FeedbackSnapshot:
+    """
+    A user's likes and dislikes, loaded once per request and matched by canonical title
+    so "Dune", "DUNE" and "Dune!" are the same book. Shared by prompt building and
+    improve_recommendations.
+    """
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)  # (book_title, feedback) pairs, oldest first
+        self.liked = frozenset(canonicalize(title) for title, feedback in self.rows if feedback == "like")
+        self.disliked = frozenset(canonicalize(title) for title, feedback in self.rows if feedback == "dislike")
+
+    @property
+    def disliked_titles(self):
+        """Disliked titles as the user saw them, for the GPT prompt."""
+        return [title for title, feedback in self.rows if feedback == "dislike"]
+
+    def is_liked(self, title):
+        return canonicalize(title) in self.liked
+
+    def is_disliked(self, title):
+        return canonicalize(title) in self.disliked
+
+    def __getstate__(self):
+        # Only the rows are cached; the sets are rebuilt on load
+        return {"rows": self.rows}
+
+    def __setstate__(self, state):
+        self.__init__(state["rows"])
+
+
+def make_feedback_key(user_id):
+    return f"feedback:{user_id}"
+
+
+def _feedback_rows(user):
+    return UserBookFeedback.objects.filter(user=user).order_by("id").values_list("book_title", "feedback")
+
+
+def get_feedback_snapshot(user):
+    """
+    Returns the user's FeedbackSnapshot from the cache, or loads it with one query on the
+    (user, book_title) index. Feedback writes drop the cached copy (see signals.py).
+    """
+    if user is None:
+        return FeedbackSnapshot()
+    key = make_feedback_key(user.id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = FeedbackSnapshot(_feedback_rows(user))
+        cache.set(key, snapshot, timeout=getattr(settings, "FEEDBACK_SNAPSHOT_TIMEOUT", 3600))
+    return snapshot
+
+
+def get_feedback_snapshots(users):
+    """
+    Batched get_feedback_snapshot: {user_id: FeedbackSnapshot} from one cache round trip,
+    plus one query covering every user that missed.
+    """
+    timeout = getattr(settings, "FEEDBACK_SNAPSHOT_TIMEOUT", 3600)
+    keys = {user.id: make_feedback_key(user.id) for user in users}
+    cached = cache.get_many(keys.values())
+    snapshots = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+
+    missing = [user_id for user_id in keys if user_id not in snapshots]
+    if missing:
+        rows = {user_id: [] for user_id in missing}
+        feedback = UserBookFeedback.objects.filter(user_id__in=missing).order_by("id")
+        for user_id, title, value in feedback.values_list("user_id", "book_title", "feedback"):
+            rows[user_id].append((title, value))
+        loaded = {user_id: FeedbackSnapshot(user_rows) for user_id, user_rows in rows.items()}
+        cache.set_many({keys[user_id]: snapshot for user_id, snapshot in loaded.items()}, timeout=timeout)
+        snapshots.update(loaded)
+    return snapshots
+
+
+async def aget_feedback_snapshot(user):
+    if user is None:
+        return FeedbackSnapshot()
+    key = make_feedback_key(user.id)
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        snapshot = FeedbackSnapshot([row async for row in _feedback_rows(user)])
+        await cache.aset(key, snapshot, timeout=getattr(settings, "FEEDBACK_SNAPSHOT_TIMEOUT", 3600))
+    return snapshot
+
+
+def invalidate_feedback_snapshot(user_id):
+    cache.delete(make_feedback_key(user_id))
@@ -1,62 +1,427 @@
 # google_books.py
+import asyncio
+import httpx
+import logging
 import requests
-import hashlib
-import json
+import threading
+import weakref
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor, wait
 from django.core.cache import cache
 from django.conf import settings
-from recommendations.services.ai_recommender import fetch_ai_book_recommendations
+from recommendations.services.ai_recommender import afetch_ai_book_recommendations, fetch_ai_book_recommendations
+from recommendations.services.catalog import find_books, upsert_volumes
+from recommendations.services.coalescing import get_single_flight
+from recommendations.services.fallback import DegradedRecommendations
+from recommendations.services.instrumentation import span
+from recommendations.services.recommendation_cache import (
+    aget_enriched,
+    aget_user_version,
+    aset_enriched,
+    get_degraded_timeout,
+    get_enriched,
+    get_recommendation_timeout,
+    get_user_version,
+    is_stale,
+    make_ranking_entry,
+    make_recommendation_key,
+    refresh_in_background,
+    set_enriched,
+)
+from recommendations.services.resilience import UpstreamError, UpstreamUnavailable, acall_upstream, call_upstream
 
 GOOGLE_BOOKS_API_URL = "https://www.googleapis.com/books/v1/volumes"
 
+logger = logging.getLogger(__name__)
+
+NO_BOOKS_FOUND = {"title": "No books found", "authors": ["N/A"], "description": "No matching books found.", "thumbnail": "", "info_link": "#"}
+
 def fetch_books(user_preferences, user=None):
     """
     Uses GPT-3.5 to suggest books and retrieves details from Google Books API.
-    Implements caching using Django's cache framework.
+    Implements caching using Django's cache framework in two layers: the user's ranked
+    "Title by Author" list under a versioned per-user key, and the book details for
+    each title in a shared enrichment cache that every user reads from.
     """
 
     if not isinstance(user_preferences, dict):
-        print("⚠️ Invalid user preferences format.")
+        logger.warning("⚠️ Invalid user preferences format.")
         return []
 
-    # Create a cache key based on user preferences
-    cache_key = make_cache_key(user_preferences)
+    # Create a cache key from the preferences and the user's personalization version
+    cache_key = make_cache_key(user_preferences, user)
+
+    # Check if a cached ranking exists
+    entry = cache.get(cache_key)
+    if entry is None:
+        # Concurrent misses for the same key share one pipeline run
+        entry = get_single_flight().do(cache_key, lambda: generate_ranking(user_preferences, user, cache_key))
+    elif is_stale(entry):
+        # Past its soft TTL: serve it now and regenerate it off the request path
+        refresh_in_background(cache_key, lambda: generate_ranking(user_preferences, user, cache_key))
 
-    # Check if cached data exists
-    cached_books = cache.get(cache_key)
-    if cached_books:
-        return cached_books  # Return cached results
+    return books_for_ranking(entry["ranking"])
+
+
+def generate_ranking(user_preferences, user, cache_key):
+    """Runs the AI + Google Books pipeline and caches the ranked titles that were found."""
 
     # AI-generated book recommendations
     ai_books = fetch_ai_book_recommendations(user_preferences, user=user)
 
-    book_details = []
-    for title in ai_books:
-        params = {"q": title, "key": settings.GOOGLE_BOOKS_API_KEY, "maxResults": 1}
-        response = requests.get(GOOGLE_BOOKS_API_URL, params=params)
-
-        if response.status_code == 200:
-            data = response.json()
-            if "items" in data:
-                book = data["items"][0]
-                book_details.append({
-                    "title": book["volumeInfo"].get("title", "Unknown Title"),
-                    "authors": book["volumeInfo"].get("authors", ["Unknown Author"]),
-                    "description": book["volumeInfo"].get("description", "No description available."),
-                    "thumbnail": book["volumeInfo"].get("imageLinks", {}).get("thumbnail", ""),
-                    "info_link": book["volumeInfo"].get("infoLink", "#"),
-                })
+    # Look up all titles concurrently (shared enrichment cache and catalog first)
+    resolved = resolve_titles(ai_books)
+    ranking = [title for title in ai_books if title in resolved]
+
+    degraded = isinstance(ai_books, DegradedRecommendations)
+    return cache_ranking(user_preferences, user, cache_key, ranking, degraded=degraded)
+
+
+def cache_ranking(user_preferences, user, cache_key, ranking, degraded=False):
+    """
+    Stores the ranking under cache_key and returns the cached entry. The run's own history
+    row bumps the user's version, so it is also stored under the new key: the result
+    already reflects that row. A degraded (fallback) ranking writes no history and is
+    only kept for RECOMMENDATION_DEGRADED_CACHE_TIMEOUT.
+    """
+    entry = make_ranking_entry(ranking, degraded)
+    if degraded:
+        cache.set(cache_key, entry, timeout=get_degraded_timeout())
+        return entry
+    timeout = get_recommendation_timeout()
+    cache.set(cache_key, entry, timeout=timeout)
+    fresh_key = make_cache_key(user_preferences, user)
+    if fresh_key != cache_key:
+        cache.set(fresh_key, entry, timeout=timeout)
+    return entry
+
+
+def books_for_ranking(ranking):
+    """Book details for a cached ranking, in order; the default message if none were found."""
+    book_details = enrich_titles(ranking)
 
     # If no books are found, return a default message
     if not book_details:
-        book_details.append({"title": "No books found", "authors": ["N/A"], "description": "No matching books found.", "thumbnail": "", "info_link": "#"})
+        book_details.append(dict(NO_BOOKS_FOUND))
+    return book_details
+
 
-    # Store results in Django cache (expires in 6 hours)
-    cache.set(cache_key, book_details, timeout=21600)
+async def afetch_books(user_preferences, user=None):
+    """
+    Async counterpart of fetch_books: same caching and output, with the
+    LLM and Google Books calls awaited instead of blocking a worker thread.
+    """
 
+    if not isinstance(user_preferences, dict):
+        logger.warning("⚠️ Invalid user preferences format.")
+        return []
+
+    cache_key = await amake_cache_key(user_preferences, user)
+    entry = await cache.aget(cache_key)
+    if entry is None:
+        entry = await get_single_flight().ado(cache_key, lambda: agenerate_ranking(user_preferences, user, cache_key))
+    elif is_stale(entry):
+        await sync_to_async(refresh_in_background)(
+            cache_key, lambda: generate_ranking(user_preferences, user, cache_key)
+        )
+
+    book_details = await aenrich_titles(entry["ranking"])
+    if not book_details:
+        book_details.append(dict(NO_BOOKS_FOUND))
     return book_details
 
 
-def make_cache_key(user_preferences):
-    key_string = json.dumps(user_preferences, sort_keys=True)
-    hashed = hashlib.md5(key_string.encode('utf-8')).hexdigest()
-    return f"books:{hashed}"
+async def agenerate_ranking(user_preferences, user, cache_key):
+    ai_books = await afetch_ai_book_recommendations(user_preferences, user=user)
+    resolved = await aresolve_titles(ai_books)
+    ranking = [title for title in ai_books if title in resolved]
+
+    if isinstance(ai_books, DegradedRecommendations):
+        entry = make_ranking_entry(ranking, degraded=True)
+        await cache.aset(cache_key, entry, timeout=get_degraded_timeout())
+        return entry
+    entry = make_ranking_entry(ranking)
+    timeout = get_recommendation_timeout()
+    await cache.aset(cache_key, entry, timeout=timeout)
+    fresh_key = await amake_cache_key(user_preferences, user)
+    if fresh_key != cache_key:
+        await cache.aset(fresh_key, entry, timeout=timeout)
+    return entry
+
+
+_session = None
+_executor = None
+_client_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Shared requests.Session so lookups reuse pooled keep-alive connections
+    instead of paying a new TLS handshake per title.
+    """
+    global _session
+    if _session is None:
+        with _client_lock:
+            if _session is None:
+                pool_size = getattr(settings, "GOOGLE_BOOKS_MAX_WORKERS", 10)
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_executor():
+    """Bounded thread pool shared by all enrichment calls in this process."""
+    global _executor
+    if _executor is None:
+        with _client_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "GOOGLE_BOOKS_MAX_WORKERS", 10),
+                    thread_name_prefix="google-books",
+                )
+    return _executor
+
+
+def get_api_url():
+    """Volumes endpoint; settings.GOOGLE_BOOKS_API_URL can point it at a local stand-in."""
+    return getattr(settings, "GOOGLE_BOOKS_API_URL", None) or GOOGLE_BOOKS_API_URL
+
+
+def parse_volume(volume):
+    """Maps a Google Books volume to the dict shape returned by the API."""
+    info = volume["volumeInfo"]
+    return {
+        "title": info.get("title", "Unknown Title"),
+        "authors": info.get("authors", ["Unknown Author"]),
+        "description": info.get("description", "No description available."),
+        "thumbnail": info.get("imageLinks", {}).get("thumbnail", ""),
+        "info_link": info.get("infoLink", "#"),
+    }
+
+
+def check_response(response):
+    """Rate limiting and server errors count against the breaker and are retried; other statuses are final."""
+    if response.status_code == 429 or response.status_code >= 500:
+        raise UpstreamError(f"Google Books returned {response.status_code}")
+    return response
+
+
+def first_volume(response):
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if not data.get("items"):
+        return None
+    return data["items"][0]
+
+
+def fetch_volume(title):
+    """
+    Fetches the best Google Books volume for a "Title by Author" string, with retries
+    and the google_books circuit breaker (see services.resilience).
+    Returns None when the request fails, times out, is rejected or finds nothing.
+    """
+    params = {"q": title, "key": settings.GOOGLE_BOOKS_API_KEY, "maxResults": 1}
+    try:
+        response = call_upstream("google_books", lambda timeout: check_response(
+            get_session().get(get_api_url(), params=params, timeout=timeout)
+        ))
+    except UpstreamUnavailable as e:
+        logger.warning("⚠️ Google Books lookup failed for %r: %s", title, e)
+        return None
+    return first_volume(response)
+
+
+def fetch_volume_page(query, start_index=0, page_size=40):
+    """
+    One page of Google Books search results for catalog ingestion: (volumes, totalItems).
+    page_size is capped at 40 by the API. Raises UpstreamUnavailable when the request
+    fails after retries, the google_books breaker is open or the API refuses the request
+    (e.g. 403 for an exhausted quota), so the page is never mistaken for the end of results.
+    """
+    params = {
+        "q": query,
+        "startIndex": start_index,
+        "maxResults": min(page_size, 40),
+        "printType": "books",
+        "key": settings.GOOGLE_BOOKS_API_KEY,
+    }
+    response = call_upstream("google_books", lambda timeout: check_response(
+        get_session().get(get_api_url(), params=params, timeout=timeout)
+    ))
+    if response.status_code != 200:
+        raise UpstreamUnavailable(f"Google Books returned {response.status_code} for {query!r}")
+    data = response.json()
+    return data.get("items") or [], data.get("totalItems", 0)
+
+
+def find_in_catalog(titles):
+    """Catalog lookup that degrades to "nothing found" if the database is unavailable."""
+    try:
+        return find_books(titles)
+    except Exception as e:
+        logger.warning("⚠️ Book catalog lookup failed: %s", e)
+        return {}
+
+
+def save_to_catalog(volumes):
+    """Write-through of fetched volumes into the Book catalog."""
+    try:
+        upsert_volumes(volumes)
+    except Exception as e:
+        logger.warning("⚠️ Failed to save books to catalog: %s", e)
+
+
+def resolve_titles(titles):
+    """
+    Resolves each distinct title to its book details: the shared enrichment cache first,
+    then the local Book catalog; only the remaining misses go to Google Books, concurrently
+    on the shared pool, and are written back to the catalog and the enrichment cache.
+    Returns {title: book}; lookups that fail or miss the overall deadline are left out
+    so a single slow call can't hold up the response.
+    """
+    with span("enrichment"):
+        return _resolve_titles(titles)
+
+
+def _resolve_titles(titles):
+    queries = list(dict.fromkeys(titles or []))
+    resolved = get_enriched(queries)
+    missing = [title for title in queries if title not in resolved]
+    if not missing:
+        return resolved
+
+    catalog_hits = find_in_catalog(missing)
+    misses = [title for title in missing if title not in catalog_hits]
+
+    executor = get_executor()
+    futures = {title: executor.submit(fetch_volume, title) for title in misses}
+    done, pending = wait(futures.values(), timeout=getattr(settings, "GOOGLE_BOOKS_DEADLINE", 8))
+    for future in pending:
+        future.cancel()
+
+    volumes = {}
+    for title, future in futures.items():
+        if future not in done:
+            continue
+        try:
+            volume = future.result()
+        except Exception as e:
+            logger.warning("⚠️ Google Books enrichment error: %s", e)
+            continue
+        if volume:
+            volumes[title] = volume
+    save_to_catalog(list(volumes.values()))
+
+    found = {title: book.as_recommendation() for title, book in catalog_hits.items()}
+    found.update({title: parse_volume(volume) for title, volume in volumes.items()})
+    set_enriched(found)
+    resolved.update(found)
+    return resolved
+
+
+def enrich_titles(titles):
+    """Book details for `titles` in the same order (see resolve_titles); unresolved titles are dropped."""
+    resolved = resolve_titles(titles)
+    return [resolved[title] for title in titles or [] if title in resolved]
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    Pooled httpx.AsyncClient for the running event loop (async connections
+    can't be shared across loops).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool_size = getattr(settings, "GOOGLE_BOOKS_MAX_WORKERS", 10)
+        client = httpx.AsyncClient(
+            timeout=getattr(settings, "GOOGLE_BOOKS_TIMEOUT", 5),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def afetch_volume(title):
+    """Async counterpart of fetch_volume."""
+    params = {"q": title, "key": settings.GOOGLE_BOOKS_API_KEY, "maxResults": 1}
+    client = get_async_client()
+
+    async def request(timeout):
+        return check_response(await client.get(get_api_url(), params=params, timeout=timeout))
+
+    try:
+        response = await acall_upstream("google_books", request)
+    except UpstreamUnavailable as e:
+        logger.warning("⚠️ Google Books lookup failed for %r: %s", title, e)
+        return None
+    return first_volume(response)
+
+
+async def aresolve_titles(titles):
+    """
+    Async counterpart of resolve_titles: enrichment cache, then catalog, then
+    concurrent lookups for the misses; failed or late lookups are left out.
+    """
+    with span("enrichment"):
+        return await _aresolve_titles(titles)
+
+
+async def _aresolve_titles(titles):
+    queries = list(dict.fromkeys(titles or []))
+    resolved = await aget_enriched(queries)
+    missing = [title for title in queries if title not in resolved]
+    if not missing:
+        return resolved
+
+    catalog_hits = await sync_to_async(find_in_catalog)(missing)
+    misses = [title for title in missing if title not in catalog_hits]
+
+    tasks = {title: asyncio.ensure_future(afetch_volume(title)) for title in misses}
+    if tasks:
+        done, pending = await asyncio.wait(tasks.values(), timeout=getattr(settings, "GOOGLE_BOOKS_DEADLINE", 8))
+        for task in pending:
+            task.cancel()
+
+    volumes = {}
+    for title, task in tasks.items():
+        if task not in done:
+            continue
+        if task.exception() is not None:
+            logger.warning("⚠️ Google Books enrichment error: %s", task.exception())
+            continue
+        if task.result():
+            volumes[title] = task.result()
+    if volumes:
+        await sync_to_async(save_to_catalog)(list(volumes.values()))
+
+    found = {title: book.as_recommendation() for title, book in catalog_hits.items()}
+    found.update({title: parse_volume(volume) for title, volume in volumes.items()})
+    await aset_enriched(found)
+    resolved.update(found)
+    return resolved
+
+
+async def aenrich_titles(titles):
+    resolved = await aresolve_titles(titles)
+    return [resolved[title] for title in titles or [] if title in resolved]
+
+
+def make_cache_key(user_preferences, user=None):
+    """Versioned per-user ranking key; see recommendation_cache.make_recommendation_key."""
+    if user is None:
+        return make_recommendation_key(user_preferences)
+    return make_recommendation_key(user_preferences, user.id, get_user_version(user.id))
+
+
+async def amake_cache_key(user_preferences, user=None):
+    if user is None:
+        return make_recommendation_key(user_preferences)
+    return make_recommendation_key(user_preferences, user.id, await aget_user_version(user.id))
@@ -0,0 +1,303 @@
+# history_retention.py
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from recommendations.models import UserSearchHistory
+from recommendations.services.embedding_codec import decode_embedding
+from recommendations.services.vector_index import as_unit_vector, bump_index_generation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_RETENTION = {
+    "mode": "background",  # Per-user compaction after new rows: "background", "inline" or "off"
+    "max_rows": 200,  # Rows kept per user, newest first
+    "keep_recent": 20,  # Newest rows kept whatever their age
+    "max_age_days": 365,  # Older rows are archived (None keeps them until max_rows)
+    "duplicate_threshold": 0.98,  # Cosine similarity at which an older row duplicates a newer one
+    "archive_dir": "history_archive",  # Relative to BASE_DIR
+    "chunk_rows": 10000,  # Rows per archive file written by compact_histories
+    "check_interval": 60 * 60 * 24,  # Seconds between a user's automatic compaction checks
+}
+
+_archiving = threading.local()
+
+
+def get_retention_settings():
+    return {**DEFAULT_HISTORY_RETENTION, **getattr(settings, "HISTORY_RETENTION", {})}
+
+
+def get_archive_dir():
+    path = Path(get_retention_settings()["archive_dir"])
+    return path if path.is_absolute() else Path(settings.BASE_DIR) / path
+
+
+def is_archiving():
+    """True while this thread deletes rows it has just archived (see signals.unindex_search_history)."""
+    return getattr(_archiving, "active", False)
+
+
+def plan_user_compaction(rows, options=None, now=None):
+    """
+    Splits one user's history into rows to keep and rows to archive. `rows` are
+    (id, created_at, embedding blob) tuples, newest first.
+
+    Walking from the newest row, a row is archived when the user already has max_rows
+    kept rows, when it is older than max_age_days (once keep_recent rows are kept), or
+    when its embedding is within duplicate_threshold of a newer kept row, which then
+    stands for both. Returns (keep_ids, archive_ids, duplicates).
+    """
+    options = options or get_retention_settings()
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=options["max_age_days"]) if options["max_age_days"] else None
+    keep, archive, duplicates = [], [], 0
+    kept_vectors = None  # (max_rows, dim) unit vectors of kept rows
+    kept_count = 0
+
+    for history_id, created_at, blob in rows:
+        if len(keep) >= options["max_rows"] or (
+            cutoff and created_at < cutoff and len(keep) >= options["keep_recent"]
+        ):
+            archive.append(history_id)
+            continue
+        unit = as_unit_vector(decode_embedding(blob)) if blob is not None else None
+        if unit is not None:
+            if kept_vectors is None:
+                kept_vectors = np.empty((options["max_rows"], unit.shape[0]), dtype=np.float32)
+            if unit.shape[0] == kept_vectors.shape[1]:
+                if kept_count and float(np.max(kept_vectors[:kept_count] @ unit)) >= options["duplicate_threshold"]:
+                    archive.append(history_id)
+                    duplicates += 1
+                    continue
+                kept_vectors[kept_count] = unit
+                kept_count += 1
+        keep.append(history_id)
+    return keep, archive, duplicates
+
+
+ARCHIVE_COLUMNS = ("id", "user_id", "created_at", "preferences", "recommendations",
+                   "validation_summary", "validated_at", "embedding")
+
+
+def _timestamp(value):
+    return int(value.timestamp() * 1_000_000) if value is not None else -1
+
+
+def _datetime(micros):
+    if micros < 0:
+        return None
+    return datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+
+
+def write_archive(rows, directory):
+    """
+    Writes history rows (dicts of ARCHIVE_COLUMNS) as one compressed columnar .npz file:
+    one array per column, JSON fields as strings and embeddings as their packed bytes
+    (concatenated, with offsets) so they restore exactly. Returns the file path.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    blobs = [bytes(row["embedding"]) if row["embedding"] is not None else b"" for row in rows]
+    columns = {
+        "id": np.array([row["id"] for row in rows], dtype=np.int64),
+        "user_id": np.array([row["user_id"] for row in rows], dtype=np.int64),
+        "created_at": np.array([_timestamp(row["created_at"]) for row in rows], dtype=np.int64),
+        "preferences": np.array([json.dumps(row["preferences"]) for row in rows], dtype=np.str_),
+        "recommendations": np.array([json.dumps(row["recommendations"]) for row in rows], dtype=np.str_),
+        "validation_summary": np.array([row["validation_summary"] or "" for row in rows], dtype=np.str_),
+        "validated_at": np.array([_timestamp(row["validated_at"]) for row in rows], dtype=np.int64),
+        "embedding_null": np.array([row["embedding"] is None for row in rows], dtype=bool),
+        "embedding_offsets": np.cumsum([0] + [len(blob) for blob in blobs], dtype=np.int64),
+        "embedding_data": np.frombuffer(b"".join(blobs), dtype=np.uint8),
+    }
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    path = directory / f"history-{stamp}-{columns['id'].min()}-{columns['id'].max()}.npz"
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **columns)
+        f.flush()
+        os.fsync(f.fileno())  # On disk before the rows are deleted
+    os.replace(tmp, path)
+    return path
+
+
+def read_archive(path):
+    """Rows of an archive file as dicts of ARCHIVE_COLUMNS."""
+    with np.load(path, allow_pickle=False) as data:
+        columns = {name: data[name] for name in data.files}  # Each access would decompress again
+    offsets = columns["embedding_offsets"]
+    return [
+        {
+            "id": int(columns["id"][i]),
+            "user_id": int(columns["user_id"][i]),
+            "created_at": _datetime(int(columns["created_at"][i])),
+            "preferences": json.loads(str(columns["preferences"][i])),
+            "recommendations": json.loads(str(columns["recommendations"][i])),
+            "validation_summary": str(columns["validation_summary"][i]) or None,
+            "validated_at": _datetime(int(columns["validated_at"][i])),
+            "embedding": (
+                None if columns["embedding_null"][i]
+                else columns["embedding_data"][offsets[i]:offsets[i + 1]].tobytes()
+            ),
+        }
+        for i in range(len(columns["id"]))
+    ]
+
+
+def archive_rows(history_ids, directory=None):
+    """Archives the given rows to one file, then deletes them. Returns the file path, or None."""
+    rows = list(UserSearchHistory.objects.filter(id__in=history_ids).order_by("id").values(*ARCHIVE_COLUMNS))
+    if not rows:
+        return None
+    path = write_archive(rows, directory or get_archive_dir())
+    _archiving.active = True
+    try:
+        with transaction.atomic():
+            UserSearchHistory.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    finally:
+        _archiving.active = False
+    return path
+
+
+def users_to_compact(options=None, now=None, user_ids=None):
+    """Users (of `user_ids`, or all) over max_rows or with rows past max_age_days, from one aggregate query."""
+    options = options or get_retention_settings()
+    now = now or timezone.now()
+    condition = Q(rows__gt=options["max_rows"])
+    if options["max_age_days"]:
+        condition |= Q(oldest__lt=now - timedelta(days=options["max_age_days"]), rows__gt=options["keep_recent"])
+    histories = UserSearchHistory.objects.all()
+    if user_ids is not None:
+        histories = histories.filter(user_id__in=user_ids)
+    users = (
+        histories.values("user_id")
+        .annotate(rows=Count("id"), oldest=Min("created_at"))
+        .filter(condition)
+        .values_list("user_id", flat=True)
+    )
+    return list(users)
+
+
+def compact_histories(user_ids, options=None, dry_run=False, directory=None):
+    """
+    Compacts each user's history (see plan_user_compaction), archiving removed rows in
+    chunks of chunk_rows. Returns {"users", "kept", "archived", "duplicates", "files"}.
+    """
+    options = options or get_retention_settings()
+    now = timezone.now()
+    stats = {"users": 0, "kept": 0, "archived": 0, "duplicates": 0, "files": []}
+    pending = []
+
+    def flush():
+        if pending and not dry_run:
+            path = archive_rows(pending, directory)
+            if path:
+                stats["files"].append(str(path))
+        pending.clear()
+
+    for user_id in user_ids:
+        rows = (
+            UserSearchHistory.objects.filter(user_id=user_id).order_by("-created_at", "-id")
+            .values_list("id", "created_at", "embedding")
+        )
+        keep, archive, duplicates = plan_user_compaction(rows.iterator(), options, now)
+        stats["users"] += 1
+        stats["kept"] += len(keep)
+        stats["archived"] += len(archive)
+        stats["duplicates"] += duplicates
+        pending.extend(archive)
+        if len(pending) >= options["chunk_rows"]:
+            flush()
+    flush()
+    return stats
+
+
+def restore_archive(path):
+    """
+    Re-imports an archive file under the rows' original ids. Rows already present (an
+    earlier restore) or whose user no longer exists are skipped. Returns {user_id: rows restored}.
+    """
+    rows = read_archive(path)
+    existing = set(UserSearchHistory.objects.filter(id__in=[row["id"] for row in rows]).values_list("id", flat=True))
+    users = set(User.objects.filter(id__in={row["user_id"] for row in rows}).values_list("id", flat=True))
+    rows = [row for row in rows if row["id"] not in existing and row["user_id"] in users]
+    if not rows:
+        return {}
+    restored = [UserSearchHistory(**row) for row in rows]
+    with transaction.atomic():
+        UserSearchHistory.objects.bulk_create(restored, batch_size=500)
+        # auto_now_add overwrote created_at on insert; put the original times back
+        for history, row in zip(restored, rows):
+            history.created_at = row["created_at"]
+        UserSearchHistory.objects.bulk_update(restored, ["created_at"], batch_size=500)
+    # bulk writes skip the signals, and the restored ids are older than what indexes have loaded
+    bump_index_generation()
+    restored_by_user = {}
+    for row in rows:
+        restored_by_user[row["user_id"]] = restored_by_user.get(row["user_id"], 0) + 1
+    return restored_by_user
+
+
+def make_retention_key(user_id):
+    return f"retention:{user_id}"
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-retention")
+    return _executor
+
+
+def _run(user_id):
+    try:
+        if users_to_compact(user_ids=[user_id]):
+            stats = compact_histories([user_id])
+            logger.info("✅ Compacted history of user %s: %d archived (%d duplicates)",
+                        user_id, stats["archived"], stats["duplicates"])
+    except Exception as e:
+        logger.warning("⚠️ History compaction failed for user %s: %s", user_id, e)
+    finally:
+        if get_retention_settings()["mode"] == "background":
+            close_old_connections()
+
+
+def schedule_compaction(user_id):
+    """
+    Checks a user's history against the retention limits at most once per check_interval
+    (per HISTORY_RETENTION["mode"]: after commit on the worker, inline, or not at all).
+    """
+    options = get_retention_settings()
+    if options["mode"] == "off":
+        return
+    try:
+        due = cache.add(make_retention_key(user_id), 1, timeout=options["check_interval"])
+    except Exception as e:
+        logger.warning("⚠️ Retention check throttle unavailable: %s", e)
+        return
+    if not due:
+        return
+    if options["mode"] == "inline":
+        _run(user_id)
+        return
+    transaction.on_commit(lambda: get_executor().submit(_run, user_id))
@@ -0,0 +1,59 @@
+# normalization.py
+
+import re
+import unicodedata
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•+]+\s*|\(?\d+[.)]\s+|#+\s*)")
+_MARKDOWN = re.compile(r"\*\*|__|[*`]")
+_AUTHOR_TAIL = re.compile(r"\s+[-–—|]\s+|\s*:\s+|\s*[(\[]")
+_TITLE_YEAR = re.compile(r"\s*[(\[]\d{4}[)\]]\s*$")
+_QUOTES = " \t\"'“”‘’«»"
+
+
+def canonicalize(text):
+    """Lowercase, accent-free, punctuation-free, single-spaced form of a title or name."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return " ".join(text.split())
+
+
+def split_title_author(query):
+    """Splits a "Title by Author" string on its last " by " into (title, author); author may be empty."""
+    title, separator, author = str(query).rpartition(" by ")
+    if not separator:
+        return author.strip(), ""
+    return title.strip(), author.strip()
+
+
+def clean_recommendation_line(line):
+    """
+    Extracts (title, author) from one line of LLM output, dropping list numbering,
+    markdown emphasis, quotes, publication years and trailing descriptions, e.g.
+    '1. **Dune** by Frank Herbert (1965) - desert epic' -> ('Dune', 'Frank Herbert').
+    Returns None if the line isn't a "Title by Author" recommendation.
+    """
+    line = " ".join(_MARKDOWN.sub("", _LIST_MARKER.sub("", str(line))).split())
+    parts = line.rsplit(" by ", 1)  # Case-sensitive and last, so "Stand By Me by ..." keeps its title
+    if len(parts) != 2:
+        return None
+
+    title = _TITLE_YEAR.sub("", parts[0]).strip(_QUOTES).rstrip(",")
+    author = _AUTHOR_TAIL.split(parts[1], maxsplit=1)[0].strip(_QUOTES + ".,;")
+    if not title or not author:
+        return None
+    return title, author
+
+
+def trigrams(text):
+    """Character trigrams of an already canonicalized string, padded at word edges."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a, b):
+    """Dice coefficient of two trigram sets."""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
@@ -0,0 +1,176 @@
+# prompt_builder.py
+
+import functools
+import logging
+import re
+from collections import Counter as Tally
+
+from django.conf import settings
+
+from recommendations.models import Book
+from recommendations.services.instrumentation import REGISTRY, Counter, Histogram
+from recommendations.services.normalization import canonicalize
+
+try:
+    import tiktoken
+except ImportError:  # Optional: token counts fall back to an estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT_BUDGET = {
+    "max_tokens": 800,  # Whole recommendation prompt
+    "history_titles": 40,  # Distinct titles listed across the retrieved histories
+    "recent_dislikes": 20,  # Most recent dislikes listed by title; older ones are summarized
+}
+
+PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "recommendation_prompt_tokens", "Chat prompt size in tokens by prompt kind.", ["kind"],
+    buckets=(100, 200, 400, 800, 1600, 3200, 6400),
+))
+PROMPT_TRIMMED = REGISTRY.register(Counter(
+    "recommendation_prompt_trimmed_total", "Prompts cut down to fit the token budget.",
+))
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+def get_prompt_settings():
+    return {**DEFAULT_PROMPT_BUDGET, **getattr(settings, "PROMPT_BUDGET", {})}
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:  # Unknown model, or the encoding file can't be fetched
+        logger.warning("⚠️ No tiktoken encoding for %s, estimating token counts: %s", model, e)
+        return None
+
+
+def count_tokens(text, model):
+    """Tokens in `text` for `model`: exact with tiktoken installed, otherwise a close estimate."""
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # BPE vocabularies keep common words whole and split long ones, roughly every 6 characters
+    return sum(1 + len(piece) // 6 for piece in _PIECE.findall(text))
+
+
+def format_preferences(preferences):
+    """Compact "key: value; ..." rendering of a preferences dict (lists joined, empty values dropped)."""
+    parts = []
+    for key, value in (preferences or {}).items():
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(item) for item in value)
+        if value not in (None, ""):
+            parts.append(f"{key}: {value}")
+    return "; ".join(parts) or "no preferences"
+
+
+def history_lines(top_histories, max_titles, skip_titles=()):
+    """
+    One line per retrieved history, most similar first, naming each recommended title only
+    once across all of them (and none of `skip_titles`, canonical titles listed elsewhere).
+    """
+    seen = set(skip_titles)
+    lines = []
+    for history, _ in top_histories:
+        titles = []
+        for book in history.recommendations or []:
+            title = book.get("title") if isinstance(book, dict) else None
+            if not title or canonicalize(title) in seen or max_titles <= len(titles):
+                continue
+            seen.add(canonicalize(title))
+            titles.append(title)
+        max_titles -= len(titles)
+        if titles:
+            lines.append(f"- {format_preferences(history.preferences)} → {'; '.join(titles)}")
+    return lines
+
+
+class DislikeSummary:
+    """
+    Describes older dislikes in one phrase ("and 37 earlier dislikes, mostly Romance, often
+    by Stephenie Meyer") from their catalog genres and authors, loaded with one query on first use.
+    """
+
+    def __init__(self, titles):
+        self.titles = titles
+        self._catalog = None
+
+    def _load(self):
+        wanted = {canonicalize(title)[:255] for title in self.titles}
+        self._catalog = {}
+        rows = Book.objects.filter(normalized_title__in=wanted).values_list("normalized_title", "genre", "author")
+        for title, genre, author in rows:
+            self._catalog.setdefault(title, (genre, author))  # First edition found is enough
+
+    def describe(self, older):
+        if self._catalog is None:
+            try:
+                self._load()
+            except Exception as e:
+                logger.warning("⚠️ Failed to load disliked books for the summary: %s", e)
+                self._catalog = {}
+        known = [self._catalog.get(canonicalize(title)[:255]) for title in older]
+        genres = Tally(genre for genre, _ in filter(None, known) if genre)
+        authors = Tally(author for _, author in filter(None, known) if author)
+        text = f"and {len(older)} earlier dislikes"
+        if genres:
+            text += ", mostly " + ", ".join(genre for genre, _ in genres.most_common(3))
+        repeated = [author for author, count in authors.most_common(3) if count > 1]
+        if repeated:
+            text += ", often by " + ", ".join(repeated)
+        return text
+
+
+def budgeted_prompt(render, user_preferences, top_histories, feedback, model):
+    """
+    Builds the recommendation prompt within PROMPT_BUDGET["max_tokens"].
+    `render(user_preferences, history_summary, disliked_books)` produces the prompt text.
+
+    Histories are listed compactly with titles deduplicated, and dislikes past the most
+    recent few are folded into one summary line. While the prompt is over budget the
+    least similar history goes first, then the listed dislikes are halved into the summary.
+    Returns (prompt, stats).
+    """
+    options = get_prompt_settings()
+    disliked = feedback.disliked_titles  # Oldest first
+    lines = history_lines(top_histories, options["history_titles"], skip_titles=feedback.disliked)
+    summary = DislikeSummary(disliked)
+    listed = min(len(disliked), options["recent_dislikes"])
+    history_count = len(lines)
+
+    while True:
+        older, recent = disliked[:len(disliked) - listed], disliked[len(disliked) - listed:]
+        prompt = render(user_preferences, "\n".join(lines), recent + ([summary.describe(older)] if older else []))
+        tokens = count_tokens(prompt, model)
+        if tokens <= options["max_tokens"] or (not lines and not listed):
+            break
+        if lines:
+            lines.pop()
+        else:
+            listed //= 2
+
+    stats = {
+        "tokens": tokens,
+        "budget": options["max_tokens"],
+        "histories": len(lines),
+        "histories_dropped": history_count - len(lines),
+        "dislikes_listed": listed,
+        "dislikes_summarized": len(disliked) - listed,
+    }
+    if tokens > options["max_tokens"]:
+        logger.warning("⚠️ Recommendation prompt is %d tokens even with history and dislikes trimmed", tokens)
+    if history_count - len(lines) or listed < min(len(disliked), options["recent_dislikes"]):
+        PROMPT_TRIMMED.inc()
+    return prompt, stats
+
+
+def record_prompt_stats(kind, stats):
+    """Per-request prompt size: the kind's token histogram, plus a debug log line with the breakdown."""
+    PROMPT_TOKENS.observe(stats["tokens"], kind=kind)
+    logger.debug("📏 %s prompt: %s", kind, ", ".join(f"{key}={value}" for key, value in stats.items()))
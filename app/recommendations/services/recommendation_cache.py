@@ -0,0 +1,210 @@
+# recommendation_cache.py
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from recommendations.services.catalog import make_lookup_key
+from recommendations.services.normalization import split_title_author
+
+logger = logging.getLogger(__name__)
+
+# Request fields that don't change which books are recommended
+UNKEYED_FIELDS = ("user_id", "stream")
+
+
+def make_user_version_key(user_id):
+    return f"user-version:{user_id}"
+
+
+def _initial_version():
+    # Millisecond clock, so a counter lost to eviction never restarts at a version already used
+    return int(time.time() * 1000)
+
+
+def get_user_version(user_id):
+    """Current personalization version for a user; created on first use."""
+    key = make_user_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_user_version(user_id):
+    key = make_user_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, _initial_version(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """
+    Moves the user onto fresh recommendation keys. Called when their feedback or
+    history changes; entries under older versions are never read again and simply expire.
+    """
+    key = make_user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), timeout=None)
+
+
+def hash_preferences(user_preferences):
+    keyed = {k: v for k, v in user_preferences.items() if k not in UNKEYED_FIELDS}
+    key_string = json.dumps(keyed, sort_keys=True, default=str)
+    return hashlib.md5(key_string.encode("utf-8")).hexdigest()
+
+
+def make_recommendation_key(user_preferences, user_id=None, version=None):
+    """
+    Per-user ranking key: "books:{user_id}:{version}:{preferences hash}".
+    Anonymous requests share "books:{preferences hash}".
+    """
+    digest = hash_preferences(user_preferences)
+    if user_id is None:
+        return f"books:{digest}"
+    return f"books:{user_id}:{version}:{digest}"
+
+
+def get_recommendation_timeout():
+    """Hard TTL: how long a ranking may be served at all."""
+    return getattr(settings, "RECOMMENDATION_CACHE_TIMEOUT", 21600)
+
+
+def get_degraded_timeout():
+    """Hard TTL for a fallback ranking served while the LLM was unavailable."""
+    return getattr(settings, "RECOMMENDATION_DEGRADED_CACHE_TIMEOUT", 60)
+
+
+def make_ranking_entry(ranking, degraded=False):
+    """
+    Cached value for a ranking: the titles plus the time after which it is stale (soft TTL).
+    A degraded (fallback) ranking is stale at once, so every hit retries the LLM in the background.
+    """
+    soft_timeout = 0 if degraded else getattr(settings, "RECOMMENDATION_CACHE_SOFT_TIMEOUT", 21600)
+    return {"ranking": ranking, "fresh_until": time.time() + soft_timeout, "degraded": degraded}
+
+
+def is_stale(entry):
+    return time.time() >= entry.get("fresh_until", 0)
+
+
+_refresh_executor = None
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+
+def get_refresh_executor():
+    """Small pool that regenerates stale entries off the request path."""
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _refresh_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "RECOMMENDATION_REFRESH_WORKERS", 2),
+                    thread_name_prefix="cache-refresh",
+                )
+    return _refresh_executor
+
+
+def refresh_in_background(key, fn):
+    """
+    Stale-while-revalidate: runs fn() (which rewrites `key`) on the refresh pool, at most
+    once at a time per key in this process and, through a short cache lease, across workers.
+    Returns True if a refresh was started.
+    """
+    with _refresh_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+
+    lease_key = f"refresh:{key}"
+    try:
+        claimed = cache.add(lease_key, 1, timeout=getattr(settings, "COALESCING_LEASE_TIMEOUT", 120))
+    except Exception:
+        claimed = True  # Shared cache unavailable: refresh from this worker anyway
+    if not claimed:
+        with _refresh_lock:
+            _refreshing.discard(key)
+        return False
+
+    get_refresh_executor().submit(_run_refresh, key, lease_key, fn)
+    return True
+
+
+def _run_refresh(key, lease_key, fn):
+    try:
+        fn()
+    except Exception as e:
+        logger.warning("⚠️ Background refresh failed for %s: %s", key, e)
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(key)
+        try:
+            cache.delete(lease_key)
+        except Exception:
+            pass
+        close_old_connections()  # Refresh threads hold their own DB connections
+
+
+def make_enrichment_key(query):
+    """Shared, user-independent key for one "Title by Author" lookup, by canonical title and author."""
+    lookup_key = make_lookup_key(*split_title_author(query))
+    return f"enrichment:{hashlib.md5(lookup_key.encode('utf-8')).hexdigest()}"
+
+
+def get_enriched(queries):
+    """Returns {query: book dict} for the queries already in the enrichment cache."""
+    keys = {query: make_enrichment_key(query) for query in queries}
+    try:
+        found = cache.get_many(set(keys.values()))
+    except Exception as e:
+        logger.warning("⚠️ Enrichment cache read failed: %s", e)
+        return {}
+    return {query: found[key] for query, key in keys.items() if key in found}
+
+
+def set_enriched(books):
+    """Stores {query: book dict} in the enrichment cache."""
+    if not books:
+        return
+    try:
+        cache.set_many(
+            {make_enrichment_key(query): book for query, book in books.items()},
+            timeout=getattr(settings, "ENRICHMENT_CACHE_TIMEOUT", 604800),
+        )
+    except Exception as e:
+        logger.warning("⚠️ Enrichment cache write failed: %s", e)
+
+
+async def aget_enriched(queries):
+    keys = {query: make_enrichment_key(query) for query in queries}
+    try:
+        found = await cache.aget_many(set(keys.values()))
+    except Exception as e:
+        logger.warning("⚠️ Enrichment cache read failed: %s", e)
+        return {}
+    return {query: found[key] for query, key in keys.items() if key in found}
+
+
+async def aset_enriched(books):
+    if not books:
+        return
+    try:
+        await cache.aset_many(
+            {make_enrichment_key(query): book for query, book in books.items()},
+            timeout=getattr(settings, "ENRICHMENT_CACHE_TIMEOUT", 604800),
+        )
+    except Exception as e:
+        logger.warning("⚠️ Enrichment cache write failed: %s", e)
@@ -0,0 +1,241 @@
+# resilience.py
+
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import openai
+import requests
+from django.conf import settings
+
+from recommendations.services.instrumentation import REGISTRY, Counter
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_CALLS = REGISTRY.register(Counter(
+    "upstream_calls_total", "Calls to OpenAI and Google Books by result (ok, error, client_error, rejected).",
+    ["upstream", "result"],
+))
+BREAKER_OPENED = REGISTRY.register(Counter(
+    "circuit_breaker_opened_total", "Times an upstream's circuit breaker opened.", ["upstream"],
+))
+
+DEFAULT_POLICY = {
+    "timeout": 10,  # Seconds per attempt
+    "deadline": 20,  # Seconds for all attempts together
+    "retries": 2,  # Extra attempts after the first
+    "backoff_base": 0.2,  # Seconds; attempt n waits up to base * 2**n
+    "backoff_cap": 2,
+    "failure_threshold": 5,  # Consecutive failures that open the breaker
+    "reset_timeout": 30,  # Seconds the breaker stays open before a trial call
+}
+
+
+class UpstreamUnavailable(Exception):
+    """An upstream call was rejected by its open breaker or failed every attempt before the deadline."""
+
+
+class UpstreamError(Exception):
+    """A response that should count as a failure (rate limited or 5xx) although the request went through."""
+
+
+RETRYABLE_ERRORS = (
+    UpstreamError,
+    TimeoutError,  # Also asyncio.wait_for's timeout
+    ConnectionError,
+    requests.Timeout,
+    requests.ConnectionError,
+    openai.APIConnectionError,  # Includes openai.APITimeoutError
+)
+
+
+def is_retryable(error):
+    """
+    Timeouts, connection failures, rate limiting and 5xx responses are worth retrying and
+    count against the breaker. Anything else (a bad key, a malformed request, other 4xx
+    errors or a bug in the caller) would fail the same way again.
+    """
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class CircuitBreaker:
+    """
+    Per-process breaker for one upstream. After `failure_threshold` consecutive failures
+    it opens and rejects calls for `reset_timeout` seconds; then one trial call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("✅ %s circuit closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            reopen = self._trial_running
+            self._trial_running = False
+            if reopen or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                BREAKER_OPENED.inc(upstream=self.name)
+                logger.warning("⚠️ %s circuit opened after %d failures", self.name, self._failures)
+
+    def release(self):
+        """Ends a half-open trial without an outcome (the call failed for its own reasons)."""
+        with self._lock:
+            self._trial_running = False
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_policy(upstream):
+    """Timeouts, retry and breaker settings for an upstream, from settings.UPSTREAM_POLICIES."""
+    return {**DEFAULT_POLICY, **getattr(settings, "UPSTREAM_POLICIES", {}).get(upstream, {})}
+
+
+def get_breaker(upstream):
+    breaker = _breakers.get(upstream)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(upstream)
+            if breaker is None:
+                policy = get_policy(upstream)
+                breaker = _breakers[upstream] = CircuitBreaker(
+                    upstream, policy["failure_threshold"], policy["reset_timeout"],
+                )
+    return breaker
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff, so retries from many workers don't arrive in lockstep."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _record_error(upstream, breaker, attempt, error):
+    """Counts a retryable failure against the breaker; re-raises any other error as is."""
+    if not is_retryable(error):
+        breaker.release()
+        UPSTREAM_CALLS.inc(upstream=upstream, result="client_error")
+        raise error
+    breaker.record_failure()
+    UPSTREAM_CALLS.inc(upstream=upstream, result="error")
+    logger.warning("⚠️ %s call failed (attempt %d): %s", upstream, attempt + 1, error)
+
+
+def call_upstream(upstream, fn, deadline=None):
+    """
+    Calls fn(timeout) through the upstream's breaker, retrying retryable failures (see
+    is_retryable) with jittered backoff until the retries or the deadline (absolute
+    time.monotonic(); defaults to the policy's) run out. fn receives the seconds it may
+    take, never past the deadline. Raises UpstreamUnavailable when the breaker is open or
+    every attempt failed; other errors are raised at once without counting as failures.
+    """
+    policy = get_policy(upstream)
+    breaker = get_breaker(upstream)
+    if deadline is None:
+        deadline = time.monotonic() + policy["deadline"]
+
+    last_error = None
+    for attempt in range(policy["retries"] + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if not breaker.allow_request():
+            UPSTREAM_CALLS.inc(upstream=upstream, result="rejected")
+            raise UpstreamUnavailable(f"{upstream} circuit is open")
+        try:
+            result = fn(min(policy["timeout"], remaining))
+        except Exception as e:
+            _record_error(upstream, breaker, attempt, e)
+            last_error = e
+        else:
+            breaker.record_success()
+            UPSTREAM_CALLS.inc(upstream=upstream, result="ok")
+            return result
+        delay = backoff_delay(attempt, policy["backoff_base"], policy["backoff_cap"])
+        if attempt < policy["retries"] and time.monotonic() + delay < deadline:
+            time.sleep(delay)
+    raise UpstreamUnavailable(f"{upstream} unavailable: {last_error or 'deadline exceeded'}")
+
+
+async def acall_upstream(upstream, fn, deadline=None):
+    """Async counterpart of call_upstream; fn(timeout) returns an awaitable."""
+    policy = get_policy(upstream)
+    breaker = get_breaker(upstream)
+    if deadline is None:
+        deadline = time.monotonic() + policy["deadline"]
+
+    last_error = None
+    for attempt in range(policy["retries"] + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if not breaker.allow_request():
+            UPSTREAM_CALLS.inc(upstream=upstream, result="rejected")
+            raise UpstreamUnavailable(f"{upstream} circuit is open")
+        timeout = min(policy["timeout"], remaining)
+        try:
+            result = await asyncio.wait_for(fn(timeout), timeout)
+        except Exception as e:
+            _record_error(upstream, breaker, attempt, e)
+            last_error = e
+        else:
+            breaker.record_success()
+            UPSTREAM_CALLS.inc(upstream=upstream, result="ok")
+            return result
+        delay = backoff_delay(attempt, policy["backoff_base"], policy["backoff_cap"])
+        if attempt < policy["retries"] and time.monotonic() + delay < deadline:
+            await asyncio.sleep(delay)
+    raise UpstreamUnavailable(f"{upstream} unavailable: {last_error or 'deadline exceeded'}")
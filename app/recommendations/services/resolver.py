@@ -0,0 +1,180 @@
+# resolver.py
+
+import logging
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from recommendations.models import Book
+from recommendations.services.normalization import canonicalize, dice, trigrams
+
+logger = logging.getLogger(__name__)
+
+
+class TitleResolver:
+    """
+    In-memory trigram index over Book.normalized_title for fuzzy title resolution.
+
+    Postings are compact int32 arrays of row positions. A lookup only scans the postings of
+    the query's rarer trigrams (those in at most max_df_ratio of titles), keeps the top
+    max_candidates titles by shared-trigram count, and scores just those exactly with the
+    Dice coefficient. Catalog rows added or changed since the last refresh are picked up
+    incrementally by Book.updated_at; a changed row's old entry is left as a dead position.
+    Lookups never wait for a refresh: they use whatever is indexed so far (see sync).
+    """
+
+    def __init__(self, threshold=0.8, max_candidates=20, max_df_ratio=0.05, sync_overlap=5,
+                 mode="background", refresh_interval=60):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.max_df_ratio = max_df_ratio
+        self.sync_overlap = timedelta(seconds=sync_overlap)  # Re-read window for clock skew and late commits
+        self.mode = mode
+        self.refresh_interval = refresh_interval
+        self.refreshed_at = self.queued_at = float("-inf")
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.book_ids = []
+            self.titles = []
+            self.surnames = []
+            self.postings = {}
+            self.positions = {}  # book_id -> live position
+            self.synced_at = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, book_id, normalized_title, author=""):
+        """Indexes a title, replacing the book's earlier entry; returns False if nothing changed."""
+        surname = (canonicalize(author).split() or [""])[-1]
+        with self._lock:
+            previous = self.positions.get(book_id)
+            if previous is not None:
+                if (self.titles[previous], self.surnames[previous]) == (normalized_title, surname):
+                    return False
+                self.book_ids[previous] = None
+                del self.positions[book_id]
+            if not normalized_title:
+                return previous is not None
+            position = len(self.book_ids)
+            self.book_ids.append(book_id)
+            self.titles.append(normalized_title)
+            self.surnames.append(surname)
+            self.positions[book_id] = position
+            for gram in trigrams(normalized_title):
+                self.postings.setdefault(gram, array("i")).append(position)
+            return True
+
+    def refresh(self):
+        """Indexes catalog rows added or changed since the last refresh; returns how many changed."""
+        with self._refresh_lock:
+            rows = Book.objects.order_by("updated_at", "pk")
+            if self.synced_at is not None:
+                rows = rows.filter(updated_at__gte=self.synced_at - self.sync_overlap)
+            changed = 0
+            for book_id, normalized_title, author, updated_at in rows.values_list(
+                "pk", "normalized_title", "author", "updated_at"
+            ).iterator(chunk_size=5000):
+                changed += self.add(book_id, normalized_title or "", author)
+                self.synced_at = updated_at
+            self.refreshed_at = time.monotonic()
+            return changed
+
+    def sync(self):
+        """
+        Brings the index up to date per `mode`: "background" queues a refresh on the
+        resolver's worker (after commit, at most once per refresh_interval), "inline"
+        refreshes now and "off" leaves it to explicit refresh() calls.
+        """
+        if self.mode == "inline":
+            self.refresh()
+            return
+        if self.mode != "background":
+            return
+        now = time.monotonic()
+        if now - max(self.refreshed_at, self.queued_at) < self.refresh_interval:
+            return
+        self.queued_at = now  # Re-queued after refresh_interval if this job never runs
+        transaction.on_commit(lambda: get_executor().submit(self._background_refresh))
+
+    def _background_refresh(self):
+        try:
+            added = self.refresh()
+            if added:
+                logger.info("✅ Title resolver indexed %d catalog rows (%d titles)", added, len(self))
+        except Exception as e:
+            logger.warning("⚠️ Title resolver refresh failed: %s", e)
+        finally:
+            close_old_connections()  # Worker threads hold their own DB connections
+
+    def resolve(self, title, author=""):
+        """Returns (book_id, score) of the closest catalog title above the threshold, or None."""
+        query = canonicalize(title)
+        grams = trigrams(query)
+        if not query or not self.positions:
+            return None
+
+        with self._lock:
+            lists = [self.postings[g] for g in grams if g in self.postings]
+            limit = max(1, int(len(self.positions) * self.max_df_ratio))
+            rare = [p for p in lists if len(p) <= limit] or lists
+            if not rare:
+                return None
+            # Shared-trigram counts of just the candidate positions, not an array over the catalog
+            top, counts = np.unique(np.concatenate([np.frombuffer(p, dtype=np.int32) for p in rare]),
+                                    return_counts=True)
+            if len(top) > self.max_candidates:
+                keep = np.argpartition(counts, -self.max_candidates)[-self.max_candidates:]
+                top, counts = top[keep], counts[keep]
+            top = top[np.argsort(counts)[::-1]]
+
+            surname = (canonicalize(author).split() or [""])[-1]
+            best = None
+            for position in top:
+                if self.book_ids[position] is None or (surname and self.surnames[position] != surname):
+                    continue
+                score = dice(grams, trigrams(self.titles[position]))
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (self.book_ids[position], score)
+            return best
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Single worker, so one refresh runs at a time."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="title-resolver")
+    return _executor
+
+
+def get_title_resolver():
+    """Returns the process-wide resolver, configured from settings.BOOK_RESOLVER."""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = TitleResolver(**getattr(settings, "BOOK_RESOLVER", {}))
+    return _resolver
+
+
+def reset_title_resolver():
+    global _resolver
+    _resolver = None
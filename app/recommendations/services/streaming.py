@@ -0,0 +1,230 @@
+# streaming.py
+import json
+import logging
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError, as_completed
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recommendations.services.ai_recommender import (
+    CHAT_MODEL,
+    candidate_picks,
+    format_recommendations,
+    get_openai_client,
+    parse_completion,
+    parse_recommendation_line,
+    prepare_recommendation_prompt,
+    record_search_history,
+)
+from recommendations.services.completion_cache import get_completion_cache
+from recommendations.services.fallback import fallback_recommendations
+from recommendations.services.google_books import (
+    books_for_ranking,
+    cache_ranking,
+    fetch_volume,
+    find_in_catalog,
+    generate_ranking,
+    get_executor,
+    make_cache_key,
+    parse_volume,
+    save_to_catalog,
+)
+from recommendations.services.instrumentation import span
+from recommendations.services.normalization import canonicalize
+from recommendations.services.resilience import UpstreamUnavailable, call_upstream, get_breaker, get_policy
+from recommendations.services.recommendation_cache import (
+    get_enriched,
+    is_stale,
+    refresh_in_background,
+    set_enriched,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def stream_content(stream, deadline):
+    """
+    Yields a chat completion stream's text pieces until `deadline` (time.monotonic()).
+    A stream that runs past it or breaks off counts as an OpenAI failure and raises
+    UpstreamUnavailable; each read is already bounded by the timeout given to create().
+    """
+    try:
+        for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+            if time.monotonic() >= deadline:
+                raise UpstreamUnavailable("openai stream exceeded its deadline")
+    except UpstreamUnavailable:
+        get_breaker("openai").record_failure()
+        raise
+    except Exception as e:
+        get_breaker("openai").record_failure()
+        raise UpstreamUnavailable(f"openai stream failed: {e}") from e
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()  # Release the connection
+
+
+def stream_book_recommendations(user_preferences, user=None):
+    """
+    Generator version of fetch_books that yields (event, payload) pairs as soon as data is ready:
+    one "book" event per enriched book ({"rank", "book"}), then a single "done" event.
+
+    The chat completion is consumed as a token stream; each "Title by Author" line is
+    resolved against the enrichment cache and Book catalog, or starts its Google Books lookup, the moment it
+    is complete, so the first book can be sent long before the LLM has finished writing.
+    If OpenAI is unavailable, or its stream stalls past the openai deadline before any book
+    was parsed, the lines come from fallback_recommendations and "done" carries "degraded": true.
+    """
+
+    cache_key = make_cache_key(user_preferences, user)
+    entry = cache.get(cache_key)
+    if entry is not None:
+        if is_stale(entry):
+            refresh_in_background(cache_key, lambda: generate_ranking(user_preferences, user, cache_key))
+        cached_books = books_for_ranking(entry["ranking"])
+        for rank, book in enumerate(cached_books):
+            yield "book", {"rank": rank, "book": book}
+        done = {"count": len(cached_books), "cached": True}
+        if entry.get("degraded"):
+            done["degraded"] = True
+        yield "done", done
+        return
+
+    prompt, top_histories, feedback, candidates = prepare_recommendation_prompt(user_preferences, user)
+    picks = candidate_picks(candidates) if candidates else None  # GPT may only choose from these
+
+    executor = get_executor()
+    parsed = []
+    queries = []  # rank -> "Title by Author"
+    pending = {}  # future -> rank
+    enriched = {}  # rank -> book
+
+    def start_lookup(line):
+        book = parse_recommendation_line(line)
+        if book and picks is not None:
+            book = picks.pop(canonicalize(book["title"]), None)
+        if not book or feedback.is_disliked(book["title"]):
+            return None
+        rank = len(parsed)
+        parsed.append(book)
+        query = format_recommendations([book])[0]
+        queries.append(query)
+
+        known = get_enriched([query]).get(query)
+        if not known:
+            hit = find_in_catalog([query]).get(query)
+            if hit:
+                known = hit.as_recommendation()
+                set_enriched({query: known})
+        if known:
+            enriched[rank] = known
+            return "book", {"rank": rank, "book": known}
+        pending[executor.submit(fetch_volume, query)] = rank
+        return None
+
+    def finished(future):
+        rank = pending.pop(future)
+        try:
+            volume = future.result()
+        except Exception as e:
+            logger.warning("⚠️ Google Books enrichment error: %s", e)
+            return None
+        if volume:
+            save_to_catalog([volume])
+            enriched[rank] = parse_volume(volume)
+            set_enriched({queries[rank]: enriched[rank]})
+            return "book", {"rank": rank, "book": enriched[rank]}
+        return None
+
+    completion_cache = get_completion_cache()
+    cached_completion = completion_cache.get(CHAT_MODEL, prompt) if completion_cache and prompt else None
+    degraded = False
+
+    try:
+        if prompt is None:
+            pieces = ["\n".join(format_recommendations(parse_completion(None, candidates)))]
+        elif cached_completion is not None:
+            pieces = [cached_completion]
+        else:
+            deadline = time.monotonic() + get_policy("openai")["deadline"]  # Covers reading the tokens too
+            try:
+                with span("llm"):  # Time to the first streamed token
+                    stream = call_upstream("openai", lambda timeout: get_openai_client().chat.completions.create(
+                        model=CHAT_MODEL,
+                        messages=[{"role": "user", "content": prompt}],
+                        stream=True,
+                        timeout=timeout,
+                    ), deadline=deadline)
+                pieces = stream_content(stream, deadline)
+            except UpstreamUnavailable as e:
+                logger.warning("⚠️ Serving fallback recommendations: %s", e)
+                degraded = True
+                pieces = ["\n".join(fallback_recommendations(user_preferences, feedback))]
+        buffer = ""
+        completion = []
+        try:
+            for piece in pieces:
+                completion.append(piece)
+                buffer += piece
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    event = start_lookup(line)
+                    if event:
+                        yield event
+                # Push whatever lookups have already come back, without waiting on the rest
+                for future in [f for f in pending if f.done()]:
+                    event = finished(future)
+                    if event:
+                        yield event
+        except UpstreamUnavailable as e:
+            logger.warning("⚠️ OpenAI stream stopped early: %s", e)
+            degraded = True
+            buffer = ""  # The last line may be cut off
+            if not parsed:
+                buffer = "\n".join(fallback_recommendations(user_preferences, feedback))
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    event = start_lookup(line)
+                    if event:
+                        yield event
+        event = start_lookup(buffer)
+        if event:
+            yield event
+        if picks is not None and not parsed:
+            # None of GPT's lines named a candidate: serve them in similarity order instead
+            for line in format_recommendations(parse_completion(None, candidates)):
+                event = start_lookup(line)
+                if event:
+                    yield event
+        if completion_cache and prompt and cached_completion is None and not degraded:
+            completion_cache.set(CHAT_MODEL, prompt, "".join(completion))
+    except Exception:
+        logger.exception("🔥 Error in streaming AI Recommendation")
+        yield "error", {"error": "No AI recommendations available due to an error."}
+
+    try:
+        for future in as_completed(list(pending), timeout=getattr(settings, "GOOGLE_BOOKS_DEADLINE", 8)):
+            event = finished(future)
+            if event:
+                yield event
+    except FuturesTimeoutError:
+        for future in pending:
+            future.cancel()
+
+    if parsed:
+        if user and not degraded:
+            record_search_history(user, user_preferences, parsed)
+        cache_ranking(user_preferences, user, cache_key, [queries[rank] for rank in sorted(enriched)], degraded=degraded)
+
+    done = {"count": len(enriched), "cached": False}
+    if degraded:
+        done["degraded"] = True
+    yield "done", done
+
+
+def format_sse(event, payload):
+    """Encodes one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
@@ -0,0 +1,303 @@
+# taste_profile.py
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from recommendations.models import UserBookFeedback, UserSearchHistory, UserTasteProfile
+from recommendations.services.embedding_codec import decode_embedding, encode_embedding
+from recommendations.services.vector_index import as_unit_vector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASTE_PROFILE = {
+    "mode": "background",  # "background" (after commit, off the request path), "inline" or "off"
+    "half_life_days": 30,  # A history row counts half as much as one written this many days later
+    "like_weight": 1.0,
+    "dislike_weight": 0.5,
+    "retrieval_weight": 0.3,  # How far the history retrieval query leans from the preferences towards the taste vector
+    "cache_timeout": 3600,
+    "rebuild_retry_interval": 300,  # Seconds before a stale profile whose rebuild failed is tried again
+}
+
+
+def get_taste_settings():
+    return {**DEFAULT_TASTE_PROFILE, **getattr(settings, "TASTE_PROFILE", {})}
+
+
+def make_taste_key(user_id):
+    return f"taste:{user_id}"
+
+
+def make_rebuild_key(user_id):
+    return f"taste-rebuild:{user_id}"
+
+
+def feedback_text(title):
+    """Text embedded for a liked or disliked book."""
+    return f"Book: {title}"
+
+
+def _vector(blob, dim):
+    value = decode_embedding(blob)
+    return np.zeros(dim, dtype=np.float32) if value is None else np.array(value, dtype=np.float32)
+
+
+def _pack(vector):
+    # Running sums stay float32 whatever EMBEDDING_STORAGE_DTYPE is, so updates don't drift
+    return encode_embedding(vector, dtype="float32")
+
+
+def _profile_dim(profile):
+    for blob in (profile.history_sum, profile.liked_sum, profile.disliked_sum):
+        if blob is not None:
+            return decode_embedding(blob).shape[0]
+    return None
+
+
+def compose(profile):
+    """Recomputes profile.vector from its sums; None when there is nothing to go on."""
+    options = get_taste_settings()
+    dim = _profile_dim(profile)
+    if dim is None:
+        profile.vector = None
+        return
+    taste = np.zeros(dim, dtype=np.float32)
+    if profile.history_weight > 0:
+        taste += _vector(profile.history_sum, dim) / profile.history_weight
+    if profile.liked_count > 0:
+        taste += options["like_weight"] * _vector(profile.liked_sum, dim) / profile.liked_count
+    if profile.disliked_count > 0:
+        taste -= options["dislike_weight"] * _vector(profile.disliked_sum, dim) / profile.disliked_count
+    unit = as_unit_vector(taste)
+    profile.vector = encode_embedding(unit) if unit is not None else None
+
+
+def decay_factor(since, now):
+    if since is None:
+        return 1.0
+    days = max((now - since).total_seconds(), 0.0) / 86400
+    return 0.5 ** (days / get_taste_settings()["half_life_days"])
+
+
+def _locked_profile(user_id):
+    profile, _ = UserTasteProfile.objects.select_for_update().get_or_create(user_id=user_id)
+    return profile
+
+
+def add_history(user_id, embedding, created_at):
+    """Folds one new history embedding into the user's decayed history centroid."""
+    unit = as_unit_vector(embedding)
+    if unit is None:
+        return
+    with transaction.atomic():
+        profile = _locked_profile(user_id)
+        if profile.stale:
+            return  # The next read rebuilds from the table, this row included
+        dim = _profile_dim(profile)
+        if dim is not None and dim != unit.shape[0]:
+            profile.stale = True  # Embedding model changed
+        else:
+            factor = decay_factor(profile.history_at, created_at)
+            history_sum = _vector(profile.history_sum, unit.shape[0]) * factor + unit
+            profile.history_sum = _pack(history_sum)
+            profile.history_weight = profile.history_weight * factor + 1.0
+            profile.history_at = max(created_at, profile.history_at or created_at)
+            compose(profile)
+        profile.save()
+    cache.delete(make_taste_key(user_id))
+
+
+def apply_feedback_change(user_id, title, old, new):
+    """
+    Moves one book's embedding between the liked and disliked sums: `old` and `new` are
+    "like", "dislike" or None (no feedback before / feedback removed).
+    """
+    if old == new:
+        return
+    from recommendations.services.ai_recommender import compute_embedding
+
+    try:
+        unit = as_unit_vector(compute_embedding(feedback_text(title)))
+    except Exception as e:
+        logger.warning("⚠️ Failed to embed %r for the taste profile: %s", title, e)
+        unit = None
+    with transaction.atomic():
+        profile = _locked_profile(user_id)
+        if profile.stale:
+            return
+        dim = _profile_dim(profile)
+        if unit is None or (dim is not None and dim != unit.shape[0]):
+            profile.stale = True
+        else:
+            for value, sign in ((old, -1.0), (new, 1.0)):
+                if value == "like":
+                    profile.liked_sum = _pack(_vector(profile.liked_sum, unit.shape[0]) + sign * unit)
+                    profile.liked_count += int(sign)
+                elif value == "dislike":
+                    profile.disliked_sum = _pack(_vector(profile.disliked_sum, unit.shape[0]) + sign * unit)
+                    profile.disliked_count += int(sign)
+            if profile.liked_count < 0 or profile.disliked_count < 0:
+                profile.stale = True  # Removed feedback the sums never held (written while updates were off)
+            else:
+                compose(profile)
+        profile.save()
+    cache.delete(make_taste_key(user_id))
+
+
+def mark_stale(*user_ids):
+    """Flags these users' profiles for a rebuild, e.g. after deletes or bulk writes that skip the signals."""
+    if not user_ids:
+        return
+    UserTasteProfile.objects.filter(user_id__in=user_ids).update(stale=True)
+    cache.delete_many([make_taste_key(user_id) for user_id in user_ids])
+
+
+def rebuild_taste_profile(user_id):
+    """Recomputes a user's profile from all their history rows and feedback (O(history))."""
+    from recommendations.services.ai_recommender import compute_embeddings
+
+    now = timezone.now()
+    history_sum, history_weight, history_at = None, 0.0, None
+    rows = (
+        UserSearchHistory.objects.filter(user_id=user_id, embedding__isnull=False)
+        .order_by("id").values_list("embedding", "created_at")
+    )
+    for blob, created_at in rows.iterator():
+        unit = as_unit_vector(decode_embedding(blob))
+        if unit is None or (history_sum is not None and unit.shape != history_sum.shape):
+            continue
+        weight = decay_factor(created_at, now)
+        history_sum = unit * weight if history_sum is None else history_sum + unit * weight
+        history_weight += weight
+        history_at = now
+
+    feedback = list(UserBookFeedback.objects.filter(user_id=user_id).values_list("book_title", "feedback"))
+    vectors = compute_embeddings([feedback_text(title) for title, _ in feedback]) if feedback else []
+    sums = {"like": None, "dislike": None}
+    counts = {"like": 0, "dislike": 0}
+    for (_, value), vector in zip(feedback, vectors):
+        unit = as_unit_vector(vector)
+        if unit is None or value not in sums:
+            continue
+        sums[value] = unit if sums[value] is None else sums[value] + unit
+        counts[value] += 1
+
+    with transaction.atomic():
+        profile = _locked_profile(user_id)
+        profile.history_sum = _pack(history_sum) if history_sum is not None else None
+        profile.history_weight = history_weight
+        profile.history_at = history_at
+        profile.liked_sum = _pack(sums["like"]) if sums["like"] is not None else None
+        profile.liked_count = counts["like"]
+        profile.disliked_sum = _pack(sums["dislike"]) if sums["dislike"] is not None else None
+        profile.disliked_count = counts["dislike"]
+        profile.stale = False
+        compose(profile)
+        profile.save()
+    cache.delete_many([make_taste_key(user_id), make_rebuild_key(user_id)])
+    return profile
+
+
+def get_taste_vector(user):
+    """
+    The user's unit taste vector (float32 array) or None, from the cache or one indexed
+    query. A stale profile is served as it is while a rebuild is scheduled (see
+    schedule_rebuild); in "inline" mode the rebuilt vector is served instead.
+    """
+    if user is None:
+        return None
+    key = make_taste_key(user.id)
+    cached = cache.get(key)
+    if cached is not None:
+        return None if isinstance(cached, bytes) else cached  # b"" marks "no taste vector yet"
+
+    profile = UserTasteProfile.objects.filter(user_id=user.id).only("vector", "stale").first()
+    if profile is not None and profile.stale:
+        rebuilt = schedule_rebuild(user.id)
+        if rebuilt is not None:
+            profile = rebuilt
+    blob = profile.vector if profile is not None else None
+    vector = decode_embedding(blob) if blob is not None else None
+    cache.set(key, vector if vector is not None else b"", timeout=get_taste_settings()["cache_timeout"])
+    return vector
+
+
+def blend_query(embedding, taste, weight=None):
+    """Retrieval query leaning from the current preferences towards the user's taste."""
+    query = as_unit_vector(embedding)
+    if query is None or taste is None or query.shape != np.shape(taste):
+        return embedding
+    weight = get_taste_settings()["retrieval_weight"] if weight is None else weight
+    return query + weight * np.asarray(taste, dtype=np.float32)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Single worker, so one process applies a user's updates in order."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="taste-profile")
+    return _executor
+
+
+def _run(fn, *args):
+    try:
+        fn(*args)
+    except Exception as e:
+        logger.warning("⚠️ Taste profile update failed: %s", e)
+        try:
+            mark_stale(args[0])
+        except Exception:
+            pass
+    finally:
+        if get_taste_settings()["mode"] == "background":
+            close_old_connections()  # Worker threads hold their own DB connections
+
+
+def schedule_rebuild(user_id):
+    """
+    Rebuilds a stale profile per TASTE_PROFILE["mode"], at most once per
+    rebuild_retry_interval so a failing rebuild (history scan plus an embeddings call)
+    isn't repeated on every read. Returns the rebuilt profile in "inline" mode, else None.
+    """
+    options = get_taste_settings()
+    if options["mode"] == "off":
+        return None
+    try:
+        due = cache.add(make_rebuild_key(user_id), 1, timeout=options["rebuild_retry_interval"])
+    except Exception as e:
+        logger.warning("⚠️ Taste profile rebuild throttle unavailable: %s", e)
+        return None
+    if not due:
+        return None
+    if options["mode"] == "inline":
+        try:
+            return rebuild_taste_profile(user_id)
+        except Exception as e:
+            logger.warning("⚠️ Failed to rebuild taste profile for user %s: %s", user_id, e)
+            return None
+    transaction.on_commit(lambda: get_executor().submit(_run, rebuild_taste_profile, user_id))
+    return None
+
+
+def schedule_update(fn, *args):
+    """Runs a profile update per TASTE_PROFILE["mode"]: after commit on the worker, inline, or not at all."""
+    mode = get_taste_settings()["mode"]
+    if mode == "off":
+        return
+    if mode == "inline":
+        _run(fn, *args)
+        return
+    transaction.on_commit(lambda: get_executor().submit(_run, fn, *args))
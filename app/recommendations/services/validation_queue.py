@@ -0,0 +1,82 @@
+# validation_queue.py
+
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from recommendations.models import UserSearchHistory
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Small local work queue for validation jobs, separate from request threads."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "RECOMMENDATION_VALIDATION_WORKERS", 2),
+                    thread_name_prefix="validation",
+                )
+    return _executor
+
+
+def should_validate():
+    """Applies RECOMMENDATION_VALIDATION_MODE and the sampling rate."""
+    mode = getattr(settings, "RECOMMENDATION_VALIDATION_MODE", "background")
+    if mode == "off":
+        return False
+    rate = getattr(settings, "RECOMMENDATION_VALIDATION_SAMPLE_RATE", 1.0)
+    return random.random() < rate
+
+
+def run_validation(history_id, recommendations, user_preferences):
+    """
+    Runs the GPT reasoning check for one history row and stores the summary on it.
+    A check that could not run (timeout, upstream error, open breaker) leaves
+    validated_at NULL rather than being recorded as a result.
+    """
+    from recommendations.services.ai_recommender import VALIDATION_FAILED, validate_recommendations_with_reasoning
+
+    try:
+        summary = validate_recommendations_with_reasoning(recommendations, user_preferences)
+        if summary == VALIDATION_FAILED:
+            logger.warning("⚠️ Validation could not run for history %s; left unvalidated", history_id)
+            return
+        UserSearchHistory.objects.filter(id=history_id).update(
+            validation_summary=summary,
+            validated_at=timezone.now(),
+        )
+    except Exception as e:
+        logger.warning("⚠️ Background validation failed for history %s: %s", history_id, e)
+    finally:
+        if getattr(settings, "RECOMMENDATION_VALIDATION_MODE", "background") == "background":
+            close_old_connections()  # Worker threads hold their own DB connections
+
+
+def schedule_validation(history, user_preferences):
+    """
+    Queues a (sampled) validation of a saved history row.
+    In "background" mode the job starts once the row is committed and never blocks
+    the request; "inline" runs it immediately (useful for debugging); "off" skips it.
+    """
+    if not should_validate():
+        return
+
+    recommendations = [f"{book['title']} by {book['author']}" for book in history.recommendations]
+    job = (history.id, recommendations, user_preferences)
+
+    if getattr(settings, "RECOMMENDATION_VALIDATION_MODE", "background") == "inline":
+        run_validation(*job)
+        return
+
+    transaction.on_commit(lambda: get_executor().submit(run_validation, *job))
@@ -0,0 +1,296 @@
+# vector_index.py
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from recommendations.services.embedding_codec import decode_embedding
+
+GENERATION_KEY = "vector-index:generation"
+
+DEFAULT_VECTOR_INDEX = {
+    "BACKEND": "recommendations.services.vector_index.ExactVectorIndex",
+    "OPTIONS": {},
+}
+
+
+def as_unit_vector(vector):
+    """
+    Converts an embedding (list, tuple or array) into a normalized float32 array.
+    Returns None for empty or zero vectors, which can't be ranked by cosine similarity.
+    """
+    if vector is None:
+        return None
+    arr = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(arr)
+    if not arr.size or not norm:
+        return None
+    return arr / norm
+
+
+class BaseVectorIndex:
+    """
+    Interface for per-user nearest-neighbour search over history embeddings.
+    Backends return (item_id, cosine_score) pairs, best match first.
+    Subclass this to plug in an approximate backend (IVF, HNSW, ...).
+    """
+
+    def search(self, user_id, query, k=5):
+        raise NotImplementedError
+
+    def search_many(self, queries, k=5):
+        """Runs search() for each (user_id, query) pair; returns one hit list per pair."""
+        return [self.search(user_id, query, k=k) for user_id, query in queries]
+
+    def add(self, user_id, item_id, vector):
+        raise NotImplementedError
+
+    def remove(self, user_id, item_id):
+        raise NotImplementedError
+
+    def invalidate(self, user_id=None):
+        raise NotImplementedError
+
+
+class _UserMatrix:
+    """
+    Normalized embeddings for one user, stored as a contiguous float32 matrix
+    with spare capacity so appends are amortized O(1).
+    """
+
+    def __init__(self, dim, capacity=16):
+        self.dim = dim
+        self.size = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.positions = {}
+        self.synced_id = 0  # Highest history id loaded from the database
+
+    def append(self, item_id, unit_vector):
+        if item_id in self.positions:
+            return
+        if self.size == len(self.ids):
+            capacity = max(16, len(self.ids) * 2)
+            ids = np.empty(capacity, dtype=np.int64)
+            matrix = np.empty((capacity, self.dim), dtype=np.float32)
+            ids[:self.size] = self.ids[:self.size]
+            matrix[:self.size] = self.matrix[:self.size]
+            self.ids, self.matrix = ids, matrix
+        self.ids[self.size] = item_id
+        self.matrix[self.size] = unit_vector
+        self.positions[item_id] = self.size
+        self.size += 1
+
+    def delete(self, item_id):
+        pos = self.positions.pop(item_id, None)
+        if pos is None:
+            return
+        # Copy-on-write so searches holding a snapshot never see rows shift under them
+        keep = np.ones(self.size, dtype=bool)
+        keep[pos] = False
+        self.ids = np.ascontiguousarray(self.ids[:self.size][keep])
+        self.matrix = np.ascontiguousarray(self.matrix[:self.size][keep])
+        self.size -= 1
+        self.positions = {int(i): p for p, i in enumerate(self.ids[:self.size])}
+
+    def snapshot(self):
+        return self.ids[:self.size], self.matrix[:self.size]
+
+
+def load_history_embeddings(user_id, after_id=0):
+    """
+    Default loader: yields (history_id, embedding) for a user's history rows
+    with an id greater than `after_id`, in id order.
+    """
+    from recommendations.models import UserSearchHistory
+
+    rows = (
+        UserSearchHistory.objects.filter(user_id=user_id, id__gt=after_id, embedding__isnull=False)
+        .order_by("id")
+        .values_list("id", "embedding")
+    )
+    return ((history_id, decode_embedding(blob)) for history_id, blob in rows)
+
+
+class ExactVectorIndex(BaseVectorIndex):
+    """
+    Exact cosine search: one matmul over the user's matrix plus argpartition for the top k.
+
+    Users are loaded lazily on first search and kept in an LRU bounded by `max_users`.
+    Each search first pulls rows newer than the last synced id, so rows written by
+    other processes are picked up with a single (usually empty) indexed query.
+    Bulk rewrites of older rows (see bump_index_generation) are noticed within
+    `generation_check_interval` seconds.
+    """
+
+    def __init__(self, max_users=1024, loader=None, generation_check_interval=30):
+        self.max_users = max_users
+        self.loader = loader or load_history_embeddings
+        self.generation_check_interval = generation_check_interval
+        self._users = OrderedDict()
+        self._lock = threading.RLock()
+        self._generation = None
+        self._generation_checked_at = 0.0
+
+    def _check_generation(self):
+        now = time.monotonic()
+        if now - self._generation_checked_at < self.generation_check_interval:
+            return
+        self._generation_checked_at = now
+        try:
+            generation = cache.get(GENERATION_KEY, 0)
+        except Exception:
+            return
+        if self._generation is not None and generation != self._generation:
+            self.invalidate()
+        self._generation = generation
+
+    def _sync(self, user_id, dim):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry.dim != dim:
+                # Embedding model changed: rebuild this user from scratch
+                self._users.pop(user_id)
+                entry = None
+            after_id = entry.synced_id if entry else 0
+
+        rows = list(self.loader(user_id, after_id))
+
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = _UserMatrix(dim, capacity=max(16, len(rows)))
+                self._users[user_id] = entry
+            for item_id, vector in rows:
+                unit = as_unit_vector(vector)
+                if unit is not None and unit.shape[0] == entry.dim:
+                    entry.append(item_id, unit)
+                entry.synced_id = max(entry.synced_id, item_id)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return entry.snapshot()
+
+    def search(self, user_id, query, k=5):
+        query = as_unit_vector(query)
+        if query is None or k <= 0:
+            return []
+
+        self._check_generation()
+        ids, matrix = self._sync(user_id, query.shape[0])
+        if not len(ids):
+            return []
+
+        scores = matrix @ query
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def search_many(self, queries, k=5):
+        """
+        Batched search across users: the involved users' matrices are stacked and scored
+        against all queries in one matmul, then each query keeps only its own user's rows.
+        """
+        units = [as_unit_vector(query) for _, query in queries]
+        results = [[] for _ in queries]
+        valid = [i for i, unit in enumerate(units) if unit is not None]
+        if not valid or k <= 0:
+            return results
+        dim = units[valid[0]].shape[0]
+        valid = [i for i in valid if units[i].shape[0] == dim]
+
+        self._check_generation()
+        blocks = {}
+        for i in valid:
+            user_id = queries[i][0]
+            if user_id not in blocks:
+                blocks[user_id] = self._sync(user_id, dim)
+        offsets = {}
+        start = 0
+        for user_id, (ids, _) in blocks.items():
+            offsets[user_id] = (start, start + len(ids))
+            start += len(ids)
+        if not start:
+            return results
+        all_ids = np.concatenate([ids for ids, _ in blocks.values()])
+        matrix = np.concatenate([matrix for _, matrix in blocks.values()])
+
+        scores = matrix @ np.stack([units[i] for i in valid]).T  # rows x queries
+        for column, i in enumerate(valid):
+            lo, hi = offsets[queries[i][0]]
+            user_scores = scores[lo:hi, column]
+            if len(user_scores) > k:
+                top = np.argpartition(-user_scores, k - 1)[:k]
+            else:
+                top = np.arange(len(user_scores))
+            top = top[np.argsort(-user_scores[top])]
+            results[i] = [(int(all_ids[lo + j]), float(user_scores[j])) for j in top]
+        return results
+
+    def add(self, user_id, item_id, vector):
+        unit = as_unit_vector(vector)
+        if unit is None:
+            return
+        with self._lock:
+            # Users not loaded yet will pick the row up on their first search
+            entry = self._users.get(user_id)
+            if entry is not None and entry.dim == unit.shape[0]:
+                entry.append(item_id, unit)
+
+    def remove(self, user_id, item_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                entry.delete(item_id)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index():
+    """
+    Returns the process-wide vector index configured by settings.VECTOR_INDEX.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                config = getattr(settings, "VECTOR_INDEX", DEFAULT_VECTOR_INDEX)
+                backend = import_string(config.get("BACKEND", DEFAULT_VECTOR_INDEX["BACKEND"]))
+                _index = backend(**config.get("OPTIONS", {}))
+    return _index
+
+
+def bump_index_generation():
+    """
+    Makes every process drop its in-memory index. Call after bulk writes that
+    bypass model signals (bulk_update, raw SQL) and touch existing rows.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+    get_vector_index().invalidate()
+
+
+def reset_vector_index():
+    """Drops the process-wide index so the next call rebuilds it from settings."""
+    global _index
+    with _index_lock:
+        _index = None
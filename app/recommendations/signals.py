@@ -0,0 +1,76 @@
+# signals.py
+import logging
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recommendations.models import UserBookFeedback, UserSearchHistory
+from recommendations.services.embedding_codec import decode_embedding
+from recommendations.services.feedback import invalidate_feedback_snapshot
+from recommendations.services.history_retention import is_archiving, schedule_compaction
+from recommendations.services.recommendation_cache import bump_user_version
+from recommendations.services.taste_profile import add_history, apply_feedback_change, mark_stale, schedule_update
+from recommendations.services.vector_index import get_vector_index
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=UserSearchHistory)
+def index_search_history(sender, instance, created, **kwargs):
+    """Keep the in-process vector index in step with new history rows; new rows also version the user's cache."""
+    if instance.embedding is not None:
+        get_vector_index().add(instance.user_id, instance.id, decode_embedding(instance.embedding))
+        if created:
+            schedule_update(add_history, instance.user_id, decode_embedding(instance.embedding), instance.created_at)
+    if created:
+        refresh_recommendations(instance.user_id)
+        schedule_compaction(instance.user_id)
+
+
+@receiver(post_delete, sender=UserSearchHistory)
+def unindex_search_history(sender, instance, **kwargs):
+    get_vector_index().remove(instance.user_id, instance.id)
+    if is_archiving():
+        return  # Archived rows keep counting towards the taste profile's decayed sums
+    # A decayed contribution can't be subtracted exactly; rebuild on next read
+    schedule_update(mark_stale, instance.user_id)
+
+
+@receiver(pre_save, sender=UserBookFeedback)
+def remember_previous_feedback(sender, instance, **kwargs):
+    """Keeps the stored (title, feedback) so post_save can move the book between taste sums."""
+    previous = None
+    if instance.pk:
+        previous = UserBookFeedback.objects.filter(pk=instance.pk).values_list("book_title", "feedback").first()
+    instance._previous_feedback = previous
+
+
+@receiver(post_save, sender=UserBookFeedback)
+def update_taste_on_feedback(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_feedback", None)
+    if previous and previous[0] != instance.book_title:
+        schedule_update(apply_feedback_change, instance.user_id, previous[0], previous[1], None)
+        previous = None
+    schedule_update(apply_feedback_change, instance.user_id, instance.book_title,
+                    previous[1] if previous else None, instance.feedback)
+
+
+@receiver(post_delete, sender=UserBookFeedback)
+def update_taste_on_feedback_delete(sender, instance, **kwargs):
+    schedule_update(apply_feedback_change, instance.user_id, instance.book_title, instance.feedback, None)
+
+
+@receiver(post_save, sender=UserBookFeedback)
+@receiver(post_delete, sender=UserBookFeedback)
+def invalidate_feedback(sender, instance, **kwargs):
+    """Any feedback change (submit_feedback, admin, shell) drops the user's cached snapshot."""
+    invalidate_feedback_snapshot(instance.user_id)
+    refresh_recommendations(instance.user_id)
+
+
+def refresh_recommendations(user_id):
+    """New history or feedback moves the user onto fresh recommendation cache keys."""
+    try:
+        bump_user_version(user_id)
+    except Exception as e:
+        logger.warning("⚠️ Failed to bump recommendation cache version: %s", e)
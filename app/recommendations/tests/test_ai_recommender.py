@@ -1,22 +1,27 @@
 # AI Unit Test
 
 import os
-import openai
+from types import SimpleNamespace
 from django.test import TestCase
-from recommendations.services.ai_recommender import get_ai_book_recommendations
+from recommendations.services.ai_recommender import fetch_ai_book_recommendations
 from unittest.mock import patch
 
+
+def chat_response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
 class AIRecommendationTests(TestCase):
-    @patch("recommendations.services.ai_recommender.openai.ChatCompletion.create")
-    def test_ai_recommendations(self, mock_openai):
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    def test_ai_recommendations(self, mock_client):
         """Test GPT-3.5 returns book recommendations for a given genre."""
         # Mock OpenAI response
-        mock_openai.return_value = {
-            "choices": [{"message": {"content": "1. Dune by Frank Herbert\n2. Neuromancer by William Gibson"}}]
-        }
+        mock_client.return_value.chat.completions.create.return_value = chat_response(
+            "Dune by Frank Herbert\nNeuromancer by William Gibson"
+        )
 
         # Run the AI book recommendation function
-        response = get_ai_book_recommendations({
+        response = fetch_ai_book_recommendations({
             "genres": "science fiction",
             "favorite_books": ["Dune", "Neuromancer"],
             "mood": "adventurous"
@@ -26,4 +31,22 @@ class AIRecommendationTests(TestCase):
         expected_books = ["Dune by Frank Herbert", "Neuromancer by William Gibson"]
         
         # Assert the response contains expected books
-        self.assertEqual(response, expected_books)
\ No newline at end of file
+        self.assertEqual(response, expected_books)
+
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    def test_numbered_markdown_output_is_cleaned(self, mock_client):
+        """Numbering, bold markers, quotes, years and descriptions don't leak into titles."""
+        mock_client.return_value.chat.completions.create.return_value = chat_response(
+            "Here are some picks:\n"
+            "1. **Dune** by Frank Herbert (1965) - A desert planet epic\n"
+            '2) "Neuromancer" by William Gibson\n'
+            "- *Hyperion* by Dan Simmons: pilgrims on a far world"
+        )
+
+        response = fetch_ai_book_recommendations({"genres": "science fiction"})
+
+        self.assertEqual(response, [
+            "Dune by Frank Herbert",
+            "Neuromancer by William Gibson",
+            "Hyperion by Dan Simmons",
+        ])
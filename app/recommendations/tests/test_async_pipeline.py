@@ -0,0 +1,51 @@
+# Async Pipeline Integration Test
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recommendations.models import UserSearchHistory
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def fake_async_openai(content):
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(
+        return_value=SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    )
+    client.embeddings.create = AsyncMock(
+        return_value=SimpleNamespace(data=[SimpleNamespace(embedding=[0.1, 0.2, 0.3])])
+    )
+    return client
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AsyncRecommendationViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("recommendations.services.google_books.afetch_volume")
+    @patch("recommendations.services.ai_recommender.get_async_openai_client")
+    async def test_async_endpoint_runs_full_pipeline(self, mock_client, mock_lookup):
+        """The async route returns enriched books in LLM order and records history."""
+        user = await User.objects.acreate(username="async-reader")
+        mock_client.return_value = fake_async_openai("Dune by Frank Herbert\nNeuromancer by William Gibson")
+        mock_lookup.side_effect = lambda title: {"id": title, "volumeInfo": {"title": title.split(" by ")[0]}}
+
+        response = await self.async_client.post(
+            "/recommendations/ai/async/",
+            {"user_id": user.id, "genres": "science fiction"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        titles = [book["title"] for book in response.json()["recommendations"]]
+        self.assertEqual(titles, ["Dune", "Neuromancer"])
+        self.assertEqual(await UserSearchHistory.objects.filter(user=user).acount(), 1)
+
+    async def test_async_endpoint_requires_user(self):
+        response = await self.async_client.get("/recommendations/ai/async/")
+        self.assertEqual(response.status_code, 400)
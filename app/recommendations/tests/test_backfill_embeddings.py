@@ -0,0 +1,61 @@
+# Embedding Backfill Command Test
+
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from recommendations.models import UserSearchHistory
+from recommendations.services.embedding_cache import get_embedding_cache
+from recommendations.services.embedding_codec import decode_embedding, encode_embedding
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def fake_embeddings(input, model, **kwargs):
+    return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(i + 1), 1.0]) for i in range(len(input))])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, EMBEDDING_BATCH_SIZE=3)
+class BackfillEmbeddingsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_embedding_cache().clear()
+        user = User.objects.create(username="reader")
+        for i in range(5):
+            UserSearchHistory.objects.create(
+                user=user, preferences={"genres": f"genre {i}"}, recommendations=[{"title": f"Book {i}"}]
+            )
+        self.embedded = UserSearchHistory.objects.create(
+            user=user, preferences={}, recommendations=[], embedding=encode_embedding([9.0, 9.0])
+        )
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint.json")
+
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    def test_missing_embeddings_are_filled_in_batched_requests(self, mock_client):
+        mock_client.return_value.embeddings.create.side_effect = fake_embeddings
+
+        call_command("backfill_embeddings", chunk_size=4, checkpoint=self.checkpoint, stdout=open(os.devnull, "w"))
+
+        self.assertFalse(UserSearchHistory.objects.filter(embedding=None).exists())
+        # 5 rows in chunks of 4 -> requests of 3 + 1 inputs, then 1
+        self.assertEqual(mock_client.return_value.embeddings.create.call_count, 3)
+        self.embedded.refresh_from_db()
+        self.assertEqual(decode_embedding(self.embedded.embedding).tolist(), [9.0, 9.0])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    @patch("recommendations.management.commands.backfill_embeddings.bump_index_generation")
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    def test_written_chunks_reach_running_indexes_even_if_the_run_crashes(self, mock_client, mock_bump):
+        mock_client.return_value.embeddings.create.side_effect = [fake_embeddings(["a", "b", "c"], None),
+                                                                  RuntimeError("quota")]
+
+        with self.assertRaises(RuntimeError):
+            call_command("backfill_embeddings", chunk_size=3, checkpoint=self.checkpoint, stdout=open(os.devnull, "w"))
+
+        self.assertEqual(UserSearchHistory.objects.filter(embedding=None).count(), 2)
+        mock_bump.assert_called_once()  # For the chunk written before the failure
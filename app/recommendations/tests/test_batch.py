@@ -0,0 +1,140 @@
+# Batch Recommendations Test
+
+import io
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from recommendations.models import UserSearchHistory
+from recommendations.services.batch import run_batch
+from recommendations.services.embedding_codec import encode_embedding
+from recommendations.services.vector_index import ExactVectorIndex, reset_vector_index
+from rest_framework.test import APIClient
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def fake_embeddings(input, model, **kwargs):
+    texts = [input] if isinstance(input, str) else input
+    return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[1.0, float(len(text) % 7)]) for i, text in enumerate(texts)])
+
+
+def fake_completion(**kwargs):
+    content = "Dune by Frank Herbert\nNeuromancer by William Gibson"
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def fake_response(url, params, timeout):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"items": [{"id": params["q"], "volumeInfo": {"title": params["q"].split(" by ")[0]}}]}
+    return response
+
+
+# Pool threads use their own DB connections, so rows must be committed for them to see
+@override_settings(CACHES=LOCMEM_CACHE, RECOMMENDATION_VALIDATION_MODE="off", COMPLETION_CACHE={"enabled": False},
+                   TASTE_PROFILE={"mode": "inline"}, HISTORY_RETENTION={"mode": "off"})
+class BatchRecommendationsTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        reset_vector_index()
+        self.alice = User.objects.create(username="alice")
+        self.bob = User.objects.create(username="bob")
+        self.admin = User.objects.create(username="admin", is_staff=True)
+
+        openai_patch = patch("recommendations.services.ai_recommender.get_openai_client")
+        session_patch = patch("recommendations.services.google_books.get_session")
+        self.openai = openai_patch.start().return_value
+        self.openai.embeddings.create.side_effect = fake_embeddings
+        self.openai.chat.completions.create.side_effect = fake_completion
+        session_patch.start().return_value.get.side_effect = fake_response
+        self.addCleanup(patch.stopall)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def post_batch(self, items):
+        response = self.client.post("/recommendations/ai/batch/", {"requests": items}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+    def test_streams_one_line_per_item_and_bulk_writes_history(self):
+        items = [
+            {"user_id": self.alice.id, "preferences": {"genres": "science fiction"}},
+            {"user_id": self.bob.id, "preferences": {"genres": "cyberpunk"}},
+            {"user_id": 9999, "preferences": {}},
+        ]
+
+        lines = self.post_batch(items)
+
+        by_index = {line["index"]: line for line in lines if "index" in line}
+        self.assertEqual(by_index[2]["error"], "User not found")
+        self.assertEqual([b["title"] for b in by_index[0]["recommendations"]], ["Dune", "Neuromancer"])
+        self.assertEqual(lines[-1]["done"], True)
+        self.assertEqual((lines[-1]["count"], lines[-1]["errors"]), (2, 1))
+
+        # One embeddings call for both preference texts, one for both new history rows
+        self.assertEqual(self.openai.embeddings.create.call_count, 2)
+        self.assertEqual(UserSearchHistory.objects.count(), 2)
+        self.assertIsNotNone(UserSearchHistory.objects.get(user=self.bob).embedding)
+
+        # Rankings were cached under each user's current key
+        again = self.post_batch(items[:2])
+        self.assertTrue(all(line["cached"] for line in again if "index" in line))
+        self.assertEqual(self.openai.chat.completions.create.call_count, 2)
+
+    def test_finished_jobs_are_saved_when_the_consumer_stops_early(self):
+        items = [{"user_id": user.id, "preferences": {"genres": "space opera"}} for user in (self.alice, self.bob)]
+        with patch("recommendations.services.batch.schedule_compaction") as compaction:
+            lines = run_batch(items, concurrency=1)
+            next(lines)
+            lines.close()  # Client disconnected after the first line
+
+        self.assertEqual(UserSearchHistory.objects.count(), 2)
+        self.assertEqual({call.args[0] for call in compaction.call_args_list}, {self.alice.id, self.bob.id})
+
+    def test_requires_staff(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        response = client.post("/recommendations/ai/batch/", {"requests": [{"user_id": 1}]}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_search_many_matches_per_user_search(self):
+        rng = np.random.default_rng(1)
+        for user in (self.alice, self.bob):
+            for vector in rng.normal(size=(8, 4)):
+                UserSearchHistory.objects.create(user=user, preferences={}, recommendations=[],
+                                                 embedding=encode_embedding(vector))
+        index = ExactVectorIndex()
+        queries = [(self.alice.id, rng.normal(size=4)), (self.bob.id, rng.normal(size=4)), (self.alice.id, None)]
+
+        batched = index.search_many(queries, k=3)
+
+        self.assertEqual(batched[:2], [index.search(uid, q, k=3) for uid, q in queries[:2]])
+        self.assertEqual(batched[2], [])
+
+    def test_command_writes_ndjson(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source, target = os.path.join(tmp, "in.ndjson"), os.path.join(tmp, "out.ndjson")
+            with open(source, "w") as f:
+                f.write(json.dumps({"user_id": self.alice.id, "preferences": {"genres": "space opera"}}) + "\n")
+
+            call_command("batch_recommendations", source, output=target, concurrency=2, stderr=open(os.devnull, "w"))
+
+            with open(target) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(lines[0]["user_id"], self.alice.id)
+        self.assertTrue(lines[-1]["done"])
+
+    def test_command_leaves_stdin_open(self):
+        stdin = io.StringIO(json.dumps({"user_id": self.alice.id, "preferences": {}}) + "\n")
+        with patch("sys.stdin", stdin):
+            call_command("batch_recommendations", "-", stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertFalse(stdin.closed)
@@ -0,0 +1,37 @@
+# Benchmark Harness Test
+
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recommendations.benchmarks.fakes import FakeGoogleBooksServer, FakeOpenAIServer, LatencyProfile
+from recommendations.benchmarks.micro import run_micro_benchmarks
+from recommendations.services import ai_recommender
+from recommendations.services.google_books import fetch_books
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class FakeUpstreamTests(TestCase):
+    def test_pipeline_runs_against_fake_servers(self):
+        """fetch_books talks real HTTP to the local stand-ins for OpenAI and Google Books."""
+        with FakeOpenAIServer(embedding_dim=8) as fake_openai, \
+                FakeGoogleBooksServer(LatencyProfile(base=0.01)) as fake_google, \
+                override_settings(
+                    CACHES=LOCMEM_CACHE,
+                    OPENAI_API_KEY="test",
+                    OPENAI_BASE_URL=fake_openai.base_url,
+                    GOOGLE_BOOKS_API_URL=fake_google.api_url,
+                ), \
+                patch.object(ai_recommender, "_client", None):
+            cache.clear()
+            books = fetch_books({"genres": "science fiction"})
+
+        self.assertEqual(len(books), 10)
+        self.assertEqual(fake_openai.requests, 1)
+        self.assertEqual(fake_google.requests, 10)
+
+    def test_micro_benchmarks_report_timings(self):
+        results = run_micro_benchmarks(history_rows=20, dim=8)
+        self.assertIn("history_vector_index[20x8]", results)
+        self.assertTrue(all(stats["p50_us"] > 0 for stats in results.values()))
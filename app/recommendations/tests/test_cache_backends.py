@@ -0,0 +1,89 @@
+# Tiered Cache and Stale-While-Revalidate Test
+
+import threading
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, override_settings
+from recommendations.services.google_books import fetch_books
+from recommendations.services.recommendation_cache import make_recommendation_key
+
+TIERED_CACHES = {
+    "default": {
+        "BACKEND": "recommendations.cache_backends.TieredCache",
+        "OPTIONS": {"REMOTE": "remote", "MAX_BYTES": 2048, "LOCAL_TIMEOUT": 60, "LOCAL_PREFIXES": ["books:"]},
+    },
+    "remote": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tiered-remote"},
+}
+
+
+@override_settings(CACHES=TIERED_CACHES)
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_local_tier_serves_prefixed_keys(self):
+        cache.set("books:a", ["Dune"])
+        caches["remote"].delete("books:a")  # Only the local copy is left
+
+        self.assertEqual(cache.get("books:a"), ["Dune"])
+        self.assertEqual(cache.local_stats()["local_hits"], 1)
+
+    def test_other_keys_always_go_to_remote(self):
+        cache.set("user-version:1", 5)
+        caches["remote"].set("user-version:1", 6)
+
+        self.assertEqual(cache.get("user-version:1"), 6)
+        self.assertEqual(cache.local_stats()["entries"], 0)
+
+    def test_local_tier_evicts_by_size(self):
+        for i in range(10):
+            cache.set(f"books:{i}", "x" * 500)
+
+        stats = cache.local_stats()
+        self.assertLessEqual(stats["bytes"], 2048)
+        self.assertLess(stats["entries"], 10)
+        self.assertEqual(cache.get("books:0"), "x" * 500)  # Evicted locally, refilled from remote
+
+    def test_values_are_copied(self):
+        cache.set("books:a", ["Dune"])
+        cache.get("books:a").append("Mutated")
+        self.assertEqual(cache.get("books:a"), ["Dune"])
+
+
+@override_settings(CACHES=TIERED_CACHES, RECOMMENDATION_CACHE_SOFT_TIMEOUT=0)
+class StaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("recommendations.services.google_books.resolve_titles", side_effect=lambda titles: {t: {"title": t} for t in titles})
+    @patch("recommendations.services.google_books.enrich_titles", side_effect=lambda titles: [{"title": t} for t in titles])
+    @patch("recommendations.services.google_books.fetch_ai_book_recommendations")
+    def test_stale_entry_is_served_while_refreshing(self, mock_ai, mock_enrich, mock_resolve):
+        preferences = {"genres": "science fiction"}
+        cache.set(make_recommendation_key(preferences), {"ranking": ["Old by Author"], "fresh_until": 0})
+
+        release = threading.Event()
+        refreshed = threading.Event()
+
+        def slow_ai(*args, **kwargs):
+            release.wait(5)
+            refreshed.set()
+            return ["New by Author"]
+
+        mock_ai.side_effect = slow_ai
+
+        started = time.monotonic()
+        books = fetch_books(preferences)
+        self.assertLess(time.monotonic() - started, 0.5)  # Didn't wait for the LLM
+        self.assertEqual([b["title"] for b in books], ["Old by Author"])
+
+        release.set()
+        self.assertTrue(refreshed.wait(5))
+        for _ in range(50):
+            if cache.get(make_recommendation_key(preferences))["ranking"] == ["New by Author"]:
+                break
+            time.sleep(0.02)
+        self.assertEqual(cache.get(make_recommendation_key(preferences))["ranking"], ["New by Author"])
+        self.assertEqual(mock_ai.call_count, 1)
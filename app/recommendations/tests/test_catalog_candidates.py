@@ -0,0 +1,104 @@
+# Catalog Candidates Test
+
+import io
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from recommendations.models import Book, UserBookFeedback
+from recommendations.services.ai_recommender import fetch_ai_book_recommendations
+from recommendations.services.catalog_index import CatalogIndex, CatalogIndexWriter, reset_catalog_index
+from recommendations.services.embedding_cache import get_embedding_cache
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def fake_vector(text):
+    text = text.lower()
+    return [float("space" in text), float("romance" in text), 0.1]
+
+
+def fake_embeddings(input, model, **kwargs):
+    texts = [input] if isinstance(input, str) else input
+    return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=fake_vector(text)) for i, text in enumerate(texts)])
+
+
+def fake_completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, RECOMMENDATION_VALIDATION_MODE="off", COMPLETION_CACHE={"enabled": False})
+class CatalogCandidatesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_embedding_cache().clear()
+        reset_catalog_index()
+        self.addCleanup(reset_catalog_index)
+        self.user = User.objects.create(username="reader")
+
+        for index, (title, author, genre) in enumerate([
+            ("Dune", "Frank Herbert", "Space opera"),
+            ("Hyperion", "Dan Simmons", "Space opera"),
+            ("Foundation", "Isaac Asimov", "Space opera"),
+            ("Outlander", "Diana Gabaldon", "Romance"),
+        ]):
+            Book.objects.create(google_books_id=f"b{index}", title=title, author=author, genre=genre)
+        UserBookFeedback.objects.create(user=self.user, book_title="Hyperion", feedback="dislike")
+
+        openai_patch = patch("recommendations.services.ai_recommender.get_openai_client")
+        self.openai = openai_patch.start().return_value
+        self.openai.embeddings.create.side_effect = fake_embeddings
+        self.addCleanup(patch.stopall)
+
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        call_command("embed_catalog", path=self.path, chunk_size=3, stdout=io.StringIO())
+
+    def use_mode(self, mode):
+        override = override_settings(CATALOG_CANDIDATES={"mode": mode, "path": self.path, "top_n": 5, "results": 10})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_fast_mode_serves_nearest_books_without_gpt(self):
+        self.use_mode("fast")
+
+        results = fetch_ai_book_recommendations({"genres": "space"}, self.user)
+
+        self.assertEqual(set(results[:2]), {"Dune by Frank Herbert", "Foundation by Isaac Asimov"})
+        self.assertNotIn("Hyperion by Dan Simmons", results)  # Disliked
+        self.openai.chat.completions.create.assert_not_called()
+
+    def test_rerank_mode_keeps_only_listed_books(self):
+        self.use_mode("rerank")
+        self.openai.chat.completions.create.return_value = fake_completion(
+            "1. Foundation by Isaac Asimov\n2. The Martian by Andy Weir"
+        )
+
+        results = fetch_ai_book_recommendations({"genres": "space"}, self.user)
+
+        self.assertEqual(results, ["Foundation by Isaac Asimov"])  # The unlisted pick is dropped
+        prompt = self.openai.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        self.assertIn("Dune by Frank Herbert (Space opera)", prompt)
+        self.assertNotIn("Hyperion", prompt)
+
+    def test_search_many_matches_search_and_picks_up_rebuilds(self):
+        index = CatalogIndex(self.path, reload_interval=0)
+        queries = [[1.0, 0.0, 0.1], [0.0, 1.0, 0.1], None]
+
+        batched = index.search_many(queries, n=2)
+
+        self.assertEqual(batched[:2], [index.search(query, n=2) for query in queries[:2]])
+        self.assertEqual(batched[2], [])
+
+        writer = CatalogIndexWriter(self.path, 1)
+        writer.write(0, [42], [np.array([0.0, 1.0, 0.0])])
+        writer.commit("test-model")
+        os.utime(os.path.join(self.path, "meta.json"), (0, 1))  # Within the same clock tick as the first build
+        self.assertEqual(index.search([0.0, 1.0, 0.0], n=5), [(42, 1.0)])
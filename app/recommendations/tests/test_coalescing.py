@@ -0,0 +1,52 @@
+# Request Coalescing Unit Test
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from recommendations.services.coalescing import SingleFlight
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.runs = 0
+        self.lock = threading.Lock()
+
+    def slow_pipeline(self):
+        with self.lock:
+            self.runs += 1
+        time.sleep(0.2)
+        cache.set("books:key", ["Dune"])
+        return ["Dune"]
+
+    def test_concurrent_callers_in_one_process_share_a_run(self):
+        flight = SingleFlight()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: flight.do("books:key", self.slow_pipeline), range(8)))
+
+        self.assertEqual(self.runs, 1)
+        self.assertEqual(results, [["Dune"]] * 8)
+
+    def test_other_workers_wait_on_the_shared_lease(self):
+        """Two SingleFlight instances stand in for two worker processes."""
+        worker_a, worker_b = SingleFlight(poll_interval=0.01), SingleFlight(poll_interval=0.01)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            first = pool.submit(worker_a.do, "books:key", self.slow_pipeline)
+            time.sleep(0.05)
+            second = pool.submit(worker_b.do, "books:key", self.slow_pipeline)
+
+        self.assertEqual(self.runs, 1)
+        self.assertEqual(second.result(), first.result())
+
+    def test_followers_fall_back_after_timeout(self):
+        cache.add("singleflight:books:key", "someone-else", timeout=60)  # Stuck leader elsewhere
+        flight = SingleFlight(wait_timeout=0.1, poll_interval=0.01)
+
+        self.assertEqual(flight.do("books:key", self.slow_pipeline), ["Dune"])
+        self.assertEqual(self.runs, 1)
@@ -0,0 +1,67 @@
+# Completion Cache Unit Test
+
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recommendations.services.ai_recommender import complete_chat
+from recommendations.services.completion_cache import make_completion_key, reset_completion_cache
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+SEMANTIC = {"enabled": True, "semantic": True, "threshold": 0.95}
+
+
+def mock_client(content="Dune by Frank Herbert"):
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices = [MagicMock(message=MagicMock(content=content))]
+    return client
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CompletionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_completion_cache()
+        self.addCleanup(reset_completion_cache)
+
+    def test_whitespace_only_differences_share_a_key(self):
+        self.assertEqual(
+            make_completion_key("gpt", "Recommend\n   five books "),
+            make_completion_key("gpt", "Recommend five books"),
+        )
+        self.assertNotEqual(make_completion_key("gpt", "a"), make_completion_key("other", "a"))
+
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    def test_repeated_prompt_is_answered_from_cache(self, mock_get_client):
+        client = mock_get_client.return_value = mock_client()
+
+        first = complete_chat("Recommend five books")
+        second = complete_chat("Recommend   five\nbooks")
+
+        self.assertEqual(first, second)
+        self.assertEqual(client.chat.completions.create.call_count, 1)
+
+    @override_settings(COMPLETION_CACHE=SEMANTIC)
+    @patch("recommendations.services.ai_recommender.compute_embedding")
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    def test_near_identical_request_reuses_completion(self, mock_get_client, mock_embedding):
+        client = mock_get_client.return_value = mock_client()
+        vectors = {"Prefs: sci-fi": [1.0, 0.0], "Prefs: sci fi": [0.99, 0.05], "Prefs: romance": [0.0, 1.0]}
+        mock_embedding.side_effect = vectors.get
+
+        complete_chat("prompt one", "Prefs: sci-fi")
+        complete_chat("prompt two", "Prefs: sci fi")
+        self.assertEqual(client.chat.completions.create.call_count, 1)
+
+        complete_chat("prompt three", "Prefs: romance")
+        self.assertEqual(client.chat.completions.create.call_count, 2)
+
+    @override_settings(COMPLETION_CACHE={"enabled": False})
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    def test_disabled_cache_always_calls_the_model(self, mock_get_client):
+        client = mock_get_client.return_value = mock_client()
+
+        complete_chat("Recommend five books")
+        complete_chat("Recommend five books")
+
+        self.assertEqual(client.chat.completions.create.call_count, 2)
@@ -0,0 +1,58 @@
+# Embedding Cache Unit Test
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from recommendations.services.ai_recommender import compute_embedding
+from recommendations.services.embedding_cache import EMBEDDING_CACHE_REQUESTS, EmbeddingCache, get_embedding_cache
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_tiers_and_counters(self):
+        embedding_cache = EmbeddingCache(max_entries=2)
+        self.assertIsNone(embedding_cache.get("m", "Prefs: {}"))
+
+        embedding_cache.set("m", "Prefs: {}", [0.5, 0.25])
+        np.testing.assert_array_equal(embedding_cache.get("m", "  Prefs:   {} "), [0.5, 0.25])
+
+        embedding_cache.clear()  # Local tier gone, shared tier still has it
+        np.testing.assert_array_equal(embedding_cache.get("m", "Prefs: {}"), [0.5, 0.25])
+        self.assertIsNone(embedding_cache.get("other-model", "Prefs: {}"))
+
+        self.assertEqual(embedding_cache.stats()["shared_hits"], 1)
+        self.assertEqual(embedding_cache.stats()["misses"], 1)
+
+    def test_lookups_are_reported_as_metrics(self):
+        before = {result: EMBEDDING_CACHE_REQUESTS.value(result=result) for result in ("local_hit", "shared_hit", "miss")}
+        embedding_cache = EmbeddingCache()
+
+        embedding_cache.get("m", "Prefs: {}")
+        embedding_cache.set("m", "Prefs: {}", [0.5, 0.25])
+        embedding_cache.get("m", "Prefs: {}")
+        embedding_cache.clear()
+        embedding_cache.get("m", "Prefs: {}")
+
+        for result in ("local_hit", "shared_hit", "miss"):
+            self.assertEqual(EMBEDDING_CACHE_REQUESTS.value(result=result) - before[result], 1, result)
+
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    def test_repeated_text_is_embedded_once(self, mock_client):
+        get_embedding_cache().clear()
+        mock_client.return_value.embeddings.create.return_value = SimpleNamespace(
+            data=[SimpleNamespace(embedding=[1.0, 2.0, 3.0])]
+        )
+
+        first = compute_embedding("Prefs: {'genres': 'horror'}")
+        second = compute_embedding("Prefs: {'genres': 'horror'}")
+
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(mock_client.return_value.embeddings.create.call_count, 1)
@@ -0,0 +1,31 @@
+# Embedding Codec Unit Test
+
+import numpy as np
+from django.test import SimpleTestCase
+from recommendations.services.embedding_codec import decode_embedding, encode_embedding
+
+
+class EmbeddingCodecTests(SimpleTestCase):
+    def setUp(self):
+        self.vector = np.random.default_rng(1).normal(size=1536).astype(np.float32)
+
+    def test_float32_round_trip_is_exact_and_zero_copy(self):
+        blob = encode_embedding(self.vector, dtype="float32")
+        decoded = decode_embedding(blob)
+
+        self.assertEqual(len(blob), 4 + 1536 * 4)
+        np.testing.assert_array_equal(decoded, self.vector)
+        self.assertFalse(decoded.flags.owndata)  # View over the blob, not a copy
+
+    def test_quantized_formats_stay_close(self):
+        for dtype, size, tolerance in (("float16", 2, 1e-3), ("int8", 1, 0.05)):
+            blob = encode_embedding(self.vector, dtype=dtype)
+            decoded = decode_embedding(blob)
+            cosine = decoded @ self.vector / (np.linalg.norm(decoded) * np.linalg.norm(self.vector))
+
+            self.assertLess(len(blob), 8 + 1536 * size + 1)
+            self.assertGreater(cosine, 1 - tolerance)
+
+    def test_none_passes_through(self):
+        self.assertIsNone(encode_embedding(None))
+        self.assertIsNone(decode_embedding(None))
@@ -0,0 +1,42 @@
+# Feedback Snapshot Unit Test
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from recommendations.models import UserBookFeedback
+from recommendations.services.ai_recommender import improve_recommendations
+from recommendations.services.feedback import get_feedback_snapshot
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FeedbackSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="reader")
+        UserBookFeedback.objects.create(user=self.user, book_title="Dune", feedback="like")
+        UserBookFeedback.objects.create(user=self.user, book_title="Twilight", feedback="dislike")
+
+    def test_improve_recommendations_uses_one_query(self):
+        """Likes float up, dislikes drop out, matched by canonical title, in one query then none."""
+        books = [{"title": "Neuromancer"}, {"title": "TWILIGHT"}, {"title": "dune!"}]
+
+        with self.assertNumQueries(1):
+            improved = improve_recommendations(self.user, list(books))
+        with self.assertNumQueries(0):
+            improve_recommendations(self.user, list(books))
+
+        self.assertEqual([b["title"] for b in improved], ["dune!", "Neuromancer"])
+
+    def test_submit_feedback_invalidates_snapshot(self):
+        self.assertEqual(get_feedback_snapshot(self.user).disliked_titles, ["Twilight"])
+
+        response = self.client.post(
+            "/recommendations/submit-feedback/",
+            {"user_id": self.user.id, "book_title": "Dune", "feedback": "dislike"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        snapshot = get_feedback_snapshot(self.user)
+        self.assertTrue(snapshot.is_disliked("dune"))
+        self.assertFalse(snapshot.is_liked("Dune"))
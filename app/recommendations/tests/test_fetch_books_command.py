@@ -0,0 +1,83 @@
+# Catalog Ingestion Command Test
+
+import json
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from recommendations.models import Book
+from recommendations.services.resilience import reset_breakers
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+NO_RETRIES = {"google_books": {"retries": 0, "failure_threshold": 100}}
+
+
+def fake_search(total, failing=()):
+    """Google Books stand-in: `total` results per query, pages starting at `failing` return 503."""
+    def get(url, params, timeout):
+        start, size = params["startIndex"], params["maxResults"]
+        if start in failing:
+            return MagicMock(status_code=503)
+        items = [
+            {"id": f"{params['q']}-{i}", "volumeInfo": {"title": f"{params['q']} {i}", "authors": ["A. Writer"]}}
+            for i in range(start, min(start + size, total))
+        ]
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"totalItems": total, "items": items}
+        return response
+    return get
+
+
+@override_settings(CACHES=LOCMEM_CACHE, UPSTREAM_POLICIES=NO_RETRIES)
+class FetchBooksCommandTests(TestCase):
+    def setUp(self):
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), "ingest.json")
+        session_patch = patch("recommendations.services.google_books.get_session")
+        self.session = session_patch.start().return_value
+        self.addCleanup(patch.stopall)
+
+    def ingest(self, *queries, **options):
+        call_command("fetch_books", *[f"--query={q}" for q in queries], page_size=10, pages=10, batch_size=15,
+                     concurrency=3, checkpoint=self.checkpoint, stdout=open(os.devnull, "w"),
+                     stderr=open(os.devnull, "w"), **options)
+
+    def test_pages_through_queries_until_results_run_out(self):
+        self.session.get.side_effect = fake_search(total=25)
+
+        self.ingest("fantasy", "history")
+
+        self.assertEqual(Book.objects.count(), 50)
+        self.assertEqual(self.session.get.call_count, 6)  # 3 pages per query, none past the end
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_refetches_only_missing_pages(self):
+        self.session.get.side_effect = fake_search(total=40, failing={20})
+        self.ingest("fantasy")
+
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)["queries"]["fantasy"]["next"], 20)
+        self.assertEqual(Book.objects.count(), 30)
+
+        self.session.get.reset_mock()
+        self.session.get.side_effect = fake_search(total=40)
+        self.ingest("fantasy", resume=True)
+
+        starts = sorted(call.kwargs["params"]["startIndex"] for call in self.session.get.call_args_list)
+        self.assertEqual(starts, [20, 30])
+        self.assertEqual(Book.objects.count(), 40)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_refused_requests_keep_the_checkpoint(self):
+        with open(self.checkpoint, "w") as f:
+            json.dump({"queries": {"fantasy": {"next": 40, "end": 100}}}, f)
+        self.session.get.return_value = MagicMock(status_code=403)  # Daily quota exhausted
+
+        self.ingest("fantasy", resume=True)
+
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)["queries"]["fantasy"], {"next": 40, "end": 100})
+        self.assertFalse(Book.objects.exists())
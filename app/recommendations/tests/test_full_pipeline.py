@@ -1,26 +1,34 @@
 # Full Integration Test
 
 import os
-import openai
-from django.test import TestCase
-from recommendations.services.ai_recommender import get_ai_book_recommendations
+from types import SimpleNamespace
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recommendations.services.ai_recommender import fetch_ai_book_recommendations
 from recommendations.services.google_books import fetch_books
 from unittest.mock import patch
 
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
 class FullPipelineTests(TestCase):
-    @patch("recommendations.services.ai_recommender.openai.ChatCompletion.create")
-    @patch("recommendations.services.google_books.requests.get")
+    def setUp(self):
+        cache.clear()
+
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    @patch("recommendations.services.google_books.get_session")
     def test_full_pipeline(self, mock_google_books, mock_openai):
         """Test AI-generated book recommendations with Google Books API details."""
         
         # Mock OpenAI response
-        mock_openai.return_value = {
-            "choices": [{"message": {"content": "1. Dune by Frank Herbert"}}]
-        }
+        mock_openai.return_value.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Dune by Frank Herbert"))]
+        )
 
         # Mock Google Books API response
-        mock_google_books.return_value.status_code = 200
-        mock_google_books.return_value.json.return_value = {
+        mock_google_books.return_value.get.return_value.status_code = 200
+        mock_google_books.return_value.get.return_value.json.return_value = {
             "items": [
                 {
                     "volumeInfo": {
@@ -35,7 +43,7 @@ class FullPipelineTests(TestCase):
         }
 
         # AI recommends books
-        ai_books = get_ai_book_recommendations({
+        ai_books = fetch_ai_book_recommendations({
             "genres": "science fiction",
             "favorite_books": ["Dune"],
             "mood": "adventurous"
@@ -52,4 +60,4 @@ class FullPipelineTests(TestCase):
         # Check that we correctly got the book "Dune" and its author
         self.assertGreater(len(book_details), 0, "Google Books API returned no results.")
         self.assertIn("title", book_details[0])
-        self.assertEqual(book_details[0]["authors"], ["Frank Herbert"])
\ No newline at end of file
+        self.assertEqual(book_details[0]["authors"], ["Frank Herbert"])
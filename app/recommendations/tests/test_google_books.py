@@ -0,0 +1,71 @@
+# Google Books Enrichment Unit Test
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.test import TestCase, override_settings
+from recommendations.models import Book
+from recommendations.services.google_books import enrich_titles
+
+
+def fake_response(title):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"items": [{"id": title, "volumeInfo": {"title": title, "authors": ["Someone"]}}]}
+    return response
+
+
+class EnrichTitlesTests(TestCase):
+    @patch("recommendations.services.google_books.get_session")
+    def test_lookups_run_concurrently_and_keep_order(self, mock_session):
+        """Slow lookups overlap, and results follow the AI's ranking."""
+        delays = {"First": 0.3, "Second": 0.1, "Third": 0.2}
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def get(url, params, timeout):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(delays[params["q"]])
+            with lock:
+                active[0] -= 1
+            return fake_response(params["q"])
+
+        mock_session.return_value.get.side_effect = get
+
+        started = time.monotonic()
+        books = enrich_titles(["First", "Second", "Third"])
+
+        self.assertEqual([b["title"] for b in books], ["First", "Second", "Third"])
+        self.assertEqual(peak[0], 3)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    @override_settings(GOOGLE_BOOKS_DEADLINE=0.2)
+    @patch("recommendations.services.google_books.get_session")
+    def test_failed_and_late_lookups_are_dropped(self, mock_session):
+        def get(url, params, timeout):
+            if params["q"] == "Broken":
+                raise requests.ConnectionError("boom")
+            if params["q"] == "Slow":
+                time.sleep(0.5)
+            return fake_response(params["q"])
+
+        mock_session.return_value.get.side_effect = get
+
+        books = enrich_titles(["Slow", "Broken", "Fine"])
+        self.assertEqual([b["title"] for b in books], ["Fine"])
+
+    @patch("recommendations.services.google_books.get_session")
+    def test_catalog_answers_repeat_lookups(self, mock_session):
+        """Fetched volumes are written to Book, so the next lookup needs no network call."""
+        mock_session.return_value.get.side_effect = lambda url, params, timeout: fake_response("Dune")
+
+        first = enrich_titles(["Dune by Someone"])
+        second = enrich_titles(["Dune by Someone", "DUNE by someone!"])
+
+        self.assertEqual(mock_session.return_value.get.call_count, 1)
+        self.assertEqual(Book.objects.get().lookup_key, "dune|someone")
+        self.assertEqual([b["title"] for b in second], ["Dune", "Dune"])
+        self.assertEqual(first[0]["authors"], second[0]["authors"])
@@ -0,0 +1,93 @@
+# History Retention Test
+
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from recommendations.models import UserSearchHistory, UserTasteProfile
+from recommendations.services.embedding_codec import encode_embedding
+from recommendations.services.history_retention import DEFAULT_HISTORY_RETENTION, plan_user_compaction
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class PlanCompactionTests(SimpleTestCase):
+    def test_duplicates_cap_and_age(self):
+        now = timezone.now()
+        options = {**DEFAULT_HISTORY_RETENTION, "max_rows": 3, "keep_recent": 1, "max_age_days": 30}
+        rows = [  # Newest first
+            (6, now, encode_embedding([1.0, 0.0])),
+            (5, now - timedelta(days=1), encode_embedding([0.999, 0.01])),  # Duplicate of 6
+            (4, now - timedelta(days=2), None),
+            (3, now - timedelta(days=40), encode_embedding([0.0, 1.0])),  # Too old
+            (2, now - timedelta(days=3), encode_embedding([0.6, 0.8])),
+            (1, now - timedelta(days=4), encode_embedding([0.8, -0.6])),  # Over max_rows
+        ]
+
+        keep, archive, duplicates = plan_user_compaction(rows, options, now)
+
+        self.assertEqual(keep, [6, 4, 2])
+        self.assertEqual(archive, [5, 3, 1])
+        self.assertEqual(duplicates, 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, TASTE_PROFILE={"mode": "inline"})
+class HistoryRetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="reader")
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+
+    def add_history(self, embedding, days_ago=0, title="Dune"):
+        history = UserSearchHistory.objects.create(
+            user=self.user, preferences={"genres": "sci-fi"}, recommendations=[{"title": title, "author": "A"}],
+            embedding=encode_embedding(embedding) if embedding is not None else None,
+        )
+        UserSearchHistory.objects.filter(id=history.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return history
+
+    def test_compact_archives_and_restore_reimports(self):
+        old = self.add_history([0.0, 1.0], days_ago=400, title="Old")
+        self.add_history([1.0, 0.0], days_ago=2)
+        duplicate = self.add_history([0.999, 0.01], days_ago=1)
+        keep = self.add_history(None)
+        original = {row["id"]: row for row in UserSearchHistory.objects.values()}
+
+        with self.settings(HISTORY_RETENTION={"keep_recent": 1}):
+            call_command("compact_history", archive_dir=self.archive_dir, stdout=io.StringIO())
+
+        remaining = set(UserSearchHistory.objects.values_list("id", flat=True))
+        self.assertEqual(remaining, {keep.id, duplicate.id})  # Newer of the near-duplicate pair kept
+        self.assertFalse(UserTasteProfile.objects.get(user=self.user).stale)
+
+        bystander = UserTasteProfile.objects.create(user=User.objects.create(username="bystander"))
+        call_command("restore_history", self.archive_dir, stdout=io.StringIO())
+        call_command("restore_history", self.archive_dir, stdout=io.StringIO())  # Idempotent
+        self.assertTrue(UserTasteProfile.objects.get(user=self.user).stale)
+        bystander.refresh_from_db()
+        self.assertFalse(bystander.stale)  # Only users with restored rows are rebuilt
+
+        restored = {row["id"]: row for row in UserSearchHistory.objects.values()}
+        self.assertEqual(restored.keys(), original.keys())
+        for history_id in (old.id, duplicate.id - 1):
+            for field in ("user_id", "preferences", "recommendations", "created_at"):
+                self.assertEqual(restored[history_id][field], original[history_id][field])
+            self.assertEqual(bytes(restored[history_id]["embedding"]), bytes(original[history_id]["embedding"]))
+
+    def test_new_rows_trigger_a_throttled_check(self):
+        with self.settings(HISTORY_RETENTION={"mode": "inline", "max_rows": 2, "archive_dir": self.archive_dir}):
+            cache.add(f"retention:{self.user.id}", 1)  # Checked recently
+            for index in range(3):
+                self.add_history([1.0, float(index)])
+            self.assertEqual(UserSearchHistory.objects.count(), 3)
+
+            cache.clear()
+            self.add_history([-1.0, 0.0])
+            self.assertEqual(UserSearchHistory.objects.count(), 2)
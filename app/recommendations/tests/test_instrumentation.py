@@ -0,0 +1,87 @@
+# Instrumentation Unit Test
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from recommendations.services.instrumentation import Histogram, span, start_trace
+from rest_framework.test import APIClient
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class HistogramTests(SimpleTestCase):
+    def test_prometheus_text_format(self):
+        histogram = Histogram("test_seconds", "Test histogram.", ["stage"], buckets=(0.1, 1))
+        histogram.observe(0.05, stage="llm")
+        histogram.observe(0.5, stage="llm")
+        histogram.observe(5, stage="llm")
+
+        lines = histogram.render()
+
+        self.assertEqual(lines[:2], ["# HELP test_seconds Test histogram.", "# TYPE test_seconds histogram"])
+        self.assertIn('test_seconds_bucket{stage="llm",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="llm",le="1.0"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="llm",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{stage="llm"} 3', lines)
+
+    def test_spans_record_into_current_trace_only(self):
+        with span("outside"):
+            pass
+        with start_trace("request") as trace:
+            with span("parsing"):
+                pass
+            with self.assertRaises(ValueError), span("llm"):
+                raise ValueError("boom")
+
+        self.assertEqual([(stage, failed) for stage, _, failed in trace.spans], [("parsing", False), ("llm", True)])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, RECOMMENDATION_VALIDATION_MODE="off")
+class RequestTraceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("recommendations.services.google_books.get_session")
+    @patch("recommendations.services.ai_recommender.get_openai_client")
+    def test_request_reports_stage_timings(self, mock_client, mock_session):
+        user = User.objects.create(username="traced")
+        mock_client.return_value.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Dune by Frank Herbert"))]
+        )
+        mock_client.return_value.embeddings.create.return_value = SimpleNamespace(
+            data=[SimpleNamespace(embedding=[0.1, 0.2], index=0)]
+        )
+        mock_session.return_value.get.return_value.status_code = 200
+        mock_session.return_value.get.return_value.json.return_value = {
+            "items": [{"id": "dune", "volumeInfo": {"title": "Dune"}}]
+        }
+
+        response = self.client.post(
+            "/recommendations/ai/", {"user_id": user.id, "genres": "sf"}, content_type="application/json"
+        )
+
+        timing = response["Server-Timing"]
+        for stage in ("embedding", "retrieval", "llm", "parsing", "enrichment", "persistence"):
+            self.assertIn(f"{stage};dur=", timing)
+
+        with self.settings(METRICS_TOKEN="scrape-secret"):
+            metrics = self.client.get(
+                "/recommendations/metrics/", HTTP_AUTHORIZATION="Bearer scrape-secret"
+            ).content.decode()
+        self.assertIn('recommendation_stage_seconds_count{stage="llm"}', metrics)
+        self.assertIn('recommendation_request_seconds_count{view="ai_book_recommendations",status="200"}', metrics)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_metrics_require_staff_or_the_scrape_token(self):
+        self.assertEqual(self.client.get("/recommendations/metrics/").status_code, 401)
+        wrong = self.client.get("/recommendations/metrics/", HTTP_AUTHORIZATION="Bearer guess")
+        self.assertEqual(wrong.status_code, 401)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username="reader"))
+        self.assertEqual(client.get("/recommendations/metrics/").status_code, 403)
+        client.force_authenticate(User.objects.create(username="ops", is_staff=True))
+        self.assertEqual(client.get("/recommendations/metrics/").status_code, 200)
@@ -0,0 +1,90 @@
+# Title Normalization and Fuzzy Resolution Unit Test
+
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from recommendations.models import Book
+from recommendations.services.catalog import find_books
+from recommendations.services.normalization import clean_recommendation_line, split_title_author
+from recommendations.services.resolver import TitleResolver, reset_title_resolver
+
+
+class CleanRecommendationLineTests(SimpleTestCase):
+    def test_llm_formatting_is_stripped(self):
+        cases = {
+            "1. **Dune** by Frank Herbert (1965)": ("Dune", "Frank Herbert"),
+            "12) The Left Hand of Darkness by Ursula K. Le Guin - gender and politics": (
+                "The Left Hand of Darkness", "Ursula K. Le Guin"),
+            "* “Piranesi” by Susanna Clarke": ("Piranesi", "Susanna Clarke"),
+            "Project Hail Mary (2021) by Andy Weir.": ("Project Hail Mary", "Andy Weir"),
+        }
+        for line, expected in cases.items():
+            with self.subTest(line=line):
+                self.assertEqual(clean_recommendation_line(line), expected)
+
+    def test_numbers_and_by_inside_titles_are_kept(self):
+        cases = {
+            "2001: A Space Odyssey by Arthur C. Clarke": ("2001: A Space Odyssey", "Arthur C. Clarke"),
+            "3. 1984 by George Orwell": ("1984", "George Orwell"),
+            "Stand By Me by Stephen King": ("Stand By Me", "Stephen King"),
+        }
+        for line, expected in cases.items():
+            with self.subTest(line=line):
+                self.assertEqual(clean_recommendation_line(line), expected)
+        self.assertEqual(split_title_author("Stand By Me by Stephen King"), ("Stand By Me", "Stephen King"))
+
+    def test_non_recommendation_lines_are_rejected(self):
+        self.assertIsNone(clean_recommendation_line("Here are five books you might enjoy:"))
+        self.assertIsNone(clean_recommendation_line("1. by Nobody"))
+
+
+class TitleResolverTests(TestCase):
+    def setUp(self):
+        reset_title_resolver()
+        self.addCleanup(reset_title_resolver)
+
+    def test_resolves_near_miss_titles_with_matching_author(self):
+        resolver = TitleResolver(threshold=0.75)
+        resolver.add(1, "the fellowship of the ring", "J. R. R. Tolkien")
+        resolver.add(2, "the two towers", "J. R. R. Tolkien")
+        resolver.add(3, "fellowship", "Someone Else")
+
+        self.assertEqual(resolver.resolve("Fellowship of the Ring", "Tolkien")[0], 1)
+        self.assertIsNone(resolver.resolve("Fellowship of the Ring", "Le Guin"))
+        self.assertIsNone(resolver.resolve("The Return of the King", "Tolkien"))
+
+    @override_settings(BOOK_RESOLVER={"mode": "inline"})
+    def test_find_books_falls_back_to_fuzzy_match(self):
+        book = Book.objects.create(
+            google_books_id="lotr1", title="The Fellowship of the Ring", author="J.R.R. Tolkien",
+            lookup_key="the fellowship of the ring|j r r tolkien",
+            normalized_title="the fellowship of the ring",
+        )
+
+        found = find_books(["Fellowship of the Ring by J. R. R. Tolkien", "Dune by Frank Herbert"])
+
+        self.assertEqual(found, {"Fellowship of the Ring by J. R. R. Tolkien": book})
+
+    def test_background_sync_is_queued_once_per_interval(self):
+        resolver = TitleResolver(refresh_interval=60)
+        with patch("recommendations.services.resolver.get_executor") as executor:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                resolver.sync()
+                resolver.sync()  # Lookups meanwhile use what is indexed
+        self.assertEqual(len(callbacks), 1)
+        executor.return_value.submit.assert_called_once_with(resolver._background_refresh)
+
+    def test_refresh_reindexes_changed_catalog_rows(self):
+        book = Book.objects.create(google_books_id="b1", title="Dune Messiah", author="Frank Herbert",
+                                   normalized_title="dune messiah")
+        resolver = TitleResolver()
+        self.assertEqual(resolver.refresh(), 1)
+        self.assertEqual(resolver.refresh(), 0)  # Re-read rows within the overlap are unchanged
+
+        book.title, book.normalized_title = "Children of Dune", "children of dune"
+        book.save()
+        self.assertEqual(resolver.refresh(), 1)
+
+        self.assertEqual(len(resolver), 1)
+        self.assertIsNone(resolver.resolve("Dune Messiah", "Frank Herbert"))
+        self.assertEqual(resolver.resolve("Children of Dune", "Frank Herbert")[0], book.id)
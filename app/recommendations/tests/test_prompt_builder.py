@@ -0,0 +1,47 @@
+# Prompt Builder Unit Test
+
+from types import SimpleNamespace
+
+from django.test import TestCase, override_settings
+from recommendations.models import Book
+from recommendations.services.ai_recommender import CHAT_MODEL, build_recommendation_prompt
+from recommendations.services.feedback import FeedbackSnapshot
+from recommendations.services.prompt_builder import budgeted_prompt, count_tokens, history_lines
+
+
+def history(preferences, titles):
+    return SimpleNamespace(preferences=preferences, recommendations=[{"title": t, "author": "A"} for t in titles])
+
+
+class PromptBuilderTests(TestCase):
+    def test_history_titles_are_listed_once(self):
+        histories = [
+            (history({"genres": "sci-fi", "favorite_books": ["Dune"]}, ["Hyperion", "Foundation"]), 0.9),
+            (history({"genres": "space opera"}, ["hyperion!", "Twilight", "Ubik"]), 0.8),
+            (history({"genres": "romance"}, ["Twilight"]), 0.7),
+        ]
+
+        lines = history_lines(histories, max_titles=10, skip_titles={"twilight"})
+
+        self.assertEqual(lines, [
+            "- genres: sci-fi; favorite_books: Dune → Hyperion; Foundation",
+            "- genres: space opera → Ubik",
+        ])
+
+    @override_settings(PROMPT_BUDGET={"max_tokens": 300, "recent_dislikes": 5})
+    def test_prompt_stays_within_budget_for_long_lived_users(self):
+        for index in range(30):
+            Book.objects.create(google_books_id=f"r{index}", title=f"Romance {index}", author="Nora Roberts",
+                                genre="Romance", normalized_title=f"romance {index}")
+        feedback = FeedbackSnapshot([(f"Romance {index}", "dislike") for index in range(30)])
+        histories = [(history({"genres": f"genre {i}"}, [f"Book {i}-{j}" for j in range(10)]), 1 - i / 10)
+                     for i in range(5)]
+
+        prompt, stats = budgeted_prompt(build_recommendation_prompt, {"genres": "fantasy"}, histories, feedback, CHAT_MODEL)
+
+        self.assertLessEqual(count_tokens(prompt, CHAT_MODEL), 300)
+        self.assertEqual(stats["dislikes_listed"] + stats["dislikes_summarized"], 30)
+        self.assertIn("Romance 29", prompt)  # Most recent dislikes stay listed
+        self.assertNotIn("Romance 0,", prompt)
+        self.assertIn("earlier dislikes, mostly Romance, often by Nora Roberts", prompt)
+        self.assertIn("Book 0-0", prompt)  # The most similar history is dropped last
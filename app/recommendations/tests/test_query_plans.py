@@ -0,0 +1,122 @@
+# Query Count and Plan Test
+
+import re
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recommendations.models import UserBookFeedback, UserSearchHistory
+from recommendations.services.embedding_codec import encode_embedding
+from recommendations.services.vector_index import reset_vector_index
+from rest_framework.test import APIClient
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+INDEXED_TABLES = ("recommendations_usersearchhistory", "recommendations_userbookfeedback")
+
+
+def fake_embeddings(input, model, **kwargs):
+    texts = [input] if isinstance(input, str) else input
+    return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[1.0, float(len(text) % 5)]) for i, text in enumerate(texts)])
+
+
+def fake_response(url, params, timeout):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"items": [{"id": params["q"], "volumeInfo": {"title": params["q"].split(" by ")[0]}}]}
+    return response
+
+
+@override_settings(CACHES=LOCMEM_CACHE, RECOMMENDATION_VALIDATION_MODE="off", COMPLETION_CACHE={"enabled": False})
+class EndpointQueryTests(TestCase):
+    """
+    Pins each endpoint's query count, and checks that every query on the history and
+    feedback tables is an index search rather than a table scan (SQLite's EXPLAIN QUERY PLAN).
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_vector_index()
+        self.user = User.objects.create(username="reader")
+        other = User.objects.create(username="other")
+        for owner in (self.user, other):
+            for index in range(20):
+                UserSearchHistory.objects.create(
+                    user=owner, preferences={"genres": f"genre {index}"},
+                    recommendations=[{"title": f"Book {index}", "author": "A"}],
+                    embedding=encode_embedding([1.0, float(index)]) if index % 2 else None,
+                )
+            UserBookFeedback.objects.create(user=owner, book_title="Twilight", feedback="dislike")
+        cache.clear()
+
+        openai_patch = patch("recommendations.services.ai_recommender.get_openai_client")
+        openai = openai_patch.start().return_value
+        openai.embeddings.create.side_effect = fake_embeddings
+        openai.chat.completions.create.return_value = SimpleNamespace(choices=[SimpleNamespace(
+            message=SimpleNamespace(content="Dune by Frank Herbert\nHyperion by Dan Simmons"),
+        )])
+        patch("recommendations.services.google_books.get_session").start().return_value.get.side_effect = fake_response
+        self.addCleanup(patch.stopall)
+
+    def assert_indexed(self, queries):
+        if connection.vendor != "sqlite":
+            return  # Plan output below is SQLite's
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query["sql"]
+                if not sql.startswith("SELECT") or not any(table in sql for table in INDEXED_TABLES):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+                for table in INDEXED_TABLES:
+                    scans = [step for step in plan if re.match(rf"SCAN {table}\b", step)]
+                    self.assertFalse(scans, f"Table scan in {sql}: {plan}")
+
+    def capture(self, expected, call):
+        with CaptureQueriesContext(connection) as queries:
+            response = call()
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+        self.assertEqual(len(queries), expected, "\n".join(query["sql"] for query in queries))
+        self.assert_indexed(queries.captured_queries)
+        return response
+
+    def test_recommendations_endpoint(self):
+        prefs = {"user_id": self.user.id, "genres": "science fiction"}
+        # User, taste vector, embedded history rows, the retrieved rows' prompt columns, feedback,
+        # the new history row, catalog lookups (key, title) and the book upsert; the title
+        # resolver refreshes on its own worker
+        response = self.capture(9, lambda: self.client.get("/recommendations/ai/", prefs))
+        self.assertEqual(response.status_code, 200)
+
+        # Cached ranking: only the user lookup
+        self.capture(1, lambda: self.client.get("/recommendations/ai/", prefs))
+
+    def test_feedback_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        self.capture(1, lambda: client.get("/recommendations/get-feedback/"))
+        # User, existing row, insert
+        self.capture(3, lambda: client.post(
+            "/recommendations/submit-feedback/", {"user_id": self.user.id, "book_title": "Dune", "feedback": "like"},
+        ))
+
+    def test_hot_queries_use_their_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Index names are read from SQLite's EXPLAIN QUERY PLAN")
+        histories = UserSearchHistory.objects.filter(user=self.user)
+        cases = {
+            # services.vector_index.load_history_embeddings / taste profile rebuilds
+            "history_user_embedded_idx": histories.filter(id__gt=0, embedding__isnull=False)
+            .order_by("id").values_list("id", "embedding"),
+            # services.history_retention.compact_histories
+            "history_user_created_idx": histories.order_by("-created_at", "-id").values_list("id", "created_at"),
+            "feedback_user_value_idx": UserBookFeedback.objects.filter(user=self.user, feedback="dislike")
+            .values_list("book_title", flat=True),
+        }
+        for index, queryset in cases.items():
+            self.assertIn(index, queryset.explain())
+
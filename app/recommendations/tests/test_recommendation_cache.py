@@ -0,0 +1,72 @@
+# Versioned Recommendation Cache Test
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recommendations.models import UserBookFeedback
+from recommendations.services.google_books import fetch_books
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def fake_openai():
+    client = MagicMock()
+    client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="Dune by Frank Herbert\nNeuromancer by William Gibson"))]
+    )
+    client.embeddings.create.return_value = SimpleNamespace(data=[SimpleNamespace(embedding=[0.1, 0.2, 0.3], index=0)])
+    return client
+
+
+def fake_response(title):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"items": [{"id": title, "volumeInfo": {"title": title.split(" by ")[0]}}]}
+    return response
+
+
+# Chat calls are counted per ranking, so identical prompts must not be answered from the completion cache
+@override_settings(CACHES=LOCMEM_CACHE, RECOMMENDATION_VALIDATION_MODE="off", COMPLETION_CACHE={"enabled": False})
+class VersionedRecommendationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.preferences = {"genres": "science fiction"}
+        self.alice = User.objects.create(username="alice")
+        self.bob = User.objects.create(username="bob")
+
+        openai_patch = patch("recommendations.services.ai_recommender.get_openai_client")
+        session_patch = patch("recommendations.services.google_books.get_session")
+        self.openai = openai_patch.start().return_value = fake_openai()
+        self.session = session_patch.start().return_value
+        self.session.get.side_effect = lambda url, params, timeout: fake_response(params["q"])
+        self.addCleanup(patch.stopall)
+
+    def chat_calls(self):
+        return self.openai.chat.completions.create.call_count
+
+    def test_repeat_request_is_cached_despite_its_own_history(self):
+        fetch_books(dict(self.preferences), user=self.alice)
+        books = fetch_books(dict(self.preferences), user=self.alice)
+
+        self.assertEqual(self.chat_calls(), 1)
+        self.assertEqual([b["title"] for b in books], ["Dune", "Neuromancer"])
+
+    def test_users_have_separate_rankings_but_share_enrichment(self):
+        fetch_books(dict(self.preferences), user=self.alice)
+        fetch_books(dict(self.preferences), user=self.bob)
+
+        self.assertEqual(self.chat_calls(), 2)  # Personalized per user
+        self.assertEqual(self.session.get.call_count, 2)  # Each title looked up once
+
+    def test_feedback_invalidates_only_that_user(self):
+        fetch_books(dict(self.preferences), user=self.alice)
+        fetch_books(dict(self.preferences), user=self.bob)
+
+        UserBookFeedback.objects.create(user=self.alice, book_title="Dune", feedback="dislike")
+        books = fetch_books(dict(self.preferences), user=self.alice)
+        fetch_books(dict(self.preferences), user=self.bob)
+
+        self.assertEqual(self.chat_calls(), 3)
+        self.assertEqual([b["title"] for b in books], ["Neuromancer"])
@@ -0,0 +1,121 @@
+# Upstream Resilience Unit Test
+
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from recommendations.models import Book, UserBookFeedback
+from recommendations.services.ai_recommender import fetch_ai_book_recommendations
+from recommendations.services.fallback import DegradedRecommendations
+from recommendations.services.google_books import fetch_books
+from recommendations.services.resilience import (
+    CircuitBreaker,
+    UpstreamError,
+    UpstreamUnavailable,
+    call_upstream,
+    get_breaker,
+    reset_breakers,
+)
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+FAST_POLICIES = {
+    "openai": {"retries": 1, "backoff_base": 0, "failure_threshold": 2, "reset_timeout": 60},
+    "google_books": {"timeout": 3, "retries": 1, "backoff_base": 0, "failure_threshold": 2, "reset_timeout": 60},
+}
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_consecutive_failures_and_closes_after_trial(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+
+        with patch("recommendations.services.resilience.time.monotonic", return_value=10**9):
+            self.assertTrue(breaker.allow_request())  # One half-open trial...
+            self.assertFalse(breaker.allow_request())  # ...at a time
+            breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+
+@override_settings(UPSTREAM_POLICIES=FAST_POLICIES)
+class CallUpstreamTests(SimpleTestCase):
+    def setUp(self):
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+
+    def test_retries_then_succeeds(self):
+        fn = MagicMock(side_effect=[UpstreamError("503"), "ok"])
+
+        self.assertEqual(call_upstream("google_books", fn), "ok")
+        self.assertEqual(fn.call_count, 2)
+        self.assertLessEqual(fn.call_args.args[0], 3)  # Per-attempt timeout passed through
+
+    def test_client_errors_are_raised_without_retry_or_breaker_failure(self):
+        class Unauthorized(Exception):
+            status_code = 401
+
+        fn = MagicMock(side_effect=Unauthorized("bad key"))
+        for _ in range(3):
+            with self.assertRaises(Unauthorized):
+                call_upstream("openai", fn)
+
+        self.assertEqual(fn.call_count, 3)  # One attempt per call
+        self.assertEqual(get_breaker("openai").state, "closed")
+
+    def test_open_breaker_rejects_without_calling(self):
+        failing = MagicMock(side_effect=UpstreamError("503"))
+        with self.assertRaises(UpstreamUnavailable):
+            call_upstream("google_books", failing)
+
+        fn = MagicMock()
+        with self.assertRaises(UpstreamUnavailable):
+            call_upstream("google_books", fn)
+        fn.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHE, UPSTREAM_POLICIES=FAST_POLICIES, RECOMMENDATION_VALIDATION_MODE="off")
+class FallbackTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+        self.user = User.objects.create(username="reader")
+        UserBookFeedback.objects.create(user=self.user, book_title="Dune", feedback="like")
+        for gid, title, author, genre, rating in [
+            ("1", "Dune", "Frank Herbert", "Science Fiction", 4.5),
+            ("2", "Children of Dune", "Frank Herbert", "Science Fiction", 4.0),
+            ("3", "Hyperion", "Dan Simmons", "Science Fiction", 4.2),
+            ("4", "Emma", "Jane Austen", "Romance", 4.8),
+        ]:
+            Book.objects.create(google_books_id=gid, title=title, author=author, genre=genre,
+                                average_rating=rating, normalized_title=title.lower(), lookup_key=f"{title.lower()}|{author.lower()}")
+
+        openai_patch = patch("recommendations.services.ai_recommender.get_openai_client")
+        session_patch = patch("recommendations.services.google_books.get_session")
+        self.openai = openai_patch.start().return_value
+        self.openai.chat.completions.create.side_effect = TimeoutError("stalled")
+        self.openai.embeddings.create.side_effect = TimeoutError("stalled")
+        self.session = session_patch.start().return_value
+        self.addCleanup(patch.stopall)
+
+    def test_outage_serves_catalog_books_instead_of_an_error_title(self):
+        titles = fetch_ai_book_recommendations({"genres": "science fiction"}, user=self.user)
+
+        self.assertIsInstance(titles, DegradedRecommendations)
+        self.assertEqual(titles[:2], ["Children of Dune by Frank Herbert", "Hyperion by Dan Simmons"])
+        self.assertNotIn("Dune by Frank Herbert", titles)  # Already liked
+
+    def test_open_breaker_answers_from_catalog_without_upstream_calls(self):
+        fetch_books({"genres": "science fiction"}, user=self.user)
+        calls = self.openai.chat.completions.create.call_count + self.openai.embeddings.create.call_count
+
+        cache.clear()
+        books = fetch_books({"genres": "science fiction"}, user=self.user)
+
+        self.assertEqual(self.openai.chat.completions.create.call_count + self.openai.embeddings.create.call_count, calls)
+        self.session.get.assert_not_called()  # Fallback titles resolve from the catalog
+        self.assertEqual(books[0]["title"], "Children of Dune")
@@ -0,0 +1,107 @@
+# Streaming Endpoint Test
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recommendations.models import Book, UserSearchHistory
+from recommendations.services.feedback import FeedbackSnapshot
+from recommendations.services.resilience import reset_breakers
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StreamingRecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("recommendations.services.streaming.record_search_history")
+    @patch("recommendations.services.streaming.prepare_recommendation_prompt")
+    @patch("recommendations.services.streaming.fetch_volume")
+    @patch("recommendations.services.streaming.get_openai_client")
+    def test_books_stream_as_lines_complete(self, mock_client, mock_lookup, mock_prepare, mock_record):
+        user = User.objects.create(username="reader")
+        mock_prepare.return_value = ("prompt", [], FeedbackSnapshot([("Bad Book", "dislike")]), [])
+        lookups_before_end = []
+        dune_started = threading.Event()
+
+        def tokens():
+            yield chunk("Dune by Frank")
+            yield chunk(" Herbert\nBad Book by Someone\n")
+            lookups_before_end.append(dune_started.wait(timeout=2))
+            yield chunk("Hyperion by Dan Simmons")
+
+        mock_client.return_value.chat.completions.create.return_value = tokens()
+
+        def lookup(title):
+            dune_started.set()
+            name, author = title.split(" by ")
+            return {"id": name, "volumeInfo": {"title": name, "authors": [author]}}
+
+        mock_lookup.side_effect = lookup
+
+        response = self.client.get("/recommendations/ai/", {"user_id": user.id, "stream": "1"})
+        events = parse_events(b"".join(response.streaming_content).decode())
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(lookups_before_end, [True])  # Dune was looked up mid-stream
+        books = {payload["rank"]: payload["book"]["title"] for event, payload in events if event == "book"}
+        self.assertEqual(books, {0: "Dune", 1: "Hyperion"})  # Disliked book filtered out
+        self.assertEqual(events[-1], ("done", {"count": 2, "cached": False}))
+        mock_record.assert_called_once()
+        self.assertEqual(Book.objects.count(), 2)  # Written through to the catalog
+
+    @override_settings(UPSTREAM_POLICIES={"openai": {"deadline": 0.2}})
+    @patch("recommendations.services.streaming.record_search_history")
+    @patch("recommendations.services.streaming.prepare_recommendation_prompt")
+    @patch("recommendations.services.streaming.fetch_volume")
+    @patch("recommendations.services.streaming.get_openai_client")
+    def test_slow_stream_is_cut_off_at_the_deadline(self, mock_client, mock_lookup, mock_prepare, mock_record):
+        self.addCleanup(reset_breakers)
+        user = User.objects.create(username="reader")
+        mock_prepare.return_value = ("prompt", [], FeedbackSnapshot([]), [])
+        closed = []
+
+        def tokens():
+            try:
+                yield chunk("Dune by Frank Herbert\n")
+                time.sleep(0.3)  # Trickles on past the deadline
+                yield chunk("Hyperion by Dan Simmons\n")
+                yield chunk("Neuromancer by William Gibson\n")
+            finally:
+                closed.append(True)
+
+        mock_client.return_value.chat.completions.create.return_value = tokens()
+        mock_lookup.side_effect = lambda title: {"id": title, "volumeInfo": {"title": title.split(" by ")[0]}}
+
+        response = self.client.get("/recommendations/ai/", {"user_id": user.id, "stream": "1"})
+        events = parse_events(b"".join(response.streaming_content).decode())
+
+        books = [payload["book"]["title"] for event, payload in events if event == "book"]
+        self.assertEqual(books, ["Dune", "Hyperion"])  # The chunk that crossed the deadline is the last one read
+        self.assertEqual(events[-1], ("done", {"count": 2, "cached": False, "degraded": True}))
+        self.assertEqual(closed, [True])
+        mock_record.assert_not_called()
+
+    def test_stream_requires_user(self):
+        response = self.client.get("/recommendations/ai/", {"stream": "1"})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserSearchHistory.objects.exists())
@@ -0,0 +1,102 @@
+# Taste Profile Unit Test
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recommendations.models import UserBookFeedback, UserSearchHistory, UserTasteProfile
+from recommendations.services.embedding_cache import get_embedding_cache
+from recommendations.services.embedding_codec import decode_embedding, encode_embedding
+from recommendations.services.taste_profile import get_taste_vector, make_taste_key, rebuild_taste_profile
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+BOOK_VECTORS = {"Book: Dune": [0.0, 1.0, 0.0], "Book: Twilight": [0.0, 0.0, 1.0]}
+
+
+def fake_embeddings(input, model, **kwargs):
+    texts = [input] if isinstance(input, str) else input
+    return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=BOOK_VECTORS[text]) for i, text in enumerate(texts)])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, TASTE_PROFILE={"mode": "inline", "like_weight": 1.0, "dislike_weight": 0.5})
+class TasteProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_embedding_cache().clear()
+        self.user = User.objects.create(username="reader")
+        openai_patch = patch("recommendations.services.ai_recommender.get_openai_client")
+        openai_patch.start().return_value.embeddings.create.side_effect = fake_embeddings
+        self.addCleanup(patch.stopall)
+
+    def _history(self, embedding):
+        return UserSearchHistory.objects.create(
+            user=self.user, preferences={}, recommendations=[], embedding=encode_embedding(embedding)
+        )
+
+    def profile_vector(self):
+        return decode_embedding(UserTasteProfile.objects.get(user=self.user).vector)
+
+    def test_history_rows_update_the_centroid(self):
+        self._history([1.0, 0.0, 0.0])
+        self._history([2.0, 2.0, 0.0])
+
+        expected = np.array([1.0, 0.0, 0.0]) + np.array([1.0, 1.0, 0.0]) / np.sqrt(2)
+        np.testing.assert_allclose(self.profile_vector(), expected / np.linalg.norm(expected), atol=1e-3)
+
+    def test_feedback_changes_match_a_full_rebuild(self):
+        self._history([1.0, 0.0, 0.0])
+        UserBookFeedback.objects.create(user=self.user, book_title="Dune", feedback="like")
+        twilight = UserBookFeedback.objects.create(user=self.user, book_title="Twilight", feedback="like")
+        twilight.feedback = "dislike"
+        twilight.save()
+
+        profile = UserTasteProfile.objects.get(user=self.user)
+        self.assertEqual((profile.liked_count, profile.disliked_count), (1, 1))
+        incremental = self.profile_vector()
+
+        rebuilt = decode_embedding(rebuild_taste_profile(self.user.id).vector)
+        np.testing.assert_allclose(incremental, rebuilt, atol=1e-4)
+        self.assertLess(incremental[2], 0)  # Disliked direction is subtracted
+
+    def test_removing_feedback_the_profile_never_saw_triggers_a_rebuild(self):
+        with self.settings(TASTE_PROFILE={"mode": "off"}):  # Written before profiles were kept
+            dune = UserBookFeedback.objects.create(user=self.user, book_title="Dune", feedback="like")
+            UserBookFeedback.objects.create(user=self.user, book_title="Twilight", feedback="dislike")
+
+        dune.delete()
+
+        profile = UserTasteProfile.objects.get(user=self.user)
+        self.assertTrue(profile.stale)
+        np.testing.assert_allclose(get_taste_vector(self.user), [0.0, 0.0, -1.0], atol=1e-4)
+        profile.refresh_from_db()
+        self.assertEqual((profile.liked_count, profile.disliked_count, profile.stale), (0, 1, False))
+
+    def test_deleted_history_makes_the_next_read_rebuild(self):
+        self._history([1.0, 0.0, 0.0])
+        self._history([0.0, 1.0, 0.0]).delete()
+        self.assertTrue(UserTasteProfile.objects.get(user=self.user).stale)
+
+        np.testing.assert_allclose(get_taste_vector(self.user), [1.0, 0.0, 0.0], atol=1e-4)
+        self.assertFalse(UserTasteProfile.objects.get(user=self.user).stale)
+        with self.assertNumQueries(0):
+            get_taste_vector(self.user)  # Cached until the next update
+
+    def test_background_mode_serves_the_stale_vector_and_throttles_rebuilds(self):
+        self._history([1.0, 0.0, 0.0])
+        UserTasteProfile.objects.filter(user=self.user).update(stale=True)
+        cache.clear()
+
+        with self.settings(TASTE_PROFILE={"mode": "background"}), \
+                patch("recommendations.services.taste_profile.get_executor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                vector = get_taste_vector(self.user)
+            np.testing.assert_allclose(vector, [1.0, 0.0, 0.0], atol=1e-4)  # Old vector, no inline rebuild
+
+            cache.delete(make_taste_key(self.user.id))
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                get_taste_vector(self.user)
+            self.assertEqual(callbacks, [])  # A failed rebuild isn't retried until rebuild_retry_interval
+        self.assertEqual(executor.return_value.submit.call_count, 1)
@@ -0,0 +1,59 @@
+# Background Validation Unit Test
+
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from recommendations.models import UserSearchHistory
+from recommendations.services.ai_recommender import VALIDATION_FAILED
+from recommendations.services.validation_queue import schedule_validation
+
+
+class ScheduleValidationTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="reader")
+        self.history = UserSearchHistory.objects.create(
+            user=user,
+            preferences={"genres": "fantasy"},
+            recommendations=[{"title": "Dune", "author": "Frank Herbert"}],
+        )
+
+    @override_settings(RECOMMENDATION_VALIDATION_MODE="inline", RECOMMENDATION_VALIDATION_SAMPLE_RATE=1.0)
+    @patch("recommendations.services.ai_recommender.validate_recommendations_with_reasoning")
+    def test_summary_is_stored_on_history_row(self, mock_validate):
+        mock_validate.return_value = "Looks good."
+
+        schedule_validation(self.history, self.history.preferences)
+
+        mock_validate.assert_called_once_with(["Dune by Frank Herbert"], {"genres": "fantasy"})
+        self.history.refresh_from_db()
+        self.assertEqual(self.history.validation_summary, "Looks good.")
+        self.assertIsNotNone(self.history.validated_at)
+
+    @override_settings(RECOMMENDATION_VALIDATION_MODE="inline", RECOMMENDATION_VALIDATION_SAMPLE_RATE=1.0)
+    @patch("recommendations.services.ai_recommender.validate_recommendations_with_reasoning")
+    def test_failed_check_leaves_the_row_unvalidated(self, mock_validate):
+        mock_validate.return_value = VALIDATION_FAILED  # Timeout, upstream error or open breaker
+
+        schedule_validation(self.history, self.history.preferences)
+
+        self.history.refresh_from_db()
+        self.assertIsNone(self.history.validation_summary)
+        self.assertIsNone(self.history.validated_at)
+
+    @override_settings(RECOMMENDATION_VALIDATION_MODE="background", RECOMMENDATION_VALIDATION_SAMPLE_RATE=0.0)
+    @patch("recommendations.services.validation_queue.get_executor")
+    def test_unsampled_requests_queue_nothing(self, mock_executor):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            schedule_validation(self.history, self.history.preferences)
+
+        self.assertEqual(callbacks, [])
+        mock_executor.assert_not_called()
+
+    @override_settings(RECOMMENDATION_VALIDATION_MODE="background", RECOMMENDATION_VALIDATION_SAMPLE_RATE=1.0)
+    @patch("recommendations.services.validation_queue.get_executor")
+    def test_background_job_is_queued_after_commit(self, mock_executor):
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_validation(self.history, self.history.preferences)
+
+        mock_executor.return_value.submit.assert_called_once()
@@ -0,0 +1,53 @@
+# Vector Index Unit Test
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from recommendations.models import UserSearchHistory
+from recommendations.services.embedding_codec import encode_embedding
+from recommendations.services.vector_index import ExactVectorIndex, get_vector_index, reset_vector_index
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ExactVectorIndexTests(TestCase):
+    def setUp(self):
+        reset_vector_index()
+        self.user = User.objects.create(username="reader")
+
+    def _history(self, embedding):
+        return UserSearchHistory.objects.create(
+            user=self.user, preferences={}, recommendations=[], embedding=encode_embedding(embedding)
+        )
+
+    def test_search_returns_top_k_by_cosine(self):
+        """Rows come back best match first, limited to k."""
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(20, 8))
+        rows = [self._history(vec) for vec in vectors]
+        query = rng.normal(size=8)
+
+        hits = ExactVectorIndex().search(self.user.id, query, k=3)
+
+        def cosine(vec):
+            vec = np.asarray(vec)
+            return vec @ query / (np.linalg.norm(vec) * np.linalg.norm(query))
+
+        ranked = sorted(zip(rows, vectors), key=lambda pair: cosine(pair[1]), reverse=True)[:3]
+        self.assertEqual([hid for hid, _ in hits], [h.id for h, _ in ranked])
+        self.assertAlmostEqual(hits[0][1], cosine(ranked[0][1]), places=5)
+
+    def test_new_rows_are_indexed_incrementally(self):
+        """Rows saved after the first search are found without a rebuild."""
+        index = get_vector_index()
+        self._history([1.0, 0.0])
+        self.assertEqual(len(index.search(self.user.id, [1.0, 0.0])), 1)
+
+        newest = self._history([0.0, 1.0])
+        hits = index.search(self.user.id, [0.0, 1.0], k=1)
+        self.assertEqual(hits[0][0], newest.id)
+
+        newest.delete()
+        self.assertEqual(len(index.search(self.user.id, [0.0, 1.0])), 1)
@@ -1,49 +1,78 @@
 # views.py
 import json
-from django.http import JsonResponse
+import logging
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from recommendations.services.google_books import fetch_books
+from recommendations.services.batch import run_batch
+from recommendations.services.google_books import afetch_books, fetch_books
+from recommendations.services.instrumentation import render_metrics
+from recommendations.services.streaming import format_sse, stream_book_recommendations
 from django.contrib.auth.models import User
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
 from .models import UserBookFeedback
+from .permissions import HasMetricsToken, MetricsTokenAuthentication
+
+logger = logging.getLogger(__name__)
+
+def parse_recommendation_request(request):
+    """
+    Reads recommendation parameters from a JSON POST body or GET query string.
+    Returns (data, None) on success or (None, JsonResponse) describing the error.
+    """
+    if request.method == "POST":
+        if request.content_type != "application/json":
+            return None, JsonResponse({"error": "Content-Type must be application/json"}, status=400)
+        return json.loads(request.body), None
+
+    if request.method == "GET":
+        return request.GET.dict(), None
+
+    return None, JsonResponse({"error": "Invalid request method"}, status=405)
+
 
 @csrf_exempt
 def get_ai_book_recommendations(request):
     """
     API endpoint to fetch AI-generated book recommendations and augment them with Google Books API.
+    Pass "stream": true (or ?stream=1) to receive books as server-sent events.
     """
 
     try:
-        if request.method == "POST":
-            if request.content_type != "application/json":
-                return JsonResponse({"error": "Content-Type must be application/json"}, status=400)
-
-            data = json.loads(request.body)
-
-        elif request.method == "GET":
-            data = request.GET.dict()
-
-        else:
-            return JsonResponse({"error": "Invalid request method"}, status=405)
+        data, error = parse_recommendation_request(request)
+        if error:
+            return error
 
         user = None
         user_id = data.get("user_id")
-        print(f"👉 Received user_id: {user_id}")
+        logger.debug("👉 Received user_id: %s", user_id)
 
         if user_id:
             user = User.objects.filter(id=user_id).first()
-            print(f"👉 Resolved user: {user}")
+            logger.debug("👉 Resolved user: %s", user)
             if not user:
                 return JsonResponse({"error": "User not found"}, status=404)
         else:
             return JsonResponse({"error": "User ID is required"}, status=400)
 
+        # 📡 Streaming mode: push each enriched book as a server-sent event
+        if str(data.pop("stream", "")).lower() in ("1", "true"):
+            events = stream_book_recommendations(data, user=user)
+            response = StreamingHttpResponse(
+                (format_sse(event, payload) for event, payload in events),
+                content_type="text/event-stream",
+            )
+            response["Cache-Control"] = "no-cache"
+            response["X-Accel-Buffering"] = "no"  # Stop proxies from buffering the stream
+            return response
+
         # ⚙️ Fetch AI + Google Books recommendations with resolved user object
         recommendations = fetch_books(data, user=user)
 
@@ -53,10 +82,65 @@ def get_ai_book_recommendations(request):
         return JsonResponse({"error": "Invalid JSON format"}, status=400)
 
     except Exception as e:
-        print(f"🔥 Error: {str(e)}")
+        logger.exception("🔥 Error")
         return JsonResponse({"error": f"Unexpected error: {str(e)}"}, status=500)
 
 
+@csrf_exempt
+async def aget_ai_book_recommendations(request):
+    """
+    Async version of get_ai_book_recommendations. Under ASGI, a request waiting on
+    OpenAI or Google Books holds no worker thread, so one worker can serve many at once.
+    """
+
+    try:
+        data, error = parse_recommendation_request(request)
+        if error:
+            return error
+
+        user_id = data.get("user_id")
+        if not user_id:
+            return JsonResponse({"error": "User ID is required"}, status=400)
+
+        user = await User.objects.filter(id=user_id).afirst()
+        if not user:
+            return JsonResponse({"error": "User not found"}, status=404)
+
+        recommendations = await afetch_books(data, user=user)
+
+        return JsonResponse({"recommendations": recommendations})
+
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format"}, status=400)
+
+    except Exception as e:
+        logger.exception("🔥 Error")
+        return JsonResponse({"error": f"Unexpected error: {str(e)}"}, status=500)
+
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def batch_book_recommendations(request):
+    """
+    Precomputes recommendations for many users at once (staff only).
+    Body: {"requests": [{"user_id": 1, "preferences": {...}}, ...]}. Streams NDJSON:
+    one line per item as it completes (tagged with its "index"), then a {"done": true} summary.
+    """
+    items = request.data.get("requests") if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response({"error": "requests must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+    max_items = getattr(settings, "BATCH_RECOMMENDATION_MAX_ITEMS", 1000)
+    if len(items) > max_items:
+        return Response({"error": f"At most {max_items} requests per batch"}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(
+        (json.dumps(line) + "\n" for line in run_batch(items)),
+        content_type="application/x-ndjson",
+    )
+    response["X-Accel-Buffering"] = "no"
+    return response
+
 
 # 🔹 Register API
 @api_view(['POST'])
@@ -188,4 +272,15 @@ def get_user_feedback(request):
     """
     user = request.user
     feedback = UserBookFeedback.objects.filter(user=user).values("book_title", "feedback")
-    return Response(list(feedback), status=200)
\ No newline at end of file
+    return Response(list(feedback), status=200)
+
+
+@api_view(["GET"])
+@authentication_classes([MetricsTokenAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+@permission_classes([IsAdminUser | HasMetricsToken])
+def metrics(request):
+    """
+    Pipeline stage and request latency histograms in Prometheus text format (this process only).
+    Staff users, or scrapers sending settings.METRICS_TOKEN as a bearer token.
+    """
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")